@@ -0,0 +1,126 @@
+"""
+Drives events through a running EmojiradesBot and measures how it copes
+
+Events go out over the workspace's RTM websocket and are timed until the
+bot's event_processed_hook fires, which is after every response was sent
+"""
+
+import statistics
+import threading
+import time
+from dataclasses import asdict, dataclass
+
+from sqlalchemy import event as sqlalchemy_event
+
+from emojirades.persistence import get_engine
+
+
+class Counter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = 0
+
+    def increment(self, *args, **kwargs):
+        with self.lock:
+            self.value += 1
+
+
+@dataclass
+class Result:
+    scenario: str
+    database: str
+    events: int
+    seconds: float
+    events_per_second: float
+    p50_ms: float
+    p99_ms: float
+    queries_per_event: float
+    slack_calls_per_event: float
+    timeouts: int
+
+    def as_dict(self):
+        return asdict(self)
+
+
+def percentile(samples, pct):
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+
+    return statistics.quantiles(samples, n=100, method="inclusive")[pct - 1]
+
+
+class Benchmark:
+    def __init__(self, bot, workspace_id, db_uri, timeout=5.0):
+        self.workspace = bot.workspaces[workspace_id]
+        self.slack = self.workspace["slack"]
+        self.db_uri = db_uri
+        self.timeout = timeout
+
+        self.queries = Counter()
+        self.slack_calls = Counter()
+
+        sqlalchemy_event.listen(get_engine(db_uri), "after_cursor_execute", self.queries.increment)
+
+        # Every Web API method goes through api_call
+        web_client = self.slack.rtm.web_client
+
+        # Saved rather than deleted on close, it may already be another wrapper
+        self.api_call = api_call = web_client.api_call
+
+        def counted_api_call(*args, **kwargs):
+            self.slack_calls.increment()
+            return api_call(*args, **kwargs)
+
+        web_client.api_call = counted_api_call
+
+    def close(self):
+        sqlalchemy_event.remove(
+            get_engine(self.db_uri), "after_cursor_execute", self.queries.increment
+        )
+        self.slack.rtm.web_client.api_call = self.api_call
+
+    def send(self, event):
+        """
+        Sends one event and returns how long it took to handle, or None on timeout
+        """
+        done = threading.Event()
+        self.workspace["event_processed_hook"] = lambda e: done.set()
+
+        started = time.perf_counter()
+        self.slack.rtm.send(event)
+
+        if not done.wait(timeout=self.timeout):
+            return None
+
+        return time.perf_counter() - started
+
+    def run(self, scenario, events, database="sqlite"):
+        queries = self.queries.value
+        slack_calls = self.slack_calls.value
+
+        latencies = []
+        timeouts = 0
+
+        started = time.perf_counter()
+
+        for event in events:
+            if (latency := self.send(event)) is None:
+                timeouts += 1
+            else:
+                latencies.append(latency * 1000)
+
+        seconds = time.perf_counter() - started
+        count = max(len(events), 1)
+
+        return Result(
+            scenario=scenario,
+            database=database,
+            events=len(events),
+            seconds=round(seconds, 3),
+            events_per_second=round(len(events) / seconds, 1) if seconds else 0.0,
+            p50_ms=round(percentile(latencies, 50), 2),
+            p99_ms=round(percentile(latencies, 99), 2),
+            queries_per_event=round((self.queries.value - queries) / count, 2),
+            slack_calls_per_event=round((self.slack_calls.value - slack_calls) / count, 2),
+            timeouts=timeouts,
+        )
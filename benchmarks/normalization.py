@@ -0,0 +1,93 @@
+"""
+Micro-benchmark of sanitize_text against the implementation it replaced
+
+    PYTHONPATH=src uv run --extra dev python -m benchmarks.normalization
+
+Reports microseconds per call for each kind of text, with and without the
+memoization (a cold cache is what a never before seen guess costs)
+"""
+
+import argparse
+import json
+import string
+import timeit
+
+from unidecode import unidecode
+
+from emojirades.normalization import sanitize_text
+
+SAMPLES = {
+    "short_ascii": "is it 0.123456?",
+    "title_ascii": "Space, the Final Frontier!",
+    "long_ascii": "the quick brown fox jumps over the lazy dog " * 5,
+    "unicode": "Späce : THE\t\t\tfinal\v- f_r_ö_n+t/ier",
+}
+
+_remove_punctuation = str.maketrans("", "", string.punctuation)
+
+
+def legacy_sanitize_text(text):
+    """
+    sanitize_text as it was, unidecode and four passes on every call
+    """
+    normalized = unidecode(text)
+    lowered = normalized.lower()
+    scrubbed = lowered.translate(_remove_punctuation)
+
+    return " ".join(scrubbed.split())
+
+
+def uncached_sanitize_text(text):
+    return sanitize_text.__wrapped__(text)
+
+
+IMPLEMENTATIONS = {
+    "legacy": legacy_sanitize_text,
+    "uncached": uncached_sanitize_text,
+    "cached": sanitize_text,
+}
+
+
+def measure(func, text, number):
+    return min(timeit.repeat(lambda: func(text), number=number, repeat=5)) / number * 1e6
+
+
+def run(number=100000):
+    results = []
+
+    for sample, text in SAMPLES.items():
+        expected = legacy_sanitize_text(text)
+
+        for name, func in IMPLEMENTATIONS.items():
+            if func(text) != expected:
+                raise AssertionError(f"{name} disagrees with legacy on {sample}")
+
+            us_per_call = measure(func, text, number)
+            results.append({"sample": sample, "implementation": name, "us_per_call": us_per_call})
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.normalization", description=__doc__)
+    parser.add_argument("--number", type=int, default=100000, help="Calls per measurement")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON lines")
+    args = parser.parse_args()
+
+    results = run(number=args.number)
+
+    if args.json:
+        for result in results:
+            print(json.dumps(result))
+        return
+
+    print(f"{'sample':<12} {'implementation':<14} {'us/call':>8}")
+
+    for result in results:
+        print(
+            f"{result['sample']:<12} {result['implementation']:<14} {result['us_per_call']:>8.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Synthetic channels replayed by the benchmark harness
+
+Each scenario is a function taking a Workload and returning the events to
+send, optionally seeding the database first through Workload.db_uri
+"""
+
+import datetime
+import random
+
+from sqlalchemy import insert
+
+from emojirades.persistence import (
+    ScoreboardHistoryModel,
+    ScoreboardModel,
+    ScoreboardOperation,
+    backfill_rollups,
+    get_engine,
+)
+
+
+class Workload:
+    def __init__(
+        self, team, channel, bot_id, db_uri, players=1000, events=1000, history=100, seed=0
+    ):
+        self.team = team
+        self.channel = channel
+        self.bot_id = bot_id
+        self.db_uri = db_uri
+        self.players = [f"U{i:08d}" for i in range(100, 100 + players)]
+        self.events = events
+        self.history = history
+        self.random = random.Random(seed)
+        self.ts = 1000000000.0
+
+    def event(self, user, text, channel=None):
+        self.ts += 0.000001
+
+        return {
+            "type": "message",
+            "team": self.team,
+            "source_team": self.team,
+            "channel": channel or self.channel,
+            "user": user,
+            "text": text,
+            "ts": f"{self.ts:.6f}",
+        }
+
+    def mention(self, user, text):
+        return self.event(user, f"<@{self.bot_id}> {text}")
+
+
+def guess_storm(workload):
+    """
+    Full rounds where most of the channel piles in with wrong guesses before
+    someone gets it
+    """
+    players = workload.players
+    rng = workload.random
+
+    previous_winner, current_winner = rng.sample(players, 2)
+    events = [
+        workload.mention(previous_winner, f"new game <@{previous_winner}> <@{current_winner}>")
+    ]
+
+    round_number = 0
+
+    while len(events) < workload.events:
+        emojirade = f"storm {round_number}"
+        round_number += 1
+
+        events.append(
+            workload.event(
+                previous_winner, f"emojirade {emojirade}", channel=f"D{previous_winner[1:]}"
+            )
+        )
+        events.append(workload.event(current_winner, ":cloud_with_rain: :zap:"))
+
+        for _ in range(rng.randint(10, 50)):
+            events.append(workload.event(rng.choice(players), f"is it {rng.random():.6f}?"))
+
+        guesser = rng.choice(players)
+
+        while guesser == current_winner:
+            guesser = rng.choice(players)
+
+        # Every other round the winner awards it by hand instead
+        if round_number % 2:
+            events.append(workload.event(guesser, emojirade))
+        else:
+            events.append(workload.event(current_winner, f"<@{guesser}>++"))
+
+        previous_winner, current_winner = current_winner, guesser
+
+    return events
+
+
+def seed_history(workload, days=365):
+    """
+    Writes `history` scoring events per player spread over the last year, plus their totals
+    """
+    rng = workload.random
+    now = datetime.datetime.now(datetime.timezone.utc)
+    scores = dict.fromkeys(workload.players, 0)
+
+    history = []
+
+    for _ in range(workload.history * len(workload.players)):
+        user_id = rng.choice(workload.players)
+        previous_score = scores[user_id]
+        scores[user_id] += 1
+
+        history.append(
+            {
+                "workspace_id": workload.team,
+                "channel_id": workload.channel,
+                "user_id": user_id,
+                "timestamp": now - datetime.timedelta(seconds=rng.randrange(days * 86400)),
+                "operation": ScoreboardOperation.INCREMENT,
+                "previous_score": previous_score,
+                "current_score": scores[user_id],
+            }
+        )
+
+    with get_engine(workload.db_uri).begin() as connection:
+        connection.execute(insert(ScoreboardHistoryModel), history)
+        connection.execute(
+            insert(ScoreboardModel),
+            [
+                {
+                    "workspace_id": workload.team,
+                    "channel_id": workload.channel,
+                    "user_id": user_id,
+                    "score": score,
+                    "last_updated": now,
+                }
+                for user_id, score in scores.items()
+            ],
+        )
+
+    backfill_rollups(workload.db_uri)
+
+
+def leaderboards(workload):
+    """
+    Scoreboard and history requests against a long history
+    """
+    seed_history(workload)
+
+    queries = [
+        "scoreboard",
+        "scoreboard monthly",
+        "scoreboard yearly",
+        "scoreboard all time",
+        "scoreboard last 30d",
+        "scoreboards",
+        "history",
+    ]
+
+    return [
+        workload.mention(workload.random.choice(workload.players), queries[i % len(queries)])
+        for i in range(workload.events)
+    ]
+
+
+SCENARIOS = {
+    "guess_storm": guess_storm,
+    "leaderboards": leaderboards,
+}
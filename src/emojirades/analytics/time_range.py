@@ -1,11 +1,18 @@
 import datetime
+from zoneinfo import ZoneInfo
 
 from emojirades.analytics.time_unit import TimeUnit
 
 
 class TimeRange:
+    # Calendar periods (weeks, months) are bucketed in this timezone
+    TZ = ZoneInfo("Australia/Melbourne")
+
     @classmethod
     def get_start_date(cls, on_date: datetime.datetime, time_unit: TimeUnit) -> datetime.datetime:
+        if time_unit == TimeUnit.DAILY:
+            return on_date.replace(hour=0, minute=0, second=0)
+
         if time_unit == TimeUnit.WEEKLY:
             first_day_of_week = on_date - datetime.timedelta(days=on_date.weekday())
 
@@ -16,10 +23,24 @@ class TimeRange:
 
             return first_day_of_month.replace(hour=0, minute=0, second=0)
 
+        if time_unit == TimeUnit.QUARTERLY:
+            first_month_of_quarter = (on_date.month - 1) // 3 * 3 + 1
+            first_day_of_quarter = on_date.replace(month=first_month_of_quarter, day=1)
+
+            return first_day_of_quarter.replace(hour=0, minute=0, second=0)
+
+        if time_unit == TimeUnit.YEARLY:
+            first_day_of_year = on_date.replace(month=1, day=1)
+
+            return first_day_of_year.replace(hour=0, minute=0, second=0)
+
         raise RuntimeError(f"Unmapped TimeUnit: {time_unit}")
 
     @classmethod
     def get_end_date(cls, on_date: datetime.datetime, time_unit: TimeUnit) -> datetime.datetime:
+        if time_unit == TimeUnit.DAILY:
+            return on_date.replace(hour=23, minute=59, second=59)
+
         if time_unit == TimeUnit.WEEKLY:
             last_day_of_week = TimeRange.get_start_date(on_date, time_unit) + datetime.timedelta(
                 days=6
@@ -33,4 +54,37 @@ class TimeRange:
 
             return last_day_of_month.replace(hour=23, minute=59, second=59)
 
+        if time_unit == TimeUnit.QUARTERLY:
+            last_month_of_quarter = TimeRange.get_start_date(on_date, time_unit).month + 2
+
+            return TimeRange.get_end_date(
+                on_date.replace(month=last_month_of_quarter, day=1), TimeUnit.MONTHLY
+            )
+
+        if time_unit == TimeUnit.YEARLY:
+            last_day_of_year = on_date.replace(month=12, day=31)
+
+            return last_day_of_year.replace(hour=23, minute=59, second=59)
+
         raise RuntimeError(f"Unmapped TimeUnit: {time_unit}")
+
+    @classmethod
+    def get_period_start(cls, on_date: datetime.datetime, time_unit: TimeUnit) -> datetime.date:
+        """
+        Returns the first day of the period containing on_date, as seen in TimeRange.TZ
+        """
+        return cls.get_start_date(on_date.astimezone(cls.TZ), time_unit).date()
+
+    @classmethod
+    def get_period_dates(
+        cls, on_date: datetime.datetime, time_unit: TimeUnit
+    ) -> tuple[datetime.date, datetime.date]:
+        """
+        Returns the first and last day of the period containing on_date, as seen in TimeRange.TZ
+        """
+        on_date = on_date.astimezone(cls.TZ)
+
+        return (
+            cls.get_start_date(on_date, time_unit).date(),
+            cls.get_end_date(on_date, time_unit).date(),
+        )
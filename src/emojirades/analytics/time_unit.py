@@ -2,6 +2,10 @@ from enum import Enum
 
 
 class TimeUnit(Enum):
+    DAILY = "daily"
     WEEKLY = "weekly"
     MONTHLY = "monthly"
+    QUARTERLY = "quarterly"
+    YEARLY = "yearly"
     ALL_TIME = "all time"
+    CUSTOM = "custom"
@@ -0,0 +1,302 @@
+import asyncio
+import collections
+import functools
+import json
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from slack_sdk.errors import SlackApiError
+
+from emojirades.bot import EmojiradesBot
+from emojirades.instrumentation import instrumentation
+from emojirades.persistence import get_workspace_repository
+from emojirades.slack.event import Event
+
+try:
+    import aiohttp
+    from slack_sdk.http_retry.builtin_async_handlers import AsyncRateLimitErrorRetryHandler
+    from slack_sdk.web.async_client import AsyncWebClient
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+
+class AsyncEmojiradesBot(EmojiradesBot):
+    """
+    Runs every workspace's RTM connection, outbound Web API calls and onboarding
+    polling as coroutines on a single event loop
+
+    Commands and persistence stay synchronous, each event is processed on a
+    bounded thread pool so the thread count follows the pool size rather than
+    the number of workspaces
+    """
+
+    def __init__(self, max_workers=8, max_retries=3, reconnect_backoff=30, **kwargs):
+        if aiohttp is None:
+            raise RuntimeError("The async runtime requires the 'async' extra: emojirades[async]")
+
+        super().__init__(**kwargs)
+
+        self.max_retries = max_retries
+        self.reconnect_backoff = reconnect_backoff
+
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="EmojiradesWorker"
+        )
+        self.channel_locks = collections.defaultdict(asyncio.Lock)
+        self.tasks = set()
+        self.listeners = {}
+
+    def configure_workspace(
+        self,
+        db_uri,
+        auth_uri,
+        extra_slack_kwargs=None,
+        dispatch_workers=0,
+    ):
+        # The synchronous dispatcher is left without workers, responses are sent from the loop
+        slack = super().configure_workspace(
+            db_uri,
+            auth_uri,
+            extra_slack_kwargs=extra_slack_kwargs,
+            dispatch_workers=dispatch_workers,
+        )
+
+        async_web_client = AsyncWebClient(
+            token=slack.config["bot_access_token"],
+            base_url=slack.rtm.web_client.base_url,
+            logger=slack.logger,
+            retry_handlers=[AsyncRateLimitErrorRetryHandler(max_retry_count=self.max_retries)],
+        )
+        instrumentation.instrument_async_web_client(async_web_client)
+
+        self.workspaces[slack.workspace_id]["async_web_client"] = async_web_client
+
+        return slack
+
+    def run(self, workspaces_uri=None, db_uri=None):
+        asyncio.run(self.main(workspaces_uri, db_uri=db_uri))
+
+    async def main(self, workspaces_uri=None, db_uri=None):
+        self.logger.info("Starting Slack monitor(s)")
+
+        for workspace in list(self.workspaces.values()):
+            self.start_listener(workspace)
+
+        if self.onboarding_queue is not None:
+            await self.poll_onboarding(workspaces_uri, db_uri=db_uri)
+        else:
+            await asyncio.Event().wait()
+
+    def spawn(self, coro):
+        # The loop only keeps weak references to tasks
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+        return task
+
+    def start_listener(self, workspace):
+        workspace_id = workspace["slack"].workspace_id
+
+        # A workspace that's onboarded again replaces its previous connection
+        if (previous := self.listeners.get(workspace_id)) is not None:
+            previous.cancel()
+
+        self.listeners[workspace_id] = self.spawn(self.listen(workspace))
+
+    async def listen(self, workspace):
+        """
+        Reads RTM events for a workspace, reconnecting with a jittered backoff
+        """
+        web_client = workspace["async_web_client"]
+        workspace_id = workspace["slack"].workspace_id
+
+        async with aiohttp.ClientSession() as http:
+            while True:
+                try:
+                    response = await web_client.rtm_connect()
+
+                    async with http.ws_connect(response["url"], heartbeat=30) as websocket:
+                        workspace["websocket"] = websocket
+                        self.logger.info("Connected to RTM for %s", workspace_id)
+
+                        async for message in websocket:
+                            if message.type != aiohttp.WSMsgType.TEXT:
+                                break
+
+                            data = json.loads(message.data)
+
+                            if data.get("type") == "message":
+                                self.spawn(self.handle_event(workspace, data))
+                            elif data.get("type") in ("user_change", "team_join"):
+                                workspace["slack"].update_user(data["user"])
+                except asyncio.CancelledError:
+                    raise
+                except Exception:  # pylint: disable=broad-exception-caught
+                    self.logger.exception("RTM connection failed for %s", workspace_id)
+                finally:
+                    workspace.pop("websocket", None)
+
+                delay = random.uniform(1, self.reconnect_backoff)
+                self.logger.info("Reconnecting to RTM for %s in %.1fs", workspace_id, delay)
+                await asyncio.sleep(delay)
+
+    async def handle_event(self, workspace, data):
+        event = Event(data, workspace["slack"])
+        event.trace = instrumentation.start()
+
+        try:
+            # Set within this task only, blocking calls activate the trace on their own thread
+            with instrumentation.activate(event.trace):
+                await self.process_async(workspace, event)
+        finally:
+            instrumentation.finish(
+                event.trace,
+                workspace_id=workspace["slack"].workspace_id,
+                channel=event.original_channel,
+            )
+
+            hook = workspace.get("event_processed_hook")
+
+            if hook:
+                hook(event)
+
+    async def process_async(self, workspace, event):
+        with instrumentation.span("valid"):
+            valid = await self.run_blocking(event.valid)
+
+        if not valid:
+            self.logger.debug("Skipping event due to being invalid")
+            return
+
+        # Keyed on the original channel so responses keep their order per channel
+        lock = self.channel_locks[(workspace["slack"].workspace_id, event.channel)]
+
+        async with lock:
+            try:
+                outbound = await self.run_blocking(EmojiradesBot.process_event, event, workspace)
+
+                for channel, response in outbound:
+                    with instrumentation.span("send"):
+                        await self.send_response_async(workspace, event, channel, response)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                EmojiradesBot.log_event_error(self.logger, event, e)
+                await self.apologise_async(workspace, event)
+
+    async def send_response_async(self, workspace, event, channel, response):
+        """
+        Sends a single (channel, response) pair yielded by a command
+        """
+        web_client = workspace["async_web_client"]
+
+        func_name, args, kwargs, destination = EmojiradesBot.prepare_response(
+            event, channel, response
+        )
+
+        func = getattr(web_client, func_name, None)
+
+        if func is None:
+            raise RuntimeError(f"Unmapped function '{func_name}'")
+
+        if destination is not None:
+            kwargs["channel"] = await self.decode_channel_async(destination, workspace)
+
+        try:
+            await func(*args, **kwargs)
+        except SlackApiError as e:
+            if not EmojiradesBot.stale_im(destination, e):
+                raise
+
+            # The remembered DM channel is gone, open a fresh one and try again
+            await self.run_blocking(workspace["slack"].forget_im, destination)
+            kwargs["channel"] = await self.decode_channel_async(destination, workspace)
+
+            await func(*args, **kwargs)
+
+    async def decode_channel_async(self, channel, workspace):
+        if not channel.startswith("U"):
+            return EmojiradesBot.decode_channel(channel, workspace)
+
+        slack = workspace["slack"]
+
+        if (dm_id := slack.cached_im(channel)) is not None:
+            return dm_id
+
+        # Channel is a User ID, which means the real channel is the DM with that user
+        response = await workspace["async_web_client"].conversations_open(users=[channel])
+
+        if not response["ok"]:
+            raise RuntimeError(f"Unable to find direct message channel for '{channel}'")
+
+        await self.run_blocking(slack.remember_im, channel, response["channel"]["id"])
+
+        return response["channel"]["id"]
+
+    async def run_blocking(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def apologise_async(self, workspace, event):
+        try:
+            await workspace["async_web_client"].chat_postMessage(
+                channel=event.channel,
+                text=(
+                    f"I'm sorry <@{event.player_id}>, but I had a "
+                    "problem processing that message :sob:"
+                ),
+            )
+        except Exception as post_err:  # pylint: disable=broad-exception-caught
+            self.logger.exception(
+                "Failed to send error message back to Slack",
+                extra={
+                    "channel": getattr(event, "channel", None),
+                    "player_id": getattr(event, "player_id", None),
+                    "error_type": post_err.__class__.__name__,
+                },
+            )
+
+    async def poll_onboarding(
+        self, workspaces_uri, db_uri=None, oneshot=False, wait_time_seconds=20
+    ):
+        loop = asyncio.get_running_loop()
+        sqs = boto3.client("sqs")
+
+        # boto3 is synchronous, the long poll parks a single pool thread instead of the loop
+        def call(func, **kwargs):
+            return loop.run_in_executor(self.executor, functools.partial(func, **kwargs))
+
+        response = await call(sqs.get_queue_url, QueueName=self.onboarding_queue)
+        queue_url = response["QueueUrl"]
+
+        repository = get_workspace_repository(workspaces_uri)
+
+        while True:
+            response = await call(
+                sqs.receive_message,
+                QueueUrl=queue_url,
+                WaitTimeSeconds=wait_time_seconds,
+            )
+
+            for message in response.get("Messages", []):
+                # Reads the workspace from S3 (or disk), so it's kept off the loop too
+                workspace = await call(
+                    self.onboarding_workspace, message=message, repository=repository, db_uri=db_uri
+                )
+
+                if workspace is None:
+                    continue
+
+                slack = await call(self.configure_workspace, **workspace)
+                self.start_listener(self.workspaces[slack.workspace_id])
+                self.logger.info("Bot has onboarded workspace %s", slack.workspace_id)
+
+                # Onboarding was successful, clean up the workspace
+                await call(
+                    sqs.delete_message,
+                    QueueUrl=queue_url,
+                    ReceiptHandle=message["ReceiptHandle"],
+                )
+                self.logger.debug("Deleted onboarding request from SQS Queue")
+
+            if oneshot:
+                break
@@ -1,22 +1,30 @@
 import json
 import logging
+import threading
 import time
 
 import boto3
 from pythonjsonlogger import json as jsonlogger
+from slack_sdk.errors import SlackApiError
 from slack_sdk.rtm_v2 import RTMClient
 
 from emojirades.commands import BaseCommand
 from emojirades.commands.registry import CommandRegistry
 from emojirades.gamestate import Gamestate
+from emojirades.instrumentation import instrumentation
 from emojirades.persistence import (
+    DirectMessageRepository,
+    backfill_rollups,
     get_session_factory,
     get_workspace_repository,
     migrate,
+    migrate_database,
+    pool_stats,
     populate,
     transaction,
 )
 from emojirades.scorekeeper import Scorekeeper
+from emojirades.slack.dispatcher import SlackDispatcher
 from emojirades.slack.event import Event
 from emojirades.slack.slack_client import SlackClient
 
@@ -47,8 +55,10 @@ def configure_parent_logger(level, name="Emojirades"):
 
 
 class EmojiradesBot:
-    def __init__(self):
+    def __init__(self, user_cache_size=2000, fuzzy_guesses=False):
         self.logger = logging.getLogger("Emojirades.Bot")
+        self.user_cache_size = user_cache_size
+        self.fuzzy_guesses = fuzzy_guesses
 
         self.workspaces = {}
         self.onboarding_queue = None
@@ -58,125 +68,286 @@ class EmojiradesBot:
         migrate(db_uri)
 
     @staticmethod
-    def populate_db(db_uri, table, data_filename):
-        populate(db_uri, table, data_filename)
+    def populate_db(db_uri, table, data_filename, **kwargs):
+        return populate(db_uri, table, data_filename, **kwargs)
+
+    @staticmethod
+    def rollup_db(db_uri):
+        return backfill_rollups(db_uri)
+
+    @staticmethod
+    def copy_db(source_db_uri, target_db_uri, **kwargs):
+        return migrate_database(source_db_uri, target_db_uri, **kwargs)
 
     def configure_workspace(
         self,
         db_uri,
         auth_uri,
         extra_slack_kwargs=None,
+        dispatch_workers=4,
     ):
-        slack = SlackClient(auth_uri, extra_slack_kwargs=extra_slack_kwargs)
+        slack = SlackClient(
+            auth_uri,
+            extra_slack_kwargs=extra_slack_kwargs,
+            user_cache_size=self.user_cache_size,
+        )
 
         if slack.workspace_id in self.workspaces:
             self.logger.info("Deleting previous workspace: %s", slack.workspace_id)
 
             self.workspaces[slack.workspace_id]["slack"].rtm.close()
+            self.workspaces[slack.workspace_id]["dispatcher"].stop()
             time.sleep(1)
             del self.workspaces[slack.workspace_id]
 
+        try:
+            warmed = slack.warm_user_cache()
+            self.logger.info("Cached %s users for %s", warmed, slack.workspace_id)
+        except SlackApiError as e:
+            self.logger.warning("Unable to warm the user cache: %s", e.response.get("error"))
+
+        instrumentation.instrument_web_client(slack.rtm.web_client)
+
         session_factory = get_session_factory(db_uri)
+        slack.attach_im_repository(DirectMessageRepository(session_factory, slack.workspace_id))
+
         workspace = {
             "scorekeeper": Scorekeeper(session_factory, slack.workspace_id, caching=True),
-            "gamestate": Gamestate(session_factory, slack.workspace_id, caching=True),
+            "gamestate": Gamestate(
+                session_factory, slack.workspace_id, caching=True, fuzzy=self.fuzzy_guesses
+            ),
             "slack": slack,
             "session_factory": session_factory,
+            "dispatcher": SlackDispatcher(
+                workers=dispatch_workers, name=f"SlackDispatcher-{slack.workspace_id}"
+            ),
         }
 
         self.workspaces[slack.workspace_id] = workspace
 
         logger = self.logger
 
+        def event_processed(event):
+            instrumentation.finish(
+                event.trace, workspace_id=slack.workspace_id, channel=event.original_channel
+            )
+
+            hook = workspace.get("event_processed_hook")
+            if hook:
+                hook(event)
+
         def handle_event(client: RTMClient, event: dict):
             event = Event(event, client)
+            event.trace = instrumentation.start()
+
+            with instrumentation.activate(event.trace), instrumentation.span("valid"):
+                valid = event.valid()
 
-            if not event.valid():
+            if not valid:
                 client.logger.debug("Skipping event due to being invalid")
-                hook = workspace.get("event_processed_hook")
-                if hook:
-                    hook(event)
+                event_processed(event)
                 return
 
             try:
-                with transaction(session_factory):
+                outbound = EmojiradesBot.process_event(event, workspace)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                EmojiradesBot.log_event_error(logger, event, e)
+
+                outbound = None
+
+            if outbound == []:
+                event_processed(event)
+                return
+
+            def dispatch():
+                try:
+                    with instrumentation.activate(event.trace):
+                        if outbound is None:
+                            EmojiradesBot.apologise(logger, client, workspace, event)
+                            return
+
+                        for channel, response in outbound:
+                            with instrumentation.span("send"):
+                                EmojiradesBot.send_response(
+                                    client, workspace, event, channel, response
+                                )
+                except Exception as e:  # pylint: disable=broad-exception-caught
+                    EmojiradesBot.log_event_error(logger, event, e)
+                    EmojiradesBot.apologise(logger, client, workspace, event)
+                finally:
+                    event_processed(event)
+
+            workspace["dispatcher"].submit(event.channel, dispatch)
+
+        def handle_user_change(client: RTMClient, event: dict):
+            slack.update_user(event["user"])
+
+        workspace["slack"].rtm.on("message")(handle_event)
+        workspace["slack"].rtm.on("user_change")(handle_user_change)
+        workspace["slack"].rtm.on("team_join")(handle_user_change)
+
+        return workspace["slack"]
+
+    @staticmethod
+    def process_event(event: Event, workspace: dict):
+        """
+        Runs every command the event matches inside one transaction
+
+        Returns the (channel, response) pairs to send once the transaction has committed
+        """
+        logger = logging.getLogger("Emojirades.Bot")
+
+        outbound = []
+
+        with instrumentation.activate(event.trace):
+            with instrumentation.span("prefilter"):
+                ignored = EmojiradesBot.ignorable(event, workspace)
+
+            if ignored:
+                logger.debug("Ignoring event: %s", event.data)
+                return outbound
+
+            with transaction(workspace["session_factory"]):
+                with instrumentation.span("resolve_overrides"):
                     event.resolve_overrides(workspace["gamestate"])
 
-                    logger.debug("Handling event: %s", event.data)
+                logger.debug("Handling event: %s", event.data)
 
-                    for command in EmojiradesBot.match_event(event, workspace):
-                        client.logger.debug("Matched %s for event %s", command, event.data)
+                for command in EmojiradesBot.match_event(event, workspace):
+                    logger.debug("Matched %s for event %s", command, event.data)
 
-                        for channel, response in command.execute():
-                            client.logger.debug("------------------------")
-                            client.logger.debug(
-                                "Command %s executed with response: %s",
-                                command,
-                                (channel, response),
-                            )
+                    for channel, response in instrumentation.timed_iter(
+                        "execute", command.execute()
+                    ):
+                        logger.debug("------------------------")
+                        logger.debug(
+                            "Command %s executed with response: %s",
+                            command,
+                            (channel, response),
+                        )
 
-                            if channel is not None:
-                                channel = EmojiradesBot.decode_channel(channel, workspace)
-                            else:
-                                channel = EmojiradesBot.decode_channel(event.channel, workspace)
+                        outbound.append((channel, response))
 
-                            if isinstance(response, str):
-                                # Plain strings are assumed as 'chat_postMessage'
-                                client.web_client.chat_postMessage(channel=channel, text=response)
-                                continue
+        return outbound
 
-                            func = getattr(client.web_client, response["func"], None)
+    @staticmethod
+    def ignorable(event: Event, workspace: dict):
+        """
+        Whether the event can neither match a command nor change the game
 
-                            if func is None:
-                                raise RuntimeError(f"Unmapped function '{response['func']}'")
+        Decided without the database, from the command prefixes and the cached
+        gamestate. Overrides change who and where a message is from, so any
+        event that might carry one is always handled in full
+        """
+        if event.has_channel_override or event.has_user_override:
+            return False
 
-                            args = response.get("args", [])
-                            kwargs = response.get("kwargs", {})
+        matcher = CommandRegistry.matcher(workspace["slack"].bot_id, command_registry.values())
 
-                            if kwargs.get("channel") is None:
-                                kwargs["channel"] = channel
+        if matcher.prefixes is None or event.text.startswith(matcher.prefixes):
+            return False
 
-                            if response["func"] == "chat_postEphemeral" and "user" not in kwargs:
-                                kwargs["user"] = event.player_id
+        return not workspace["gamestate"].may_infer_commands(event)
 
-                            func(*args, **kwargs)
-            except Exception as e:  # pylint: disable=broad-exception-caught
-                logger.exception(
-                    "Error handling event: %s",
-                    event.data,
-                    extra={
-                        "event_type": getattr(event, "type", None),
-                        "channel": getattr(event, "channel", None),
-                        "player_id": getattr(event, "player_id", None),
-                        "error_type": e.__class__.__name__,
-                    },
-                )
+    @staticmethod
+    def prepare_response(event: Event, channel, response):
+        """
+        Turns a (channel, response) pair yielded by a command into a Web API call
 
-                try:
-                    client.web_client.chat_postMessage(
-                        channel=event.channel,
-                        text=(
-                            f"I'm sorry <@{event.player_id}>, but I had a "
-                            "problem processing that message :sob:"
-                        ),
-                    )
-                except Exception as post_err:  # pylint: disable=broad-exception-caught
-                    logger.exception(
-                        "Failed to send error message back to Slack",
-                        extra={
-                            "channel": getattr(event, "channel", None),
-                            "player_id": getattr(event, "player_id", None),
-                            "error_type": post_err.__class__.__name__,
-                        },
-                    )
-            finally:
-                hook = workspace.get("event_processed_hook")
-                if hook:
-                    hook(event)
+        Returns (func name, args, kwargs, destination), where destination is the
+        channel still to be decoded into kwargs, or None if the command gave one
+        """
+        if isinstance(response, str):
+            # Plain strings are assumed as 'chat_postMessage'
+            func, args, kwargs = "chat_postMessage", [], {"text": response}
+        else:
+            func = response["func"]
+            args = response.get("args", [])
+            kwargs = dict(response.get("kwargs", {}))
 
-        workspace["slack"].rtm.on("message")(handle_event)
+        destination = None
 
-        return workspace["slack"]
+        if kwargs.get("channel") is None:
+            destination = channel if channel is not None else event.channel
+
+        if func == "chat_postEphemeral" and "user" not in kwargs:
+            kwargs["user"] = event.player_id
+
+        return func, args, kwargs, destination
+
+    @staticmethod
+    def send_response(client: RTMClient, workspace: dict, event: Event, channel, response):
+        """
+        Sends a single (channel, response) pair yielded by a command
+        """
+        func_name, args, kwargs, destination = EmojiradesBot.prepare_response(
+            event, channel, response
+        )
+
+        func = getattr(client.web_client, func_name, None)
+
+        if func is None:
+            raise RuntimeError(f"Unmapped function '{func_name}'")
+
+        if destination is not None:
+            kwargs["channel"] = EmojiradesBot.decode_channel(destination, workspace)
+
+        try:
+            workspace["dispatcher"].call(func, *args, **kwargs)
+        except SlackApiError as e:
+            if not EmojiradesBot.stale_im(destination, e):
+                raise
+
+            # The remembered DM channel is gone, open a fresh one and try again
+            workspace["slack"].forget_im(destination)
+            kwargs["channel"] = EmojiradesBot.decode_channel(destination, workspace)
+
+            workspace["dispatcher"].call(func, *args, **kwargs)
+
+    @staticmethod
+    def stale_im(destination, error: SlackApiError):
+        """
+        Whether a Web API error means the DM channel remembered for destination has gone
+        """
+        return (
+            destination is not None
+            and destination.startswith("U")
+            and error.response.get("error") == "channel_not_found"
+        )
+
+    @staticmethod
+    def log_event_error(logger, event: Event, error: Exception):
+        logger.exception(
+            "Error handling event: %s",
+            event.data,
+            extra={
+                "event_type": getattr(event, "type", None),
+                "channel": getattr(event, "channel", None),
+                "player_id": getattr(event, "player_id", None),
+                "error_type": error.__class__.__name__,
+            },
+        )
+
+    @staticmethod
+    def apologise(logger, client: RTMClient, workspace: dict, event: Event):
+        try:
+            workspace["dispatcher"].call(
+                client.web_client.chat_postMessage,
+                channel=event.channel,
+                text=(
+                    f"I'm sorry <@{event.player_id}>, but I had a "
+                    "problem processing that message :sob:"
+                ),
+            )
+        except Exception as post_err:  # pylint: disable=broad-exception-caught
+            logger.exception(
+                "Failed to send error message back to Slack",
+                extra={
+                    "channel": getattr(event, "channel", None),
+                    "player_id": getattr(event, "player_id", None),
+                    "error_type": post_err.__class__.__name__,
+                },
+            )
 
     def configure_workspaces(self, workspaces_uri, workspace_ids, onboarding_queue, db_uri=None):
         repository = get_workspace_repository(workspaces_uri)
@@ -203,15 +374,22 @@ class EmojiradesBot:
         :param workspace: Workspace object containing state
         :return Command: The matched command to be executed
         """
-        for game_command_cls in workspace["gamestate"].infer_commands(event):
+        inferred = workspace["gamestate"].infer_commands(event)
+
+        for game_command_cls in instrumentation.timed_iter("infer_commands", inferred):
             yield game_command_cls(event, workspace)
 
-        for command_cls in command_registry.values():
-            if command_cls.match(event.text, me=workspace["slack"].bot_id):
-                if command_cls.__name__ == "HelpCommand":
-                    yield command_cls(event, workspace, commands=command_registry)
-                else:
-                    yield command_cls(event, workspace)
+        with instrumentation.span("match"):
+            matcher = CommandRegistry.matcher(workspace["slack"].bot_id, command_registry.values())
+            matched = matcher.match(event.text)
+
+        if matched:
+            command_cls, groups = matched
+
+            if command_cls.__name__ == "HelpCommand":
+                yield command_cls(event, workspace, groups=groups, commands=command_registry)
+            else:
+                yield command_cls(event, workspace, groups=groups)
 
     @staticmethod
     def decode_channel(channel: str, workspace: dict):
@@ -238,12 +416,57 @@ class EmojiradesBot:
 
         raise NotImplementedError(f"Returned channel '{channel}' wasn't decoded")
 
+    def log_pool_stats(self, interval):
+        """
+        Logs the database connection pool stats every interval seconds
+        """
+
+        def log_stats():
+            while True:
+                time.sleep(interval)
+
+                for db_uri, stats in pool_stats().items():
+                    self.logger.info(
+                        "Connection pool stats for %s: %s",
+                        db_uri,
+                        stats,
+                        extra={f"pool_{k}": v for k, v in stats.items()},
+                    )
+
+        threading.Thread(target=log_stats, name="PoolStatsLogger", daemon=True).start()
+
     def listen_for_commands(self, blocking=True):
         self.logger.info("Starting Slack monitor(s)")
 
         for workspace in self.workspaces.values():
             workspace["slack"].start(blocking=blocking)
 
+    def onboarding_workspace(self, message, repository, db_uri=None):
+        """
+        Parses an onboarding message into the kwargs for configure_workspace, or None
+        """
+        try:
+            body = json.loads(message["Body"])
+        except json.JSONDecodeError:
+            self.logger.debug("Onboarding message not JSON: %s", message["Body"])
+            return None
+
+        if "workspace_id" not in body:
+            self.logger.debug("Unable to parse onboarding payload: %s", body)
+            return None
+
+        self.logger.debug("Bot received onboarding for %s", body["workspace_id"])
+
+        workspace = repository.workspace(body["workspace_id"])
+
+        if db_uri is not None:
+            workspace["db_uri"] = db_uri
+
+        if "workspace_id" in workspace:
+            workspace.pop("workspace_id")
+
+        return workspace
+
     def listen_for_onboarding(
         self, workspaces_uri, db_uri=None, blocking=True, wait_time_seconds=20
     ):
@@ -263,26 +486,11 @@ class EmojiradesBot:
             )
 
             for message in response.get("Messages", []):
-                try:
-                    body = json.loads(message["Body"])
-                except json.JSONDecodeError:
-                    self.logger.debug("Onboarding message not JSON: %s", message["Body"])
-                    continue
+                workspace = self.onboarding_workspace(message, repository, db_uri=db_uri)
 
-                if "workspace_id" not in body:
-                    self.logger.debug("Unable to parse onboarding payload: %s", body)
+                if workspace is None:
                     continue
 
-                self.logger.debug("Bot received onboarding for %s", body["workspace_id"])
-
-                workspace = repository.workspace(body["workspace_id"])
-
-                if db_uri is not None:
-                    workspace["db_uri"] = db_uri
-
-                if "workspace_id" in workspace:
-                    workspace.pop("workspace_id")
-
                 slack = self.configure_workspace(**workspace)
                 self.workspaces[slack.workspace_id].start(blocking=False)
                 self.logger.info("Bot has onboarded workspace %s", slack.workspace_id)
@@ -4,7 +4,80 @@ import os
 import sys
 import time
 
+from emojirades.async_bot import AsyncEmojiradesBot
 from emojirades.bot import EmojiradesBot, configure_parent_logger
+from emojirades.instrumentation import instrumentation
+from emojirades.persistence import configure_engines
+from emojirades.persistence.importer import DATA_FORMATS
+
+
+def add_tuning_arguments(subparser):
+    subparser.add_argument(
+        "--db-pool-size",
+        type=int,
+        help="Connections kept open in the database pool",
+        default=os.environ.get("DB_POOL_SIZE"),
+    )
+    subparser.add_argument(
+        "--db-max-overflow",
+        type=int,
+        help="Connections allowed beyond the pool size under load",
+        default=os.environ.get("DB_MAX_OVERFLOW"),
+    )
+    subparser.add_argument(
+        "--db-pool-timeout",
+        type=float,
+        help="Seconds to wait for a pooled connection before giving up",
+        default=os.environ.get("DB_POOL_TIMEOUT"),
+    )
+    subparser.add_argument(
+        "--db-pool-recycle",
+        type=int,
+        help="Seconds after which pooled connections are replaced",
+        default=os.environ.get("DB_POOL_RECYCLE"),
+    )
+    subparser.add_argument(
+        "--db-pool-pre-ping",
+        action="store_true",
+        help="Test pooled connections before using them",
+        default=os.environ.get("DB_POOL_PRE_PING", "").lower() in ("1", "true", "yes"),
+    )
+    subparser.add_argument(
+        "--db-statement-timeout",
+        type=int,
+        help="Statement timeout in milliseconds (PostgreSQL only)",
+        default=os.environ.get("DB_STATEMENT_TIMEOUT"),
+    )
+    subparser.add_argument(
+        "--user-cache-size",
+        type=int,
+        help="Slack users cached per workspace",
+        default=int(os.environ.get("USER_CACHE_SIZE", 2000)),
+    )
+    subparser.add_argument(
+        "--db-pool-stats-interval",
+        type=int,
+        help="Seconds between logging connection pool stats, 0 disables",
+        default=int(os.environ.get("DB_POOL_STATS_INTERVAL", 0)),
+    )
+    subparser.add_argument(
+        "--fuzzy-guesses",
+        action="store_true",
+        help="Accept guesses with a typo (one edit) in each word of the emojirade",
+        default=os.environ.get("FUZZY_GUESSES", "").lower() in ("1", "true", "yes"),
+    )
+    subparser.add_argument(
+        "--instrumentation",
+        action="store_true",
+        help="Log per-event stage timings, database queries and Slack calls",
+        default=os.environ.get("INSTRUMENTATION", "").lower() in ("1", "true", "yes"),
+    )
+    subparser.add_argument(
+        "--metrics-port",
+        type=int,
+        help="Serve instrumentation totals for Prometheus on this port, 0 disables",
+        default=int(os.environ.get("METRICS_PORT", 0)),
+    )
 
 
 def main():
@@ -34,6 +107,57 @@ def main():
     )
     parser_populate.add_argument("--table", help="Name of the table", required=True)
     parser_populate.add_argument("--data-file", help="Filename we'll read from", required=True)
+    parser_populate.add_argument(
+        "--data-format",
+        choices=DATA_FORMATS,
+        help="Format of the data file, detected from its extension by default",
+    )
+    parser_populate.add_argument(
+        "--batch-size",
+        type=int,
+        default=5000,
+        help="Rows inserted (and committed) per batch",
+    )
+
+    # Rebuild Score Rollups
+    parser_rollup = subparsers.add_parser("rollup", help="Rebuild score rollups from history")
+    parser_rollup.add_argument(
+        "--db-uri",
+        help="Database URI",
+        default=os.environ.get("DATABASE_URI"),
+        required="DATABASE_URI" not in os.environ,
+    )
+
+    # Copy Database
+    parser_migrate_db = subparsers.add_parser(
+        "migrate-db", help="Copy every table into another database, e.g. SQLite to PostgreSQL"
+    )
+    parser_migrate_db.add_argument(
+        "--source-db-uri", help="Database URI to copy from", required=True
+    )
+    parser_migrate_db.add_argument(
+        "--target-db-uri",
+        help="Database URI to copy into",
+        default=os.environ.get("DATABASE_URI"),
+        required="DATABASE_URI" not in os.environ,
+    )
+    parser_migrate_db.add_argument(
+        "--batch-size",
+        type=int,
+        default=5000,
+        help="Rows read, upserted (and committed) per batch",
+    )
+    parser_migrate_db.add_argument(
+        "--checkpoint-file",
+        default="migrate-db.checkpoint.json",
+        help="Progress file, rerunning with it (and the same databases) resumes a copy",
+    )
+    parser_migrate_db.add_argument(
+        "--table",
+        dest="tables",
+        action="append",
+        help="Only copy this table, may be given multiple times",
+    )
 
     # Single Workspace
     parser_single = subparsers.add_parser("single", help="Single Workspace")
@@ -50,6 +174,8 @@ def main():
         required="AUTHENTICATION_URI" not in os.environ,
     )
 
+    add_tuning_arguments(parser_single)
+
     # Multiple Workspaces
     parser_multiple = subparsers.add_parser("multiple", help="Multiple Workspaces")
     parser_multiple.add_argument(
@@ -75,6 +201,41 @@ def main():
         default=os.environ.get("ONBOARDING_URI"),
     )
 
+    add_tuning_arguments(parser_multiple)
+
+    # Multiple Workspaces on a single event loop
+    parser_async = subparsers.add_parser("async", help="Multiple Workspaces on asyncio")
+    parser_async.add_argument(
+        "--workspaces-uri",
+        help="URI we persist workspaces to",
+        default=os.environ.get("WORKSPACES_URI"),
+        required="WORKSPACES_URI" not in os.environ,
+    )
+    parser_async.add_argument(
+        "--workspace-id",
+        dest="workspace_ids",
+        action="append",
+        help="Specific workspace IDs",
+    )
+    parser_async.add_argument(
+        "--db-uri",
+        help="Optionally override the workspace db_uri",
+        default=os.environ.get("DATABASE_URI"),
+    )
+    parser_async.add_argument(
+        "--onboarding-queue",
+        help="SQS queue containing new workspaces to onboard",
+        default=os.environ.get("ONBOARDING_URI"),
+    )
+    parser_async.add_argument(
+        "--max-workers",
+        type=int,
+        help="Threads available for processing events",
+        default=int(os.environ.get("MAX_WORKERS", 8)),
+    )
+
+    add_tuning_arguments(parser_async)
+
     args = parser.parse_args()
 
     if args.verbose >= 2:
@@ -86,7 +247,29 @@ def main():
 
     logger = configure_parent_logger(log_level, "Emojirades")
 
-    bot = EmojiradesBot()
+    bot_kwargs = {}
+
+    if args.mode in ("single", "multiple", "async"):
+        bot_kwargs["user_cache_size"] = args.user_cache_size
+        bot_kwargs["fuzzy_guesses"] = args.fuzzy_guesses
+
+        configure_engines(
+            pool_size=args.db_pool_size,
+            max_overflow=args.db_max_overflow,
+            pool_timeout=args.db_pool_timeout,
+            pool_recycle=args.db_pool_recycle,
+            pool_pre_ping=args.db_pool_pre_ping,
+            statement_timeout=args.db_statement_timeout,
+        )
+
+        # The metrics endpoint has nothing to serve without instrumentation
+        if args.instrumentation or args.metrics_port:
+            instrumentation.enable()
+
+        if args.metrics_port:
+            instrumentation.serve(args.metrics_port)
+
+    bot = EmojiradesBot(**bot_kwargs)
 
     # Configure the bot mode
     if args.mode == "init":
@@ -94,7 +277,46 @@ def main():
         bot.init_db(args.db_uri)
     elif args.mode == "populate":
         logger.debug("Running DB population")
-        bot.populate_db(args.db_uri, args.table, args.data_file)
+        bot.populate_db(
+            args.db_uri,
+            args.table,
+            args.data_file,
+            batch_size=args.batch_size,
+            data_format=args.data_format,
+        )
+        return
+    elif args.mode == "rollup":
+        logger.debug("Rebuilding score rollups")
+        for workspace_id, buckets in bot.rollup_db(args.db_uri).items():
+            logger.info("Rebuilt %s rollup buckets for %s", buckets, workspace_id)
+        return
+    elif args.mode == "migrate-db":
+        logger.debug("Copying the database")
+        for table, rows in bot.copy_db(
+            args.source_db_uri,
+            args.target_db_uri,
+            batch_size=args.batch_size,
+            checkpoint_file=args.checkpoint_file,
+            tables=args.tables,
+        ).items():
+            logger.info("Copied %s rows of %s", rows, table)
+        return
+    elif args.mode == "async":
+        logger.debug("Configuring for asyncio Multiple Workspace mode")
+        bot = AsyncEmojiradesBot(max_workers=args.max_workers, **bot_kwargs)
+        bot.configure_workspaces(
+            args.workspaces_uri,
+            args.workspace_ids,
+            args.onboarding_queue,
+            db_uri=args.db_uri,
+        )
+
+        if args.db_pool_stats_interval:
+            bot.log_pool_stats(args.db_pool_stats_interval)
+
+        logger.info("Bot is listening for commands")
+        bot.run(args.workspaces_uri, db_uri=args.db_uri)
+        return
     else:
         if args.mode == "single":
             logger.debug("Configuring for Single Workspace mode")
@@ -110,6 +332,9 @@ def main():
         else:
             parser.error("Unknown mode")
 
+    if args.db_pool_stats_interval:
+        bot.log_pool_stats(args.db_pool_stats_interval)
+
     logger.info("Bot is listening for commands")
     bot.listen_for_commands(blocking=False)
 
@@ -23,13 +23,16 @@ class BaseCommand(ABC):
             if cls not in BaseCommand.registered_commands:
                 BaseCommand.registered_commands.append(cls)
 
-    def __init__(self, event: Event, workspace: dict):
+    def __init__(self, event: Event, workspace: dict, groups=None):
         self.logger = logging.getLogger("EmojiradesBot.Command")
 
         self.scorekeeper = workspace["scorekeeper"]
         self.gamestate = workspace["gamestate"]
         self.slack = workspace["slack"]
 
+        # Groups already captured by the CommandRegistry matcher, if any
+        self.groups = groups
+
         self.args = {}
         self.prepare_args(event)
 
@@ -52,6 +55,10 @@ class BaseCommand(ABC):
         if event.original_player_id != event.player_id:
             self.args["original_user"] = event.original_player_id
 
+        if self.groups is not None:
+            self.args.update(self.groups)
+            return
+
         # Perform the command's actual match
         for pattern_raw in self.patterns:
             pattern_str = (
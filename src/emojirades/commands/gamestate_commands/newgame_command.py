@@ -20,8 +20,9 @@ class NewGameCommand(BaseCommand):
         previous_winner = self.args["old_winner"]
         current_winner = self.args["winner"]
 
-        previous_winner_name = self.slack.pretty_name(previous_winner)
-        current_winner_name = self.slack.pretty_name(current_winner)
+        names = self.slack.pretty_names([previous_winner, current_winner])
+        previous_winner_name = names[previous_winner]
+        current_winner_name = names[current_winner]
 
         if current_winner == previous_winner:
             yield (
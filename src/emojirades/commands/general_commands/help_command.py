@@ -52,7 +52,7 @@ class HelpCommand(BaseCommand):
         yield (None, {"func": "chat_postEphemeral", "kwargs": {"text": message}})
 
         game_admins = self.gamestate.get_admins(self.args["channel"])
-        admins_names = [self.slack.pretty_name(i) for i in game_admins]
+        admins_names = list(self.slack.pretty_names(game_admins).values())
 
         yield (
             None,
@@ -1,9 +1,145 @@
+import re
+import threading
+
 from emojirades.commands import BaseCommand
 
+_group_name_regex = re.compile(r"\(\?P([<=])(\w+)")
+_regex_metachars = frozenset(".^$*+?{}[]\\|()")
+
+
+def _literal_run(fragment):
+    """
+    Returns the literal text a regex fragment starts with, and how much of it was consumed
+    """
+    prefix = ""
+    pos = 0
+
+    while pos < len(fragment):
+        char = fragment[pos]
+
+        if char == "\\" and pos + 1 < len(fragment) and not fragment[pos + 1].isalnum():
+            literal, width = fragment[pos + 1], 2
+        elif char in _regex_metachars:
+            break
+        else:
+            literal, width = char, 1
+
+        quantifier = fragment[pos + width : pos + width + 1]
+
+        if quantifier in ("*", "?", "{"):
+            break
+
+        prefix += literal
+        pos += width
+
+        if quantifier == "+":
+            break
+
+    return prefix, pos
+
+
+def _literal_prefixes(pattern):
+    """
+    Returns every literal prefix a pattern can start with, or ("",) if that can't be worked out
+
+    Understands a leading literal run, optionally preceded by a group of literal
+    alternatives such as '(E|e)mojirade'
+    """
+    pattern = pattern.removeprefix("^")
+
+    if not pattern.startswith("("):
+        return (_literal_run(pattern)[0],)
+
+    end = pattern.find(")")
+    group = pattern[1:end].removeprefix("?:")
+
+    if end == -1 or "(" in group or pattern[end + 1 : end + 2] in ("*", "?", "{", "+"):
+        return ("",)
+
+    alternatives = []
+
+    for alternative in group.split("|"):
+        literal, consumed = _literal_run(alternative)
+
+        if consumed != len(alternative):
+            return ("",)
+
+        alternatives.append(literal)
+
+    rest, _ = _literal_run(pattern[end + 1 :])
+
+    return tuple(alternative + rest for alternative in alternatives)
+
+
+class CommandMatcher:
+    """
+    All command patterns for one bot id, compiled into a single alternation
+
+    Each pattern is wrapped in its own named group (with its inner groups
+    renamed so they stay unique), which identifies the command that matched
+    """
+
+    def __init__(self, commands, **kwargs):
+        self.alternatives = {}
+        self.prefixes = set()
+
+        combined = []
+
+        for command_idx, command in enumerate(commands):
+            for pattern_idx, pattern_raw in enumerate(command.patterns):
+                pattern_str = pattern_raw.format(**kwargs)
+                name = f"c{command_idx}p{pattern_idx}"
+
+                group_names = []
+
+                def rename(match, name=name, group_names=group_names):
+                    if match.group(1) == "<":
+                        group_names.append(match.group(2))
+
+                    return f"(?P{match.group(1)}{name}_{match.group(2)}"
+
+                combined.append(f"(?P<{name}>{_group_name_regex.sub(rename, pattern_str)})")
+
+                self.alternatives[name] = (
+                    command,
+                    [(f"{name}_{group_name}", group_name) for group_name in group_names],
+                )
+                self.prefixes.update(_literal_prefixes(pattern_str))
+
+        self.regex = re.compile("|".join(combined), re.DOTALL) if combined else None
+
+        # An empty prefix means some pattern could start with anything
+        if "" in self.prefixes:
+            self.prefixes = None
+        else:
+            self.prefixes = tuple(sorted(self.prefixes))
+
+    def match(self, text):
+        """
+        Returns (command, groups) for the first pattern matching text, otherwise None
+        """
+        if self.regex is None:
+            return None
+
+        if self.prefixes is not None and not text.startswith(self.prefixes):
+            return None
+
+        match = self.regex.match(text)
+
+        if match is None:
+            return None
+
+        command, groups = self.alternatives[match.lastgroup]
+
+        return command, {group_name: match.group(renamed) for renamed, group_name in groups}
+
 
 class CommandRegistry:
     registered_commands = BaseCommand.registered_commands
 
+    _matchers = {}
+    _matchers_lock = threading.Lock()
+
     @classmethod
     def command_patterns(cls, commands=None):
         if commands is None:
@@ -17,3 +153,16 @@ class CommandRegistry:
             commands = cls.registered_commands
 
         return {Command.__name__: Command for Command in commands}
+
+    @classmethod
+    def matcher(cls, bot_id, commands=None):
+        if commands is None:
+            commands = cls.command_patterns().values()
+
+        key = (bot_id, tuple(commands))
+
+        with cls._matchers_lock:
+            if (matcher := cls._matchers.get(key)) is None:
+                matcher = cls._matchers[key] = CommandMatcher(key[1], me=bot_id)
+
+        return matcher
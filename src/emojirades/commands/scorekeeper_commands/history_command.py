@@ -32,6 +32,19 @@ class HistoryCommand(BaseCommand):
             except ValueError:
                 self.args.pop("limit")
 
+    @staticmethod
+    def time_ago(delta: datetime.timedelta):
+        seconds = max(int(delta.total_seconds()), 0)
+
+        for unit, unit_seconds in (("day", 86400), ("hour", 3600), ("minute", 60)):
+            if seconds >= unit_seconds:
+                count = seconds // unit_seconds
+                break
+        else:
+            unit, count = "second", seconds
+
+        return f"{count} {unit}{'' if count == 1 else 's'} ago"
+
     def execute(self):
         yield from super().execute()
 
@@ -54,12 +67,15 @@ class HistoryCommand(BaseCommand):
         self.logger.debug("Printing history: %s", history)
 
         now = datetime.datetime.now(tz=datetime.timezone.utc)
+        names = self.slack.pretty_names(item["user_id"] for item in history)
         history_log = []
 
         for item in history:
-            ago = item["timestamp"].diff_for_humans(now).replace("before", "ago")
-            name = self.slack.pretty_name(item["user_id"])
-            command, prev, curr = item["operation"].split(",")
+            ago = self.time_ago(now - item["timestamp"])
+            name = names[item["user_id"]]
+            command = item["operation"].value
+            prev = item["previous_score"]
+            curr = item["current_score"]
 
             line = f"{ago:<18}: {name:<20}: {command:>5} {prev:>5} => {curr:>5}"
             history_log.append(line)
@@ -1,15 +1,14 @@
 import datetime
 import os
-from zoneinfo import ZoneInfo
 
-from emojirades.analytics.scoreboard import ScoreboardAnalytics
+from emojirades.analytics.time_range import TimeRange
 from emojirades.analytics.time_unit import TimeUnit
 from emojirades.commands import BaseCommand
 from emojirades.printers.scoreboard import ScoreboardPrinter
 
 
 class ScoreboardCommand(BaseCommand):
-    TZ = ZoneInfo("Australia/Melbourne")
+    TZ = TimeRange.TZ
     description = "Shows all the users scores"
 
     # pylint: disable=line-too-long
@@ -17,11 +16,19 @@ class ScoreboardCommand(BaseCommand):
         r"<@{me}>[\s]+(?:score|leader)[\s]*board(?P<all_boards>s){{0,1}}$",
         (
             r"<@{me}>[\s]+(?:score|leader)[\s]*board "
-            r"(?P<range>weekly|monthly) (?P<user_date>[0-9]{{8}})"
+            r"(?P<range>weekly|monthly|quarterly|yearly) (?P<user_date>[0-9]{{8}})"
         ),
         (
             r"<@{me}>[\s]+(?:score|leader)[\s]*board "
-            r"(?P<range>weekly|monthly|all time|alltime|all|everything)"
+            r"last (?P<last_count>[0-9]{{1,3}})(?P<last_unit>[dw])$"
+        ),
+        (
+            r"<@{me}>[\s]+(?:score|leader)[\s]*board "
+            r"(?P<range_start>[0-9]{{8}})\.\.(?P<range_end>[0-9]{{8}})$"
+        ),
+        (
+            r"<@{me}>[\s]+(?:score|leader)[\s]*board "
+            r"(?P<range>weekly|monthly|quarterly|yearly|all time|alltime|all|everything)"
         ),
     )
 
@@ -29,13 +36,15 @@ class ScoreboardCommand(BaseCommand):
         ("<@{me}> scoreboard", "Show current weekly scoreboard (default)"),
         ("<@{me}> scoreboards", "Show all scoreboards"),
         (
-            "<@{me}> scoreboard weekly|monthly|all time",
+            "<@{me}> scoreboard weekly|monthly|quarterly|yearly|all time",
             "Show user scores on different brackets",
         ),
         (
-            "<@{me}> scoreboard weekly|monthly YYYYMMDD",
-            "Show user weekly or monthly scores from a different date",
+            "<@{me}> scoreboard weekly|monthly|quarterly|yearly YYYYMMDD",
+            "Show user scores for the bracket containing a different date",
         ),
+        ("<@{me}> scoreboard last 7d|4w", "Show user scores over the last N days or weeks"),
+        ("<@{me}> scoreboard YYYYMMDD..YYYYMMDD", "Show user scores between two dates"),
         ("<@{me}> leaderboard", "Alternative name for scoreboard"),
     ]
 
@@ -47,7 +56,9 @@ class ScoreboardCommand(BaseCommand):
         if self.args.get("range") in all_time_values:
             self.args["range"] = "all time"
 
-        if self.args.get("all_boards"):
+        if self.args.get("last_count") or self.args.get("range_start"):
+            self.time_units = (TimeUnit.CUSTOM,)
+        elif self.args.get("all_boards"):
             self.time_units = (
                 TimeUnit.WEEKLY,
                 TimeUnit.MONTHLY,
@@ -56,6 +67,36 @@ class ScoreboardCommand(BaseCommand):
         else:
             self.time_units = (TimeUnit(self.args.get("range", TimeUnit.WEEKLY.value)),)
 
+    def today(self):
+        date = os.environ.get("EMOJIRADE_MOCK_DATE")
+
+        if date is None:
+            return datetime.datetime.now(tz=self.TZ).date()
+
+        return datetime.datetime.strptime(date, "%Y%m%d").date()
+
+    def get_date_range(self):
+        """
+        Returns the first and last day (inclusive) of a custom or rolling range
+        """
+        if self.args.get("last_count"):
+            days = int(self.args["last_count"]) * (7 if self.args["last_unit"] == "w" else 1)
+
+            if days < 1:
+                raise ValueError("The range needs to cover at least one day")
+
+            end_date = self.today()
+
+            return end_date - datetime.timedelta(days=days - 1), end_date
+
+        start_date = datetime.datetime.strptime(self.args["range_start"], "%Y%m%d").date()
+        end_date = datetime.datetime.strptime(self.args["range_end"], "%Y%m%d").date()
+
+        if start_date > end_date:
+            raise ValueError("The start of the range needs to be before the end")
+
+        return start_date, end_date
+
     def get_scoreboard(self, time_unit: TimeUnit):
         """
         Given a time unit and a date, return the appropriate scoreboard
@@ -65,9 +106,6 @@ class ScoreboardCommand(BaseCommand):
         if time_unit == TimeUnit.ALL_TIME:
             return [(b, c) for (a, b, c) in self.scorekeeper.scoreboard(self.args["channel"])], None
 
-        history = self.scorekeeper.history_all(self.args["channel"])
-        scoreboard = ScoreboardAnalytics(history)
-
         mock_date = os.environ.get("EMOJIRADE_MOCK_DATE")
 
         if mock_date := os.environ.get("EMOJIRADE_MOCK_DATE"):
@@ -81,11 +119,30 @@ class ScoreboardCommand(BaseCommand):
         parsed_date = datetime.datetime.strptime(date, "%Y%m%d").astimezone(tz=self.TZ)
         self.logger.debug("Scoreboard date was set to: %s", parsed_date)
 
-        return (scoreboard.get(parsed_date, time_unit), parsed_date)
+        scoreboard = self.scorekeeper.period_scoreboard(
+            self.args["channel"], parsed_date, time_unit
+        )
+
+        return (scoreboard, parsed_date)
 
     def execute(self):
         yield from super().execute()
 
+        if self.time_units == (TimeUnit.CUSTOM,):
+            try:
+                date_range = self.get_date_range()
+            except ValueError as e:
+                yield None, f"Sorry <@{self.args['user']}>, I can't show that range: {e}"
+                return
+
+            scoreboard = self.scorekeeper.range_scoreboard(self.args["channel"], *date_range)
+            printer = ScoreboardPrinter(
+                scoreboard, self.slack, TimeUnit.CUSTOM, None, date_range=date_range
+            )
+
+            yield from printer.print()
+            return
+
         for time_unit in self.time_units:
             scoreboard, parsed_date = self.get_scoreboard(time_unit)
             printer = ScoreboardPrinter(scoreboard, self.slack, time_unit, parsed_date)
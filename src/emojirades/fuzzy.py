@@ -0,0 +1,105 @@
+"""
+Near-miss matching of guesses against an emojirade's sanitized alternatives
+
+A guess matches if it contains every word of an alternative, in order, with
+each word at most one edit (insertion, deletion, substitution or adjacent
+transposition) away. Short words have to be exact, otherwise nearly every
+guess would match something
+"""
+
+# Words shorter than this have to be spelt exactly
+FUZZY_MIN_LENGTH = 4
+
+
+def deletes(word):
+    """
+    The word itself plus every way of deleting a single character from it
+    """
+    return {word, *(word[:i] + word[i + 1 :] for i in range(len(word)))}
+
+
+def within_one_edit(a, b):
+    """
+    Whether the (restricted) Damerau-Levenshtein distance between a and b is at most 1
+    """
+    if a == b:
+        return True
+
+    if abs(len(a) - len(b)) > 1:
+        return False
+
+    if len(a) > len(b):
+        a, b = b, a
+
+    # First differing position
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+
+    if len(a) < len(b):
+        # A single insertion into a
+        return a[i:] == b[i + 1 :]
+
+    # A single substitution, or swapping two adjacent characters
+    return a[i + 1 :] == b[i + 1 :] or (
+        i + 1 < len(a) and a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2 :] == b[i + 2 :]
+    )
+
+
+class FuzzyIndex:
+    """
+    Symmetric delete index over the words of an emojirade's alternatives
+
+    Built once when the emojirade is set. Each word of a guess is then looked up
+    under its own single deletes, so the cost per guess follows the guess length
+    rather than how many alternatives there are
+    """
+
+    def __init__(self, emojirades, min_length=FUZZY_MIN_LENGTH):
+        self.min_length = min_length
+        self.alternatives = [tuple(i.split()) for i in emojirades if i.split()]
+
+        # Each alternative is tried only where a guess word matches its first word
+        self.by_first_word = {}
+        self.variants = {}
+
+        for alternative in self.alternatives:
+            self.by_first_word.setdefault(alternative[0], []).append(alternative)
+
+            for word in alternative:
+                keys = deletes(word) if len(word) >= min_length else (word,)
+
+                for key in keys:
+                    self.variants.setdefault(key, set()).add(word)
+
+    def words_matching(self, guess_word):
+        """
+        The emojirade words guess_word is close enough to
+        """
+        matching = set()
+
+        for key in deletes(guess_word):
+            for word in self.variants.get(key, ()):
+                if word == guess_word or (
+                    len(word) >= self.min_length and within_one_edit(word, guess_word)
+                ):
+                    matching.add(word)
+
+        return matching
+
+    def match(self, guess):
+        guess_words = guess.split()
+        matching = [self.words_matching(word) for word in guess_words]
+
+        for start, words in enumerate(matching):
+            for first_word in words:
+                for alternative in self.by_first_word.get(first_word, ()):
+                    if start + len(alternative) > len(matching):
+                        continue
+
+                    if all(
+                        word in matching[start + offset] for offset, word in enumerate(alternative)
+                    ):
+                        return True
+
+        return False
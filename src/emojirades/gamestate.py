@@ -5,11 +5,11 @@ from emojirades.commands.gamestate_commands.inferred_correct_guess_command impor
     InferredCorrectGuessCommand,
 )
 from emojirades.helpers import (
+    EmojiradeMatcher,
     ScottFactorExceededException,
     match_emoji,
-    match_emojirade,
-    sanitize_text,
 )
+from emojirades.normalization import sanitize_text
 from emojirades.persistence import GamestateRepository, GamestateStep
 from emojirades.slack.event import Event
 
@@ -48,9 +48,18 @@ class Gamestate:
     class InvalidStateException(Exception):
         pass
 
-    def __init__(self, session_factory, workspace_id, caching=False):
+    def __init__(self, session_factory, workspace_id, caching=False, fuzzy=False):
         self.repository = GamestateRepository(session_factory, workspace_id, caching=caching)
 
+        # Whether near misses of the emojirade count as correct guesses
+        self.fuzzy = fuzzy
+
+        # Channel -> (stored emojirade, matcher compiled from it)
+        self.matchers = {}
+
+        # Channels where someone has guessed this round, only persisted on the next transition
+        self.guessed = set()
+
         self.logger = logging.getLogger("EmojiradesBot.gamestate.Gamestate")
 
     def in_progress(self, channel):
@@ -66,6 +75,32 @@ class Gamestate:
         valid_steps = (GamestateStep.GUESSING,)
         return self.repository.get_xyz(channel, "step") in valid_steps
 
+    def may_infer_commands(self, event: Event):
+        """
+        Whether infer_commands could act on the event, judged from the cached gamestate only
+
+        Assumes it could whenever the channel's gamestate isn't cached
+        """
+        channel = event.channel
+
+        if not (isinstance(channel, str) and channel[0] in ("G", "C")):
+            return False
+
+        snapshot = self.repository.cached_snapshot(channel)
+
+        if snapshot is None:
+            return True
+
+        # Only the winner posting emojis moves the game on from PROVIDED
+        if snapshot.step == GamestateStep.PROVIDED:
+            return event.player_id == snapshot.current_winner
+
+        # The winners can't guess their own emojirade
+        if snapshot.step == GamestateStep.GUESSING:
+            return event.player_id not in (snapshot.previous_winner, snapshot.current_winner)
+
+        return False
+
     def infer_commands(self, event: Event):
         """
         Keeps tabs on the conversation and updates gamestate if required
@@ -96,33 +131,23 @@ class Gamestate:
             self.repository.get_xyz(channel, "current_winner"),
         ):
             guess = sanitize_text(text)
+            matcher = self.get_matcher(channel)
 
             try:
-                emojirade = json.loads(self.repository.get_xyz(channel, "emojirade"))
-
-                if match_emojirade(guess, emojirade):
-                    self.logger.debug(
-                        "emojirades='%s' guess='%s' status='correct'",
-                        "|".join(emojirade),
-                        guess,
-                    )
+                if matcher.match(guess):
+                    self.logger.debug("emojirades='%s' guess='%s' status='correct'", matcher, guess)
 
                     yield InferredCorrectGuessCommand
                 else:
                     self.logger.debug(
-                        "emojirades='%s' guess='%s' status='incorrect'",
-                        "|".join(emojirade),
-                        guess,
+                        "emojirades='%s' guess='%s' status='incorrect'", matcher, guess
                     )
             except ScottFactorExceededException:
                 self.logger.debug(
-                    "emojirade='%s' guess='%s' status='scott factor exceeded'",
-                    "|".join(emojirade),
-                    guess,
+                    "emojirade='%s' guess='%s' status='scott factor exceeded'", matcher, guess
                 )
 
-            if self.repository.is_first_guess(channel):
-                self.repository.set_xyz(channel, user, "first_guess", False)
+            self.guessed.add(channel)
 
     def get_admins(self, channel):
         return json.loads(self.repository.get_xyz(channel, "admins") or "[]")
@@ -144,10 +169,30 @@ class Gamestate:
 
     def new_game(self, channel, previous_winner, current_winner):
         self.repository.new_game(channel, previous_winner, current_winner)
+        self.guessed.discard(channel)
+
+    def is_first_guess(self, channel):
+        return channel not in self.guessed and bool(self.repository.is_first_guess(channel))
 
     def get_emojirade(self, channel):
         return json.loads(self.repository.get_xyz(channel, "emojirade"))
 
+    def get_matcher(self, channel):
+        """
+        Returns the guess matcher for the channel's emojirade, compiled once per emojirade
+        """
+        emojirade = self.repository.get_xyz(channel, "emojirade")
+        compiled = self.matchers.get(channel)
+
+        # Keyed on the stored value, so a rolled back or changed emojirade is never matched
+        if compiled is None or compiled[0] != emojirade:
+            compiled = self.matchers[channel] = (
+                emojirade,
+                EmojiradeMatcher(json.loads(emojirade), fuzzy=self.fuzzy),
+            )
+
+        return compiled[1]
+
     def set_emojirade(self, channel, emojirades, user):
         valid_steps = (GamestateStep.WAITING, GamestateStep.PROVIDED)
         step = self.repository.get_xyz(channel, "step")
@@ -157,11 +202,16 @@ class Gamestate:
                 f"Expecting state to be WAITING or PROVIDED, was {step}"
             )
 
+        sanitized = [sanitize_text(i) for i in emojirades]
+        emojirade = json.dumps(sanitized)
+
+        self.matchers[channel] = (emojirade, EmojiradeMatcher(sanitized, fuzzy=self.fuzzy))
+
         self.repository.set_many_xyz(
             channel,
             user,
             [
-                ("emojirade", json.dumps([sanitize_text(i) for i in emojirades])),
+                ("emojirade", emojirade),
                 ("raw_emojirade", json.dumps(emojirades)),
                 ("step", GamestateStep.PROVIDED),
             ],
@@ -183,6 +233,8 @@ class Gamestate:
             ],
         )
 
+        self.guessed.discard(channel)
+
     def correct_guess(self, channel, winner):
         valid_steps = (GamestateStep.GUESSING,)
         step = self.repository.get_xyz(channel, "step")
@@ -190,17 +242,21 @@ class Gamestate:
         if step not in valid_steps:
             raise self.InvalidStateException(f"Expecting state to be GUESSING, was {step}")
 
-        self.repository.set_many_xyz(
-            channel,
-            winner,
-            [
-                ("previous_winner", self.repository.get_xyz(channel, "current_winner")),
-                ("current_winner", winner),
-                ("step", GamestateStep.WAITING),
-                ("emojirade", None),
-                ("raw_emojirade", None),
-            ],
-        )
+        pairs = [
+            ("previous_winner", self.repository.get_xyz(channel, "current_winner")),
+            ("current_winner", winner),
+            ("step", GamestateStep.WAITING),
+            ("emojirade", None),
+            ("raw_emojirade", None),
+        ]
+
+        # Earlier guesses this round only reach the database along with the win
+        if channel in self.guessed:
+            pairs.append(("first_guess", False))
+
+        self.repository.set_many_xyz(channel, winner, pairs)
+
+        self.matchers.pop(channel, None)
 
     def fixwinner(self, channel, winner):
         loser = self.repository.get_xyz(channel, "current_winner")
@@ -1,9 +1,9 @@
 import datetime
 import re
-import string
 from functools import lru_cache
 
-from unidecode import unidecode
+from emojirades.fuzzy import FuzzyIndex
+from emojirades.normalization import sanitize_text as sanitize_text
 
 
 def ensure_utc(dt: datetime.datetime) -> datetime.datetime:
@@ -16,8 +16,6 @@ class ScottFactorExceededException(Exception):
     pass
 
 
-remove_punctuation = str.maketrans("", "", string.punctuation)
-
 emoji_regex = re.compile(r":[a-zA-Z0-9-_']+:")
 
 
@@ -28,33 +26,37 @@ def _get_compiled_rade(emojirades_tuple):
     return re.compile(rf"\b({combined_pattern})\b")
 
 
-def sanitize_text(text):
-    # unidecode will normalize to ASCII
-    normalized = unidecode(text)
+class EmojiradeMatcher:
+    """
+    Matches guesses against the sanitized alternatives of one emojirade
 
-    # Lowercase the text
-    lowered = normalized.lower()
+    Built once per emojirade, each guess is then a length check and a single scan.
+    With fuzzy set, guesses the scan misses are looked up in a near-miss index
+    """
 
-    # Remove any random misc chars we deem unnessesary
-    scrubbed = lowered.translate(remove_punctuation)
+    def __init__(self, emojirades, scott_factor=2, fuzzy=False):
+        self.emojirades = tuple(emojirades)
+        self.max_guess_length = max(len(i) for i in self.emojirades) * scott_factor
 
-    # Strip excess whitespace
-    stripped = " ".join(scrubbed.split())
+        # Use a sorted tuple as cache key so alternatives in any order share a pattern
+        self.pattern = _get_compiled_rade(tuple(sorted(self.emojirades)))
+        self.fuzzy_index = FuzzyIndex(self.emojirades) if fuzzy else None
 
-    return stripped
+    def match(self, guess):
+        if len(guess) > self.max_guess_length:
+            raise ScottFactorExceededException("Guess exceeded the Scott Factor")
 
+        if self.pattern.search(guess) is not None:
+            return True
 
-def match_emojirade(guess, emojirades, scott_factor=2):
-    longest_emojirade = max(len(i) for i in emojirades)
+        return self.fuzzy_index is not None and self.fuzzy_index.match(guess)
 
-    if len(guess) > (longest_emojirade * scott_factor):
-        raise ScottFactorExceededException("Guess exceeded the Scott Factor")
+    def __str__(self):
+        return "|".join(self.emojirades)
 
-    # Use a tuple as cache key since emojirades is a list
-    cache_key = tuple(sorted(emojirades))
-    pattern = _get_compiled_rade(cache_key)
 
-    return bool(pattern.search(guess))
+def match_emojirade(guess, emojirades, scott_factor=2, fuzzy=False):
+    return EmojiradeMatcher(emojirades, scott_factor=scott_factor, fuzzy=fuzzy).match(guess)
 
 
 def match_emoji(text):
@@ -0,0 +1,360 @@
+"""
+Optional per-event timing spans, database query and Slack call counters
+
+Disabled by default, every hook is then a cheap no-op. Once enabled each
+handled event logs its stage timings as structured fields, and running
+totals can be served in the Prometheus text format
+"""
+
+import bisect
+import contextlib
+import contextvars
+import functools
+import logging
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+# Upper bounds (seconds) of the event latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current_trace = contextvars.ContextVar("emojirades_trace", default=None)
+
+
+class EventTrace:
+    """
+    Everything measured while handling a single event, possibly across threads
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()
+
+        self.spans = defaultdict(float)
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.slack_calls = defaultdict(int)
+        self.slack_seconds = defaultdict(float)
+
+    def add_span(self, name, seconds):
+        with self.lock:
+            self.spans[name] += seconds
+
+    def add_query(self, seconds):
+        with self.lock:
+            self.db_queries += 1
+            self.db_seconds += seconds
+
+    def add_slack_call(self, method, seconds):
+        with self.lock:
+            self.slack_calls[method] += 1
+            self.slack_seconds[method] += seconds
+
+    def fields(self, elapsed):
+        fields = {
+            "event_ms": round(elapsed * 1000, 3),
+            "db_queries": self.db_queries,
+            "db_ms": round(self.db_seconds * 1000, 3),
+            "slack_calls": sum(self.slack_calls.values()),
+            "slack_ms": round(sum(self.slack_seconds.values()) * 1000, 3),
+        }
+
+        for name, seconds in self.spans.items():
+            fields[f"span_{name}_ms"] = round(seconds * 1000, 3)
+
+        return fields
+
+
+class Instrumentation:
+    def __init__(self):
+        self.logger = logging.getLogger("Emojirades.Instrumentation")
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.events = 0
+            self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+            self.latency_seconds = 0.0
+            self.span_counts = defaultdict(int)
+            self.span_seconds = defaultdict(float)
+            self.db_queries = 0
+            self.db_seconds = 0.0
+            self.slack_calls = defaultdict(int)
+            self.slack_seconds = defaultdict(float)
+
+    def enable(self):
+        if self.enabled:
+            return
+
+        # Listening on the classes covers every engine and session, including later ones
+        event.listen(Engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(Session, "before_flush", self._before_flush)
+        event.listen(Session, "after_flush_postexec", self._after_flush)
+        event.listen(Session, "before_commit", self._before_commit)
+        event.listen(Session, "after_commit", self._after_commit)
+
+        self.enabled = True
+
+    def disable(self):
+        if not self.enabled:
+            return
+
+        event.remove(Engine, "before_cursor_execute", self._before_cursor_execute)
+        event.remove(Engine, "after_cursor_execute", self._after_cursor_execute)
+        event.remove(Session, "before_flush", self._before_flush)
+        event.remove(Session, "after_flush_postexec", self._after_flush)
+        event.remove(Session, "before_commit", self._before_commit)
+        event.remove(Session, "after_commit", self._after_commit)
+
+        self.enabled = False
+
+    def start(self):
+        """
+        Starts tracing an event, returns None while disabled
+        """
+        return EventTrace() if self.enabled else None
+
+    @contextlib.contextmanager
+    def activate(self, trace):
+        """
+        Makes trace the one measurements are added to within this thread or task
+        """
+        if trace is None:
+            yield
+            return
+
+        token = _current_trace.set(trace)
+
+        try:
+            yield
+        finally:
+            _current_trace.reset(token)
+
+    @contextlib.contextmanager
+    def span(self, name):
+        if (trace := _current_trace.get()) is None:
+            yield
+            return
+
+        started = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            trace.add_span(name, time.perf_counter() - started)
+
+    def timed_iter(self, name, iterable):
+        """
+        Adds the time spent producing each item of a lazy iterable to a span
+        """
+        if _current_trace.get() is None:
+            yield from iterable
+            return
+
+        iterator = iter(iterable)
+
+        while True:
+            with self.span(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+
+            yield item
+
+    def finish(self, trace, **fields):
+        """
+        Logs a finished event's measurements and adds them to the running totals
+        """
+        if trace is None:
+            return
+
+        elapsed = time.perf_counter() - trace.started
+
+        with self.lock:
+            self.events += 1
+            self.latency_buckets[bisect.bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+            self.latency_seconds += elapsed
+
+            for name, seconds in trace.spans.items():
+                self.span_counts[name] += 1
+                self.span_seconds[name] += seconds
+
+            self.db_queries += trace.db_queries
+            self.db_seconds += trace.db_seconds
+
+            for method, calls in trace.slack_calls.items():
+                self.slack_calls[method] += calls
+                self.slack_seconds[method] += trace.slack_seconds[method]
+
+        self.logger.info(
+            "Handled event in %.1fms", elapsed * 1000, extra={**fields, **trace.fields(elapsed)}
+        )
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if _current_trace.get() is not None:
+            conn.info.setdefault("emojirades_query_started", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if (trace := _current_trace.get()) is None:
+            return
+
+        if started := conn.info.get("emojirades_query_started"):
+            trace.add_query(time.perf_counter() - started.pop())
+
+    def _before_flush(self, session, flush_context, instances):
+        if _current_trace.get() is not None:
+            session.info["emojirades_flush_started"] = time.perf_counter()
+
+    def _after_flush(self, session, flush_context):
+        if (started := session.info.pop("emojirades_flush_started", None)) is not None:
+            if (trace := _current_trace.get()) is not None:
+                trace.add_span("flush", time.perf_counter() - started)
+
+    def _before_commit(self, session):
+        if _current_trace.get() is not None:
+            session.info["emojirades_commit_started"] = time.perf_counter()
+
+    def _after_commit(self, session):
+        if (started := session.info.pop("emojirades_commit_started", None)) is not None:
+            if (trace := _current_trace.get()) is not None:
+                trace.add_span("commit", time.perf_counter() - started)
+
+    def instrument_web_client(self, web_client):
+        """
+        Times every Web API call made through a (sync) WebClient
+        """
+        api_call = web_client.api_call
+
+        @functools.wraps(api_call)
+        def timed_api_call(api_method, *args, **kwargs):
+            if (trace := _current_trace.get()) is None:
+                return api_call(api_method, *args, **kwargs)
+
+            started = time.perf_counter()
+
+            try:
+                return api_call(api_method, *args, **kwargs)
+            finally:
+                trace.add_slack_call(api_method, time.perf_counter() - started)
+
+        web_client.api_call = timed_api_call
+
+    def instrument_async_web_client(self, web_client):
+        """
+        Times every Web API call made through an AsyncWebClient
+        """
+        api_call = web_client.api_call
+
+        @functools.wraps(api_call)
+        async def timed_api_call(api_method, *args, **kwargs):
+            if (trace := _current_trace.get()) is None:
+                return await api_call(api_method, *args, **kwargs)
+
+            started = time.perf_counter()
+
+            try:
+                return await api_call(api_method, *args, **kwargs)
+            finally:
+                trace.add_slack_call(api_method, time.perf_counter() - started)
+
+        web_client.api_call = timed_api_call
+
+    def prometheus(self):
+        """
+        Renders the running totals in the Prometheus text exposition format
+        """
+        with self.lock:
+            lines = [
+                "# HELP emojirades_event_seconds Time taken to handle an event",
+                "# TYPE emojirades_event_seconds histogram",
+            ]
+
+            cumulative = 0
+
+            for bound, count in zip((*LATENCY_BUCKETS, "+Inf"), self.latency_buckets):
+                cumulative += count
+                lines.append(f'emojirades_event_seconds_bucket{{le="{bound}"}} {cumulative}')
+
+            lines += [
+                f"emojirades_event_seconds_sum {self.latency_seconds}",
+                f"emojirades_event_seconds_count {self.events}",
+                "# HELP emojirades_stage_seconds Time spent in each stage of handling events",
+                "# TYPE emojirades_stage_seconds summary",
+            ]
+
+            for name in sorted(self.span_seconds):
+                lines.append(
+                    f'emojirades_stage_seconds_sum{{stage="{name}"}} {self.span_seconds[name]}'
+                )
+                lines.append(
+                    f'emojirades_stage_seconds_count{{stage="{name}"}} {self.span_counts[name]}'
+                )
+
+            lines += [
+                "# HELP emojirades_db_queries_total Database queries made while handling events",
+                "# TYPE emojirades_db_queries_total counter",
+                f"emojirades_db_queries_total {self.db_queries}",
+                "# HELP emojirades_db_query_seconds_total Time spent in those queries",
+                "# TYPE emojirades_db_query_seconds_total counter",
+                f"emojirades_db_query_seconds_total {self.db_seconds}",
+                "# HELP emojirades_slack_calls_total Slack Web API calls made per method",
+                "# TYPE emojirades_slack_calls_total counter",
+            ]
+
+            for method in sorted(self.slack_calls):
+                lines.append(
+                    f'emojirades_slack_calls_total{{method="{method}"}} {self.slack_calls[method]}'
+                )
+
+            lines += [
+                "# HELP emojirades_slack_call_seconds_total Time spent in those calls",
+                "# TYPE emojirades_slack_call_seconds_total counter",
+            ]
+
+            for method in sorted(self.slack_seconds):
+                lines.append(
+                    f'emojirades_slack_call_seconds_total{{method="{method}"}} '
+                    f"{self.slack_seconds[method]}"
+                )
+
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host=""):
+        """
+        Serves the running totals on http://host:port/metrics from a daemon thread
+        """
+        instrumentation = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+
+                body = instrumentation.prometheus().encode("utf-8")
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+                instrumentation.logger.debug("Metrics request: " + format, *args)
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, name="MetricsServer", daemon=True).start()
+
+        return server
+
+
+instrumentation = Instrumentation()
@@ -0,0 +1,27 @@
+import string
+from functools import lru_cache
+
+from unidecode import unidecode
+
+# Lowercases and drops punctuation in a single pass over the ASCII bytes
+_ascii_lowercase = bytes.maketrans(string.ascii_uppercase.encode(), string.ascii_lowercase.encode())
+_ascii_punctuation = string.punctuation.encode()
+
+# Guess storms tend to repeat the same few messages
+SANITIZE_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=SANITIZE_CACHE_SIZE)
+def sanitize_text(text):
+    """
+    Normalizes text for comparing guesses to emojirades
+
+    Transliterates to ASCII, lowercases, removes punctuation and collapses whitespace
+    """
+    # unidecode leaves ASCII untouched, so it's only needed for anything else
+    if not text.isascii():
+        text = unidecode(text)
+
+    scrubbed = text.encode("ascii").translate(_ascii_lowercase, _ascii_punctuation)
+
+    return " ".join(scrubbed.decode("ascii").split())
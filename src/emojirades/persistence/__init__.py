@@ -1,3 +1,12 @@
+from .importer import (
+    populate as populate,
+)
+from .migrator import (
+    migrate_database as migrate_database,
+)
+from .models import (
+    DirectMessageModel as DirectMessageModel,
+)
 from .models import (
     GamestateHistoryModel as GamestateHistoryModel,
 )
@@ -13,6 +22,18 @@ from .models import (
 from .models import (
     ScoreboardModel as ScoreboardModel,
 )
+from .models import (
+    ScoreboardOperation as ScoreboardOperation,
+)
+from .models import (
+    ScoreboardRollupModel as ScoreboardRollupModel,
+)
+from .orm import (
+    backfill_rollups as backfill_rollups,
+)
+from .orm import (
+    configure_engines as configure_engines,
+)
 from .orm import (
     get_engine as get_engine,
 )
@@ -23,11 +44,14 @@ from .orm import (
     migrate as migrate,
 )
 from .orm import (
-    populate as populate,
+    pool_stats as pool_stats,
 )
 from .orm import (
     transaction as transaction,
 )
+from .repositories import (
+    DirectMessageRepository as DirectMessageRepository,
+)
 from .repositories import (
     GamestateRepository as GamestateRepository,
 )
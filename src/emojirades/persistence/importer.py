@@ -0,0 +1,356 @@
+import csv
+import datetime
+import io
+import json
+import logging
+import os
+import time
+
+from sqlalchemy import Boolean, Identity, Integer, insert
+
+from .models import (
+    GamestateHistoryModel,
+    GamestateModel,
+    GamestateStep,
+    ScoreboardHistoryModel,
+    ScoreboardModel,
+    ScoreboardOperation,
+)
+from .models.base import AwareDateTime
+from .orm import get_engine, get_session_factory
+from .repositories import ScorekeeperRepository
+
+logger = logging.getLogger("EmojiradesBot.persistence.importer")
+
+DATA_FORMATS = ("json", "ndjson", "csv")
+
+
+def _split_legacy_operation(row):
+    # Legacy dumps store scoreboard operations as 'op,previous,current'
+    if "," in row["operation"]:
+        operation, previous_score, current_score = ScoreboardOperation.from_legacy(row["operation"])
+        row.update(
+            operation=operation,
+            previous_score=previous_score,
+            current_score=current_score,
+        )
+    else:
+        row["operation"] = ScoreboardOperation[row["operation"]]
+
+
+def _gamestate_step(row):
+    row["step"] = getattr(GamestateStep, row["step"])
+
+
+# table name => (model, function fixing up each row in place)
+TABLES = {
+    "gamestate": (GamestateModel, _gamestate_step),
+    "gamestate_history": (GamestateHistoryModel, None),
+    "scoreboard": (ScoreboardModel, None),
+    "scoreboard_history": (ScoreboardHistoryModel, _split_legacy_operation),
+}
+
+
+def detect_format(data_filename):
+    extension = os.path.splitext(data_filename)[1].lower()
+
+    if extension in (".ndjson", ".jsonl"):
+        return "ndjson"
+
+    if extension == ".csv":
+        return "csv"
+
+    return "json"
+
+
+def iter_json_array(data_file, chunk_size=1 << 16):
+    """
+    Yields the items of a top level JSON array without loading the whole document
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    started = False
+    eof = False
+
+    while True:
+        # Skip to the next item, or the end of the array
+        while position < len(buffer) and buffer[position] in " \t\r\n,[]":
+            if not started:
+                if buffer[position] not in " \t\r\n[":
+                    raise ValueError("Expected a JSON array")
+
+                started = buffer[position] == "["
+            elif buffer[position] == "[":
+                break
+            elif buffer[position] == "]":
+                return
+
+            position += 1
+
+        if position < len(buffer):
+            if not started:
+                raise ValueError("Expected a JSON array")
+
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # A number running to the end of the buffer may continue in the next chunk
+                if end < len(buffer) or eof:
+                    yield item
+                    position = end
+                    continue
+
+        if eof:
+            raise json.JSONDecodeError("Unterminated JSON array", buffer, position)
+
+        # The item is split across chunks, keep reading until it's whole
+        chunk = data_file.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def iter_ndjson(data_file):
+    for line in data_file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_csv(data_file):
+    for row in csv.DictReader(data_file):
+        # CSV can't tell an empty value from a missing one
+        yield {key: value for key, value in row.items() if value != ""}
+
+
+def iter_records(data_file, data_format):
+    if data_format == "json":
+        return iter_json_array(data_file)
+
+    if data_format == "ndjson":
+        return iter_ndjson(data_file)
+
+    if data_format == "csv":
+        return iter_csv(data_file)
+
+    raise RuntimeError(f"Unknown data format {data_format}?")
+
+
+def _convert(column, value):
+    """
+    Converts a value read from a text format into what the column expects
+    """
+    if not isinstance(value, str):
+        return value
+
+    if isinstance(column.type, AwareDateTime):
+        return datetime.datetime.fromisoformat(value)
+
+    if isinstance(column.type, Integer):
+        return int(value)
+
+    if isinstance(column.type, Boolean):
+        return value.lower() in ("1", "t", "true", "y", "yes")
+
+    return value
+
+
+def _column_defaults(table):
+    """
+    Client side defaults, applied up front so every row in a batch has the same columns
+    """
+    defaults = {}
+
+    for column in table.columns:
+        if column.default is None or isinstance(column.default, Identity):
+            continue
+
+        if column.default.is_callable:
+            defaults[column.name] = lambda default=column.default: default.arg(None)
+        elif column.default.is_scalar:
+            defaults[column.name] = lambda default=column.default: default.arg
+
+    return defaults
+
+
+def prepare_rows(table, records, row_func=None):
+    defaults = _column_defaults(table)
+
+    for record in records:
+        if row_func is not None:
+            row_func(record)
+
+        row = {key: _convert(table.c[key], value) for key, value in record.items()}
+
+        for key, default in defaults.items():
+            if key not in row:
+                row[key] = default()
+
+        yield row
+
+
+def _copy_value(value):
+    if value is None:
+        return ""
+
+    if isinstance(value, bool):
+        return "true" if value else "false"
+
+    if isinstance(value, datetime.datetime | datetime.date):
+        value = value.isoformat()
+
+    # Quoted values are never NULL, even when empty
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def _copy(connection, table, rows):
+    """
+    Streams rows through PostgreSQL's COPY, values go through the same bind
+    processing as an INSERT would
+    """
+    dialect = connection.dialect
+    columns = list(rows[0])
+    processors = [
+        table.c[column].type.dialect_impl(dialect).bind_processor(dialect) for column in columns
+    ]
+
+    buffer = io.StringIO()
+
+    for row in rows:
+        values = (
+            row[column] if processor is None else processor(row[column])
+            for column, processor in zip(columns, processors)
+        )
+        buffer.write(",".join(_copy_value(value) for value in values))
+        buffer.write("\n")
+
+    buffer.seek(0)
+
+    quoted_columns = ", ".join(dialect.identifier_preparer.quote(column) for column in columns)
+    quoted_table = dialect.identifier_preparer.format_table(table)
+
+    cursor = connection.connection.cursor()
+
+    try:
+        cursor.copy_expert(
+            f"COPY {quoted_table} ({quoted_columns}) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+    finally:
+        cursor.close()
+
+
+def bulk_insert(connection, table, rows):
+    """
+    Inserts a batch of rows with a single round trip where the driver allows it
+
+    psycopg2 connections use COPY, everything else an executemany INSERT
+    """
+    if not rows:
+        return
+
+    if connection.dialect.name == "postgresql" and connection.dialect.driver == "psycopg2":
+        _copy(connection, table, rows)
+    else:
+        connection.execute(insert(table), rows)
+
+
+class ImportProgress:
+    """
+    Counts imported rows and periodically logs the throughput
+    """
+
+    def __init__(self, table, report_every=10.0):
+        self.table = table
+        self.report_every = report_every
+
+        self.rows = 0
+        self.started = time.monotonic()
+        self.last_report = self.started
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rate(self):
+        return self.rows / max(self.elapsed, 1e-9)
+
+    def update(self, rows):
+        self.rows += rows
+
+        now = time.monotonic()
+
+        if now - self.last_report >= self.report_every:
+            self.last_report = now
+            logger.info("Imported %s rows into %s (%.0f rows/s)", self.rows, self.table, self.rate)
+
+    def finish(self):
+        logger.info(
+            "Imported %s rows into %s in %.1fs (%.0f rows/s)",
+            self.rows,
+            self.table,
+            self.elapsed,
+            self.rate,
+        )
+
+
+def populate(db_uri, table, data_filename, batch_size=5000, data_format=None):
+    """
+    Streams a JSON, NDJSON or CSV dump into a table, committing every batch
+
+    Loading scoreboard_history also rebuilds the score rollups of every workspace it touched
+
+    Returns the ImportProgress, with the number of rows imported and the throughput
+    """
+    if table not in TABLES:
+        raise RuntimeError(f"Unknown table {table}?")
+
+    if data_format is None:
+        data_format = detect_format(data_filename)
+
+    model, row_func = TABLES[table]
+    progress = ImportProgress(table)
+    engine = get_engine(db_uri)
+    workspace_ids = set()
+
+    def flush(batch):
+        with engine.begin() as connection:
+            bulk_insert(connection, model.__table__, batch)
+
+        if model is ScoreboardHistoryModel:
+            workspace_ids.update(row.get("workspace_id") for row in batch)
+
+        progress.update(len(batch))
+
+    with open(data_filename, "rt", encoding="utf-8", newline="") as data_file:
+        records = iter_records(data_file, data_format)
+        batch = []
+
+        for row in prepare_rows(model.__table__, records, row_func):
+            # Rows in a batch must share their columns to be inserted together
+            if batch and (len(batch) >= batch_size or row.keys() != batch[-1].keys()):
+                flush(batch)
+                batch = []
+
+            batch.append(row)
+
+        flush(batch)
+
+    progress.finish()
+
+    # The bulk insert bypasses the rollups kept up to date alongside the history
+    workspace_ids.discard(None)
+
+    if workspace_ids:
+        session_factory = get_session_factory(db_uri)
+
+        try:
+            for workspace_id in sorted(workspace_ids):
+                ScorekeeperRepository(session_factory, workspace_id).rebuild_rollups()
+        finally:
+            session_factory.remove()
+
+    return progress
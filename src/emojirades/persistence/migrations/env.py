@@ -3,6 +3,9 @@ from logging.config import fileConfig
 from alembic import context
 from sqlalchemy import engine_from_config, pool
 
+from emojirades.persistence.models import (
+    DirectMessageModel as DirectMessageModel,
+)
 from emojirades.persistence.models import (
     GamestateHistoryModel as GamestateHistoryModel,
 )
@@ -18,6 +21,12 @@ from emojirades.persistence.models import (
 from emojirades.persistence.models import (
     ScoreboardModel as ScoreboardModel,
 )
+from emojirades.persistence.models import (
+    ScoreboardOperation as ScoreboardOperation,
+)
+from emojirades.persistence.models import (
+    ScoreboardRollupModel as ScoreboardRollupModel,
+)
 from emojirades.persistence.models.base import Base
 
 # this is the Alembic Config object, which provides
@@ -25,8 +34,8 @@ from emojirades.persistence.models.base import Base
 config = context.config
 
 # Interpret the config file for Python logging.
-# This line sets up loggers basically.
-fileConfig(config.config_file_name)
+# This line sets up loggers basically, leaving the bot's own loggers enabled.
+fileConfig(config.config_file_name, disable_existing_loggers=False)
 
 # add your model's MetaData object here
 # for 'autogenerate' support
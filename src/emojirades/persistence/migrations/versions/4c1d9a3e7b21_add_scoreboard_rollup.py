@@ -0,0 +1,132 @@
+"""Add scoreboard rollup
+
+Revision ID: 4c1d9a3e7b21
+Revises: 1fe85f36a1a5
+Create Date: 2026-10-18 10:12:41.517203
+
+"""
+
+import datetime
+from collections import defaultdict
+
+import sqlalchemy as sa
+from alembic import op
+
+from emojirades.analytics.time_range import TimeRange
+from emojirades.analytics.time_unit import TimeUnit
+
+# revision identifiers, used by Alembic.
+revision = "4c1d9a3e7b21"
+down_revision = "1fe85f36a1a5"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+# Only ++/-- count towards the periodic scoreboards
+LEGACY_DELTAS = {"++": 1, "--": -1}
+ROLLUP_TIME_UNITS = (TimeUnit.DAILY, TimeUnit.WEEKLY, TimeUnit.MONTHLY)
+
+
+def _backfill_rollups():
+    """
+    Sums the existing history into rollup buckets, walking it in event_id order
+    """
+    connection = op.get_bind()
+
+    history = sa.table(
+        "scoreboard_history",
+        sa.column("event_id", sa.Integer()),
+        sa.column("workspace_id", sa.Text()),
+        sa.column("channel_id", sa.Text()),
+        sa.column("user_id", sa.Text()),
+        sa.column("timestamp", sa.DateTime(timezone=True)),
+        sa.column("operation", sa.Text()),
+    )
+    rollup = sa.table(
+        "scoreboard_rollup",
+        sa.column("workspace_id", sa.Text()),
+        sa.column("channel_id", sa.Text()),
+        sa.column("period", sa.Text()),
+        sa.column("period_start", sa.Date()),
+        sa.column("user_id", sa.Text()),
+        sa.column("score", sa.Integer()),
+    )
+
+    totals = defaultdict(int)
+    last_event_id = None
+
+    while True:
+        stmt = sa.select(history).order_by(history.c.event_id)
+
+        if last_event_id is not None:
+            stmt = stmt.where(history.c.event_id > last_event_id)
+
+        rows = connection.execute(stmt.limit(BATCH_SIZE)).fetchall()
+
+        if not rows:
+            break
+
+        for row in rows:
+            delta = LEGACY_DELTAS.get(row.operation.split(",")[0])
+
+            if delta is None:
+                continue
+
+            # SQLite hands back naive datetimes, which are stored as UTC
+            timestamp = row.timestamp
+
+            if timestamp.tzinfo is None:
+                timestamp = timestamp.replace(tzinfo=datetime.timezone.utc)
+
+            for time_unit in ROLLUP_TIME_UNITS:
+                period_start = TimeRange.get_period_start(timestamp, time_unit)
+                key = (row.workspace_id, row.channel_id, time_unit.value, period_start, row.user_id)
+                totals[key] += delta
+
+        last_event_id = rows[-1].event_id
+
+    if totals:
+        connection.execute(
+            rollup.insert(),
+            [
+                {
+                    "workspace_id": workspace_id,
+                    "channel_id": channel_id,
+                    "period": period,
+                    "period_start": period_start,
+                    "user_id": user_id,
+                    "score": score,
+                }
+                for (
+                    workspace_id,
+                    channel_id,
+                    period,
+                    period_start,
+                    user_id,
+                ), score in totals.items()
+            ],
+        )
+
+
+def upgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table(
+        "scoreboard_rollup",
+        sa.Column("workspace_id", sa.Text(), nullable=False),
+        sa.Column("channel_id", sa.Text(), nullable=False),
+        sa.Column("period", sa.Text(), nullable=False),
+        sa.Column("period_start", sa.Date(), nullable=False),
+        sa.Column("user_id", sa.Text(), nullable=False),
+        sa.Column("score", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("workspace_id", "channel_id", "period", "period_start", "user_id"),
+    )
+    # ### end Alembic commands ###
+
+    _backfill_rollups()
+
+
+def downgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_table("scoreboard_rollup")
+    # ### end Alembic commands ###
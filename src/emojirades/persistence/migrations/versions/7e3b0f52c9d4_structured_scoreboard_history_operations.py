@@ -0,0 +1,152 @@
+"""Structured scoreboard history operations
+
+Revision ID: 7e3b0f52c9d4
+Revises: 4c1d9a3e7b21
+Create Date: 2026-10-18 11:40:07.286551
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "7e3b0f52c9d4"
+down_revision = "4c1d9a3e7b21"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+scoreboard_operation = sa.Enum("INCREMENT", "DECREMENT", "SET", name="scoreboardoperation")
+
+# Legacy 'op,previous,current' prefixes mapped to the enum names
+LEGACY_OPERATIONS = {"++": "INCREMENT", "--": "DECREMENT", "set": "SET"}
+
+
+def _convert_rows(history, columns, update_stmt, convert):
+    """
+    Walks the table in event_id order so large histories are never fully loaded
+    """
+    connection = op.get_bind()
+    last_event_id = None
+
+    while True:
+        stmt = sa.select(history.c.event_id, *columns).order_by(history.c.event_id)
+
+        if last_event_id is not None:
+            stmt = stmt.where(history.c.event_id > last_event_id)
+
+        rows = connection.execute(stmt.limit(BATCH_SIZE)).fetchall()
+
+        if not rows:
+            break
+
+        connection.execute(update_stmt, [convert(row) for row in rows])
+        last_event_id = rows[-1].event_id
+
+
+def upgrade():
+    scoreboard_operation.create(op.get_bind(), checkfirst=True)
+
+    with op.batch_alter_table("scoreboard_history") as batch_op:
+        batch_op.add_column(sa.Column("new_operation", scoreboard_operation, nullable=True))
+        batch_op.add_column(sa.Column("previous_score", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("current_score", sa.Integer(), nullable=True))
+
+    history = sa.table(
+        "scoreboard_history",
+        sa.column("event_id", sa.Integer()),
+        sa.column("operation", sa.Text()),
+        sa.column("new_operation", scoreboard_operation),
+        sa.column("previous_score", sa.Integer()),
+        sa.column("current_score", sa.Integer()),
+    )
+
+    def convert(row):
+        operation, previous_score, current_score = row.operation.split(",")
+
+        return {
+            "b_event_id": row.event_id,
+            "new_operation": LEGACY_OPERATIONS[operation],
+            "previous_score": int(previous_score),
+            "current_score": int(current_score),
+        }
+
+    _convert_rows(
+        history,
+        [history.c.operation],
+        history.update()
+        .where(history.c.event_id == sa.bindparam("b_event_id"))
+        .values(
+            new_operation=sa.bindparam("new_operation"),
+            previous_score=sa.bindparam("previous_score"),
+            current_score=sa.bindparam("current_score"),
+        ),
+        convert,
+    )
+
+    with op.batch_alter_table("scoreboard_history") as batch_op:
+        batch_op.drop_column("operation")
+        batch_op.alter_column(
+            "new_operation",
+            new_column_name="operation",
+            existing_type=scoreboard_operation,
+            nullable=False,
+        )
+        batch_op.alter_column("previous_score", existing_type=sa.Integer(), nullable=False)
+        batch_op.alter_column("current_score", existing_type=sa.Integer(), nullable=False)
+
+    op.create_index(
+        "idx_scoreboard_history_channel",
+        "scoreboard_history",
+        ["workspace_id", "channel_id", "timestamp"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index("idx_scoreboard_history_channel", table_name="scoreboard_history")
+
+    with op.batch_alter_table("scoreboard_history") as batch_op:
+        batch_op.add_column(sa.Column("old_operation", sa.Text(), nullable=True))
+
+    history = sa.table(
+        "scoreboard_history",
+        sa.column("event_id", sa.Integer()),
+        sa.column("operation", scoreboard_operation),
+        sa.column("old_operation", sa.Text()),
+        sa.column("previous_score", sa.Integer()),
+        sa.column("current_score", sa.Integer()),
+    )
+
+    legacy_names = {v: k for k, v in LEGACY_OPERATIONS.items()}
+
+    def convert(row):
+        operation = legacy_names[row.operation]
+
+        return {
+            "b_event_id": row.event_id,
+            "old_operation": f"{operation},{row.previous_score},{row.current_score}",
+        }
+
+    _convert_rows(
+        history,
+        [history.c.operation, history.c.previous_score, history.c.current_score],
+        history.update()
+        .where(history.c.event_id == sa.bindparam("b_event_id"))
+        .values(old_operation=sa.bindparam("old_operation")),
+        convert,
+    )
+
+    with op.batch_alter_table("scoreboard_history") as batch_op:
+        batch_op.drop_column("current_score")
+        batch_op.drop_column("previous_score")
+        batch_op.drop_column("operation")
+        batch_op.alter_column(
+            "old_operation",
+            new_column_name="operation",
+            existing_type=sa.Text(),
+            nullable=False,
+        )
+
+    scoreboard_operation.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,35 @@
+"""Add pending channel and user history indexes
+
+Revision ID: b5048c7edca1
+Revises: 9b5e2d7c1a46
+Create Date: 2026-10-18 15:02:36.418902
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b5048c7edca1"
+down_revision = "9b5e2d7c1a46"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "idx_gamestate_pending",
+        "gamestate",
+        ["workspace_id", "previous_winner", "step", "channel_id"],
+        unique=False,
+    )
+    op.create_index(
+        "idx_scoreboard_history_user",
+        "scoreboard_history",
+        ["workspace_id", "channel_id", "user_id", "timestamp"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index("idx_scoreboard_history_user", table_name="scoreboard_history")
+    op.drop_index("idx_gamestate_pending", table_name="gamestate")
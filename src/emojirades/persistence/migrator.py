@@ -0,0 +1,221 @@
+import json
+import logging
+import os
+
+from sqlalchemy import func, insert, make_url, select, text, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+
+from .importer import ImportProgress
+from .models.base import Base
+from .orm import get_engine, migrate
+
+logger = logging.getLogger("EmojiradesBot.persistence.migrator")
+
+
+class Checkpoint:
+    """
+    Last primary key copied for each table, saved to a JSON file after every batch
+
+    The file records which databases it belongs to, so resuming a copy with
+    different source or target databases is refused rather than skipping tables
+    """
+
+    def __init__(self, filename, source_uri=None, target_uri=None):
+        self.filename = filename
+        self.source_uri = _checkpoint_uri(source_uri)
+        self.target_uri = _checkpoint_uri(target_uri)
+        self.tables = {}
+
+        if filename is not None and os.path.exists(filename):
+            with open(filename, "rt", encoding="utf-8") as checkpoint_file:
+                state = json.load(checkpoint_file)
+
+            uris = (state.get("source_uri"), state.get("target_uri"))
+
+            if uris != (self.source_uri, self.target_uri):
+                raise RuntimeError(
+                    f"Checkpoint {filename} is for copying {uris[0]} to {uris[1]}, "
+                    "remove it or pass another --checkpoint-file"
+                )
+
+            self.tables = state["tables"]
+
+    def last_key(self, table):
+        return self.tables.get(table, {}).get("last_key")
+
+    def done(self, table):
+        return self.tables.get(table, {}).get("done", False)
+
+    def update(self, table, last_key=None, rows=0, done=False):
+        state = self.tables.setdefault(table, {"rows": 0})
+
+        if last_key is not None:
+            state["last_key"] = last_key
+
+        state["rows"] += rows
+        state["done"] = done
+
+        self.save()
+
+    def save(self):
+        if self.filename is None:
+            return
+
+        # Replaced in one go so an interruption never leaves a partial checkpoint
+        partial = f"{self.filename}.partial"
+
+        with open(partial, "wt", encoding="utf-8") as checkpoint_file:
+            json.dump(
+                {
+                    "source_uri": self.source_uri,
+                    "target_uri": self.target_uri,
+                    "tables": self.tables,
+                },
+                checkpoint_file,
+                indent=2,
+            )
+
+        os.replace(partial, self.filename)
+
+
+def _checkpoint_uri(uri):
+    # Checkpoint files shouldn't leak database passwords
+    if uri is None:
+        return None
+
+    return make_url(uri).render_as_string(hide_password=True)
+
+
+def _json_key(row, primary_key):
+    # Keys are written to the checkpoint file, so dates are stored as strings
+    return [
+        value.isoformat() if hasattr(value, "isoformat") else value
+        for value in (row[column.name] for column in primary_key)
+    ]
+
+
+def _key_values(table, last_key):
+    return [
+        column.type.python_type.fromisoformat(value)
+        if hasattr(column.type.python_type, "fromisoformat")
+        else value
+        for column, value in zip(table.primary_key, last_key)
+    ]
+
+
+def upsert(connection, table, rows):
+    """
+    Inserts a batch of rows, replacing any already there with the same primary key
+
+    Copying a batch twice is harmless, so a migration can resume from its last checkpoint
+    """
+    dialect = connection.dialect.name
+
+    if dialect == "postgresql":
+        stmt = postgresql.insert(table)
+    elif dialect == "sqlite":
+        stmt = sqlite.insert(table)
+    else:
+        connection.execute(insert(table), rows)
+        return
+
+    primary_key = [column.name for column in table.primary_key]
+    updates = {
+        column.name: stmt.excluded[column.name]
+        for column in table.columns
+        if column.name not in primary_key
+    }
+
+    if updates:
+        stmt = stmt.on_conflict_do_update(index_elements=primary_key, set_=updates)
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=primary_key)
+
+    connection.execute(stmt, rows)
+
+
+def _reset_identity(connection, table):
+    """
+    Moves PostgreSQL identity sequences past the copied ids
+    """
+    if connection.dialect.name != "postgresql":
+        return
+
+    for column in table.columns:
+        if column.identity is None:
+            continue
+
+        max_id = connection.execute(select(func.max(column))).scalar()
+
+        if max_id is not None:
+            connection.execute(
+                text("SELECT setval(pg_get_serial_sequence(:table, :column), :max_id)"),
+                {"table": table.name, "column": column.name, "max_id": max_id},
+            )
+
+
+def migrate_table(source, target, table, checkpoint, batch_size=5000):
+    """
+    Streams a table from source to target in primary key order, one batch per transaction
+    """
+    progress = ImportProgress(table.name)
+    primary_key = list(table.primary_key)
+
+    stmt = select(table).order_by(*primary_key)
+
+    if (last_key := checkpoint.last_key(table.name)) is not None:
+        logger.info("Resuming %s after %s", table.name, last_key)
+        stmt = stmt.where(tuple_(*primary_key) > tuple_(*_key_values(table, last_key)))
+
+    with source.connect() as source_connection:
+        result = source_connection.execution_options(yield_per=batch_size).execute(stmt)
+
+        for partition in result.mappings().partitions():
+            rows = [dict(row) for row in partition]
+
+            with target.begin() as target_connection:
+                upsert(target_connection, table, rows)
+
+            checkpoint.update(table.name, last_key=_json_key(rows[-1], primary_key), rows=len(rows))
+            progress.update(len(rows))
+
+    with target.begin() as target_connection:
+        _reset_identity(target_connection, table)
+
+    checkpoint.update(table.name, done=True)
+    progress.finish()
+
+    return progress
+
+
+def migrate_database(source_uri, target_uri, batch_size=5000, checkpoint_file=None, tables=None):
+    """
+    Copies every table from one database to another, e.g. SQLite to PostgreSQL
+
+    The target is migrated to the latest schema first. Progress is saved to
+    checkpoint_file after each batch, running again with the same file skips
+    finished tables and resumes the rest after their last copied row (a checkpoint
+    left by a copy between other databases is refused)
+    """
+    migrate(target_uri)
+
+    source = get_engine(source_uri)
+    target = get_engine(target_uri)
+    checkpoint = Checkpoint(checkpoint_file, source_uri=source_uri, target_uri=target_uri)
+
+    copied = {}
+
+    # Sorted so parents are copied before any tables referencing them
+    for table in Base.metadata.sorted_tables:
+        if tables and table.name not in tables:
+            continue
+
+        if checkpoint.done(table.name):
+            logger.info("Skipping %s, already migrated", table.name)
+            continue
+
+        copied[table.name] = migrate_table(
+            source, target, table, checkpoint, batch_size=batch_size
+        ).rows
+
+    return copied
@@ -7,9 +7,21 @@ from .gamestate import (
 from .gamestate import (
     GamestateStep as GamestateStep,
 )
+from .scorekeeper import (
+    ROLLUP_DELTAS as ROLLUP_DELTAS,
+)
 from .scorekeeper import (
     ScoreboardHistoryModel as ScoreboardHistoryModel,
 )
 from .scorekeeper import (
     ScoreboardModel as ScoreboardModel,
 )
+from .scorekeeper import (
+    ScoreboardOperation as ScoreboardOperation,
+)
+from .scorekeeper import (
+    ScoreboardRollupModel as ScoreboardRollupModel,
+)
+from .slack import (
+    DirectMessageModel as DirectMessageModel,
+)
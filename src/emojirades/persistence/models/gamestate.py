@@ -45,6 +45,16 @@ class GamestateModel(Base):
         )
 
 
+# Covers get_pending_channel, the channel is read straight from the index
+Index(
+    "idx_gamestate_pending",
+    GamestateModel.workspace_id,
+    GamestateModel.previous_winner,
+    GamestateModel.step,
+    GamestateModel.channel_id,
+)
+
+
 class GamestateHistoryModel(Base):
     __tablename__ = "gamestate_history"
 
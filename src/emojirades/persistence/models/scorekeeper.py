@@ -1,12 +1,31 @@
 import datetime
+import enum
 from typing import Optional
 
-from sqlalchemy import Identity, Integer, Text
+from sqlalchemy import Date, Enum, Identity, Index, Integer, Text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from .base import AwareDateTime, Base
 
 
+class ScoreboardOperation(enum.Enum):
+    INCREMENT = "++"
+    DECREMENT = "--"
+    SET = "set"
+
+    @classmethod
+    def from_legacy(cls, operation):
+        """
+        Splits a legacy 'op,previous,current' string into its structured parts
+        """
+        op, previous_score, current_score = operation.split(",")
+        return cls(op), int(previous_score), int(current_score)
+
+
+# Only ++/-- count towards the periodic scoreboards, a set is an admin correction
+ROLLUP_DELTAS = {ScoreboardOperation.INCREMENT: 1, ScoreboardOperation.DECREMENT: -1}
+
+
 class ScoreboardModel(Base):
     __tablename__ = "scoreboard"
 
@@ -45,11 +64,53 @@ class ScoreboardHistoryModel(Base):
         nullable=False,
         default=lambda: datetime.datetime.now(datetime.timezone.utc),
     )
-    operation: Mapped[str] = mapped_column(Text, nullable=False)
+    operation: Mapped[ScoreboardOperation] = mapped_column(
+        Enum(ScoreboardOperation), nullable=False
+    )
+    previous_score: Mapped[int] = mapped_column(Integer, nullable=False)
+    current_score: Mapped[int] = mapped_column(Integer, nullable=False)
 
     def __repr__(self) -> str:
         return (
             f"ScoreboardHistoryModel(w_id={self.workspace_id!r}, "
             f"c_id={self.channel_id!r}, u_id={self.user_id!r}, "
-            f"operation={self.operation!r})"
+            f"operation={self.operation!r}, previous_score={self.previous_score!r}, "
+            f"current_score={self.current_score!r})"
+        )
+
+
+Index(
+    "idx_scoreboard_history_channel",
+    ScoreboardHistoryModel.workspace_id,
+    ScoreboardHistoryModel.channel_id,
+    ScoreboardHistoryModel.timestamp,
+)
+
+# A user's history in a channel, already in timestamp order
+Index(
+    "idx_scoreboard_history_user",
+    ScoreboardHistoryModel.workspace_id,
+    ScoreboardHistoryModel.channel_id,
+    ScoreboardHistoryModel.user_id,
+    ScoreboardHistoryModel.timestamp,
+)
+
+
+class ScoreboardRollupModel(Base):
+    __tablename__ = "scoreboard_rollup"
+
+    workspace_id: Mapped[str] = mapped_column(Text, primary_key=True, autoincrement=False)
+    channel_id: Mapped[str] = mapped_column(Text, primary_key=True, autoincrement=False)
+    period: Mapped[str] = mapped_column(Text, primary_key=True, autoincrement=False)
+    period_start: Mapped[datetime.date] = mapped_column(Date, primary_key=True, autoincrement=False)
+    user_id: Mapped[str] = mapped_column(Text, primary_key=True, autoincrement=False)
+
+    score: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    def __repr__(self) -> str:
+        return (
+            f"ScoreboardRollupModel(w_id={self.workspace_id!r}, "
+            f"c_id={self.channel_id!r}, period={self.period!r}, "
+            f"period_start={self.period_start!r}, u_id={self.user_id!r}, "
+            f"score={self.score!r})"
         )
@@ -0,0 +1,28 @@
+import datetime
+
+from sqlalchemy import Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import AwareDateTime, Base
+
+
+class DirectMessageModel(Base):
+    __tablename__ = "direct_message"
+
+    workspace_id: Mapped[str] = mapped_column(Text, primary_key=True, autoincrement=False)
+    user_id: Mapped[str] = mapped_column(Text, primary_key=True, autoincrement=False)
+
+    channel_id: Mapped[str] = mapped_column(Text, nullable=False)
+
+    last_updated: Mapped[datetime.datetime] = mapped_column(
+        AwareDateTime,
+        nullable=False,
+        default=lambda: datetime.datetime.now(datetime.timezone.utc),
+        onupdate=lambda: datetime.datetime.now(datetime.timezone.utc),
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"DirectMessageModel(workspace_id={self.workspace_id!r}, "
+            f"user_id={self.user_id!r}, channel_id={self.channel_id!r})"
+        )
@@ -1,34 +1,158 @@
-import datetime
-import json
 import os
 import threading
+import time
 from contextlib import contextmanager
 
 from alembic import command
 from alembic.config import Config
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, distinct, exc, make_url, select
 from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import QueuePool
 
 from .models import (
-    GamestateHistoryModel,
-    GamestateModel,
-    GamestateStep,
     ScoreboardHistoryModel,
-    ScoreboardModel,
 )
+from .repositories import ScorekeeperRepository
 
 _engines = {}
 _engines_lock = threading.Lock()
 
+_pool_options = {
+    "pool_size": 5,
+    "max_overflow": 10,
+    "pool_timeout": 30,
+    "pool_recycle": -1,
+    "pool_pre_ping": False,
+    "statement_timeout": None,
+}
+
+
+class PoolStats:
+    """
+    Counts how often, and for how long, checkouts had to wait on the pool
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, waited, timed_out=False):
+        with self.lock:
+            self.checkouts += 1
+            self.timeouts += int(timed_out)
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+    def snapshot(self, pool):
+        with self.lock:
+            return {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_total": self.wait_total,
+                "wait_max": self.wait_max,
+            }
+
+
+class TimedQueuePool(QueuePool):
+    """
+    A QueuePool that records how long each checkout waited for a connection
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+
+        self.stats.record(time.perf_counter() - start)
+
+        return connection
+
+
+def configure_engines(**options):
+    """
+    Sets the pool options used by engines created from now on
+
+    Accepts pool_size, max_overflow, pool_timeout, pool_recycle, pool_pre_ping
+    and statement_timeout (milliseconds), options left as None keep their default
+    """
+    unknown = set(options) - set(_pool_options)
+
+    if unknown:
+        raise ValueError(f"Unknown pool options: {', '.join(sorted(unknown))}")
+
+    with _engines_lock:
+        _pool_options.update({k: v for k, v in options.items() if v is not None})
+
+
+def _engine_kwargs(db_uri):
+    url = make_url(db_uri)
+    kwargs = {
+        "pool_recycle": _pool_options["pool_recycle"],
+        "pool_pre_ping": _pool_options["pool_pre_ping"],
+    }
+
+    # In-memory SQLite keeps a connection per thread, there's no queue to size
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return kwargs
+
+    kwargs.update(
+        poolclass=TimedQueuePool,
+        pool_size=_pool_options["pool_size"],
+        max_overflow=_pool_options["max_overflow"],
+        pool_timeout=_pool_options["pool_timeout"],
+    )
+
+    statement_timeout = _pool_options["statement_timeout"]
+
+    if statement_timeout is not None and url.get_backend_name() == "postgresql":
+        kwargs["connect_args"] = {"options": f"-c statement_timeout={int(statement_timeout)}"}
+
+    return kwargs
+
 
 def get_engine(db_uri, echo=False):
     with _engines_lock:
         key = (db_uri, echo)
         if key not in _engines:
-            _engines[key] = create_engine(db_uri, echo=echo, future=True)
+            _engines[key] = create_engine(db_uri, echo=echo, future=True, **_engine_kwargs(db_uri))
         return _engines[key]
 
 
+def pool_stats():
+    """
+    Returns the current pool stats of every engine, keyed by its password-masked URI
+    """
+    with _engines_lock:
+        engines = list(_engines.values())
+
+    return {
+        engine.url.render_as_string(hide_password=True): engine.pool.stats.snapshot(engine.pool)
+        for engine in engines
+        if isinstance(engine.pool, TimedQueuePool)
+    }
+
+
 def get_session_factory(db_uri):
     return scoped_session(sessionmaker(bind=get_engine(db_uri)))
 
@@ -67,47 +191,16 @@ def migrate(db_uri, migration_ini=None, migration_dir=None):
     command.upgrade(alembic_cfg, "head")
 
 
-def populate(db_uri, table, data_filename, commit_every=100):
+def backfill_rollups(db_uri):
     session_factory = get_session_factory(db_uri)
-    session = session_factory()
-
-    if table == "gamestate":
-        Obj = GamestateModel
-        col_funcs = {
-            "step": lambda x: getattr(GamestateStep, x),
-        }
-    elif table == "gamestate_history":
-        Obj = GamestateHistoryModel
-        col_funcs = {}
-    elif table == "scoreboard":
-        Obj = ScoreboardModel
-        col_funcs = {}
-    elif table == "scoreboard_history":
-        Obj = ScoreboardHistoryModel
-        col_funcs = {
-            "timestamp": lambda x: datetime.datetime.strptime(x, "%Y-%m-%d %H:%M:%S"),
-        }
-    else:
-        raise RuntimeError(f"Unknown table {table}?")
 
     try:
-        with open(data_filename, "rt", encoding="utf-8") as data_file:
-            data = json.load(data_file)
-
-            for i, row in enumerate(data):
-                for key, func in col_funcs.items():
-                    row[key] = func(row[key])
-
-                obj = Obj(**row)
-                session.add(obj)
+        stmt = select(distinct(ScoreboardHistoryModel.workspace_id))
+        workspace_ids = session_factory().execute(stmt).scalars().all()
 
-                if i % commit_every == 0:
-                    session.commit()
-
-        session.commit()
-    except Exception:
-        session.rollback()
-        raise
+        return {
+            workspace_id: ScorekeeperRepository(session_factory, workspace_id).rebuild_rollups()
+            for workspace_id in workspace_ids
+        }
     finally:
-        session.close()
         session_factory.remove()
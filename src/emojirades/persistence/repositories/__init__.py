@@ -1,4 +1,5 @@
 from .auth import get_auth_repository as get_auth_repository
+from .direct_message import DirectMessageRepository as DirectMessageRepository
 from .gamestate import GamestateRepository as GamestateRepository
 from .scorekeeper import ScorekeeperRepository as ScorekeeperRepository
 from .workspace import get_workspace_repository as get_workspace_repository
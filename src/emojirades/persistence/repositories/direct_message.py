@@ -0,0 +1,56 @@
+from contextlib import contextmanager
+
+from sqlalchemy import delete, select
+
+from ..models import DirectMessageModel
+
+
+class DirectMessageRepository:
+    """
+    Remembers the direct message channel opened with each user
+    """
+
+    def __init__(self, session_factory, workspace_id):
+        self.session_factory = session_factory
+        self.workspace_id = workspace_id
+
+    @contextmanager
+    def _transaction(self):
+        # Channels are recorded while sending responses, after the event's transaction
+        session = self.session_factory()
+
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            self.session_factory.remove()
+
+    def channels(self):
+        stmt = select(DirectMessageModel.user_id, DirectMessageModel.channel_id).where(
+            DirectMessageModel.workspace_id == self.workspace_id
+        )
+
+        with self._transaction() as session:
+            return {user_id: channel_id for user_id, channel_id in session.execute(stmt)}
+
+    def set_channel(self, user_id, channel_id):
+        with self._transaction() as session:
+            session.merge(
+                DirectMessageModel(
+                    workspace_id=self.workspace_id,
+                    user_id=user_id,
+                    channel_id=channel_id,
+                )
+            )
+
+    def delete_channel(self, user_id):
+        stmt = delete(DirectMessageModel).where(
+            DirectMessageModel.workspace_id == self.workspace_id,
+            DirectMessageModel.user_id == user_id,
+        )
+
+        with self._transaction() as session:
+            session.execute(stmt)
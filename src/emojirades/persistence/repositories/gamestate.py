@@ -1,11 +1,31 @@
+import datetime
 import json
 import threading
+from typing import NamedTuple, Optional
 
-from sqlalchemy import delete, desc, or_, select
+from sqlalchemy import delete, desc, event, insert, or_, select
 
 from ..models import GamestateHistoryModel, GamestateModel, GamestateStep
 
 
+class GamestateSnapshot(NamedTuple):
+    """
+    Immutable copy of a channel's gamestate, safe to share between sessions
+    """
+
+    step: GamestateStep
+    current_winner: Optional[str]
+    previous_winner: Optional[str]
+    emojirade: Optional[str]
+    raw_emojirade: Optional[str]
+    first_guess: Optional[bool]
+    admins: str
+
+    @classmethod
+    def from_model(cls, gamestate):
+        return cls._make(getattr(gamestate, field) for field in cls._fields)
+
+
 class GamestateRepository:
     HISTORY_LIMIT = 5
 
@@ -18,14 +38,78 @@ class GamestateRepository:
         self.gamestate_cache = {}
         self.history_cache = {}
 
+        # Bumped whenever a channel's cached snapshot is replaced or evicted, so a
+        # snapshot read before that can't be cached over the newer state
+        self.versions = {}
+
+        # History recorded during a transaction is written in one go when it commits
+        event.listen(self.session_factory, "before_commit", self._write_history)
+        event.listen(self.session_factory, "after_rollback", self._discard_history)
+
+        if self.caching:
+            # Snapshots written during a transaction are only shared once it commits
+            event.listen(self.session_factory, "after_commit", self._publish_staged)
+            event.listen(self.session_factory, "after_rollback", self._discard_staged)
+
     @property
     def session(self):
         return self.session_factory()
 
     def clear_cache(self, channel):
         with self.lock:
-            self.gamestate_cache.pop(channel, None)
-            self.history_cache.pop(channel, None)
+            self._evict(channel)
+
+    def _evict(self, channel):
+        self.gamestate_cache.pop(channel, None)
+        self.history_cache.pop(channel, None)
+        self.versions[channel] = self.versions.get(channel, 0) + 1
+
+    def _staged(self, session):
+        return session.info.setdefault(("gamestate_staged", id(self)), {})
+
+    def _publish_staged(self, session):
+        staged = session.info.pop(("gamestate_staged", id(self)), {})
+
+        with self.lock:
+            for channel, snapshot in staged.items():
+                self._evict(channel)
+                self.gamestate_cache[channel] = snapshot
+
+    def _discard_staged(self, session):
+        staged = session.info.pop(("gamestate_staged", id(self)), {})
+
+        with self.lock:
+            for channel in staged:
+                self._evict(channel)
+
+    def _pending_history(self, session):
+        return session.info.setdefault(("gamestate_history", id(self)), [])
+
+    def _write_history(self, session):
+        if rows := session.info.pop(("gamestate_history", id(self)), None):
+            session.execute(insert(GamestateHistoryModel), rows)
+
+    def _discard_history(self, session):
+        session.info.pop(("gamestate_history", id(self)), None)
+
+    def _write_through(self, channel, gamestate):
+        snapshot = GamestateSnapshot.from_model(gamestate)
+
+        if not self.caching:
+            return snapshot
+
+        # Other threads keep seeing the committed snapshot until this transaction commits
+        self._staged(self.session)[channel] = snapshot
+
+        return snapshot
+
+    def _fill(self, channel, snapshot, version):
+        """
+        Caches a snapshot that was read (not written), unless the channel changed since
+        """
+        with self.lock:
+            if channel not in self.gamestate_cache and self.versions.get(channel, 0) == version:
+                self.gamestate_cache[channel] = snapshot
 
     def delete(self, iknowwhatimdoing=False):
         if not iknowwhatimdoing:
@@ -35,19 +119,25 @@ class GamestateRepository:
             self.gamestate_cache = {}
             self.history_cache = {}
 
+        self._discard_history(self.session)
+
         self.session.execute(delete(GamestateHistoryModel))
         self.session.execute(delete(GamestateModel))
 
         self.session.commit()
 
     def record_history(self, channel, user, operation, commit=False):
-        self.session.add(
-            GamestateHistoryModel(
-                workspace_id=self.workspace_id,
-                channel_id=channel,
-                user_id=user,
-                operation=operation,
-            )
+        """
+        Buffers a history row, every row recorded in a transaction is inserted on commit
+        """
+        self._pending_history(self.session).append(
+            {
+                "workspace_id": self.workspace_id,
+                "channel_id": channel,
+                "user_id": user,
+                "timestamp": datetime.datetime.now(datetime.timezone.utc),
+                "operation": operation,
+            }
         )
 
         if commit:
@@ -82,15 +172,56 @@ class GamestateRepository:
 
         return gamestate
 
-    def get_xyz(self, channel, xyz):
+    def get_snapshot(self, channel):
         if channel is None:
             return None
 
+        if self.caching:
+            # This transaction's own writes come first
+            if (snapshot := self._staged(self.session).get(channel)) is not None:
+                return snapshot
+
+            with self.lock:
+                snapshot = self.gamestate_cache.get(channel)
+                version = self.versions.get(channel, 0)
+
+            if snapshot is not None:
+                return snapshot
+
         gamestate = self.get_gamestate(channel)
         if gamestate is None:
             return None
 
-        return getattr(gamestate, xyz)
+        snapshot = GamestateSnapshot.from_model(gamestate)
+
+        if self.caching:
+            self._fill(channel, snapshot, version)
+
+        return snapshot
+
+    def cached_snapshot(self, channel):
+        """
+        Returns the cached snapshot for a channel without touching the database, or None
+        """
+        if not self.caching:
+            return None
+
+        with self.lock:
+            return self.gamestate_cache.get(channel)
+
+    def get_xyz(self, channel, xyz):
+        if channel is None:
+            return None
+
+        if xyz not in GamestateSnapshot._fields:
+            gamestate = self.get_gamestate(channel)
+            return getattr(gamestate, xyz) if gamestate is not None else None
+
+        snapshot = self.get_snapshot(channel)
+        if snapshot is None:
+            return None
+
+        return getattr(snapshot, xyz)
 
     def set_xyz(self, channel, user, xyz, value):
         gamestate = self.get_gamestate(channel)
@@ -98,8 +229,7 @@ class GamestateRepository:
         setattr(gamestate, xyz, value)
         self.record_history(channel, user, f"set,{xyz},{value}")
 
-        if self.caching:
-            self.clear_cache(channel)
+        self._write_through(channel, gamestate)
 
     def set_many_xyz(self, channel, user, pairs):
         gamestate = self.get_gamestate(channel)
@@ -108,11 +238,10 @@ class GamestateRepository:
             setattr(gamestate, xyz, value)
             self.record_history(channel, user, f"set,{xyz},{value}")
 
-        if self.caching:
-            self.clear_cache(channel)
+        self._write_through(channel, gamestate)
 
     def is_first_guess(self, channel):
-        return self.get_gamestate(channel).first_guess
+        return self.get_xyz(channel, "first_guess")
 
     def add_admin(self, channel, user):
         gamestate = self.get_gamestate(channel)
@@ -125,8 +254,7 @@ class GamestateRepository:
         admins.append(user)
         gamestate.admins = json.dumps(admins)
 
-        if self.caching:
-            self.clear_cache(channel)
+        self._write_through(channel, gamestate)
 
         return True
 
@@ -141,8 +269,7 @@ class GamestateRepository:
         admins.remove(user)
         gamestate.admins = json.dumps(admins)
 
-        if self.caching:
-            self.clear_cache(channel)
+        self._write_through(channel, gamestate)
 
         return True
 
@@ -156,15 +283,20 @@ class GamestateRepository:
         gamestate.raw_emojirade = None
         gamestate.first_guess = True
 
-        if self.caching:
-            self.clear_cache(channel)
+        self._write_through(channel, gamestate)
 
     def get_history(self, channel, limit=None):
         if limit is None:
             limit = self.HISTORY_LIMIT
 
+        # Make anything recorded so far in this transaction visible to the query
+        self._write_history(self.session)
+
+        # History written by this transaction isn't shared until it commits
+        uncommitted = self.caching and channel in self._staged(self.session)
+
         with self.lock:
-            if history := self.history_cache.get(channel):
+            if not uncommitted and (history := self.history_cache.get(channel)):
                 return history
 
             stmt = (
@@ -189,7 +321,8 @@ class GamestateRepository:
 
             gamestate_history = [(row.user_id, row.timestamp, row.operation) for row in result]
 
-            self.history_cache[channel] = gamestate_history
+            if not uncommitted:
+                self.history_cache[channel] = gamestate_history
 
             return gamestate_history
 
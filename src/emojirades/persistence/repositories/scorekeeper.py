@@ -1,8 +1,61 @@
+import datetime
 import threading
+from bisect import bisect_left, insort
+from collections import defaultdict
 
-from sqlalchemy import asc, delete, desc, select
+from sqlalchemy import and_, asc, delete, desc, event, func, insert, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
 
-from ..models import ScoreboardHistoryModel, ScoreboardModel
+from emojirades.analytics.time_range import TimeRange
+from emojirades.analytics.time_unit import TimeUnit
+
+from ..models import (
+    ROLLUP_DELTAS,
+    ScoreboardHistoryModel,
+    ScoreboardModel,
+    ScoreboardOperation,
+    ScoreboardRollupModel,
+)
+
+ROLLUP_TIME_UNITS = (TimeUnit.DAILY, TimeUnit.WEEKLY, TimeUnit.MONTHLY)
+
+
+class ChannelScoreboard:
+    """
+    Materialized scoreboard for a single channel
+
+    Entries are kept sorted by (-score, user_id) so rank lookups are a bisect
+    and the top N is a slice, rather than an ORDER BY per request
+    """
+
+    def __init__(self, rows=()):
+        self.scores = {user_id: score for user_id, score in rows}
+        self.ranking = sorted((-score, user_id) for user_id, score in self.scores.items())
+
+    def __len__(self):
+        return len(self.ranking)
+
+    def update(self, user_id, score):
+        previous_score = self.scores.get(user_id)
+
+        if previous_score is not None:
+            del self.ranking[bisect_left(self.ranking, (-previous_score, user_id))]
+
+        self.scores[user_id] = score
+        insort(self.ranking, (-score, user_id))
+
+    def position(self, user_id):
+        score = self.scores.get(user_id)
+
+        if score is None:
+            return None, None
+
+        return bisect_left(self.ranking, (-score, user_id)) + 1, score
+
+    def top(self, limit=None):
+        ranking = self.ranking[:limit] if limit else self.ranking
+
+        return [(pos, user_id, -score) for pos, (score, user_id) in enumerate(ranking, start=1)]
 
 
 class ScorekeeperRepository:
@@ -18,6 +71,11 @@ class ScorekeeperRepository:
         self.scoreboard_cache = {}
         self.history_cache = {}
 
+        if self.caching:
+            # Score changes made during a transaction are only shared once it commits
+            event.listen(self.session_factory, "after_commit", self._publish_staged)
+            event.listen(self.session_factory, "after_rollback", self._discard_staged)
+
     @property
     def session(self):
         return self.session_factory()
@@ -25,11 +83,34 @@ class ScorekeeperRepository:
     def clear_cache(self, channel):
         with self.lock:
             self.scoreboard_cache.pop(channel, None)
-            self.history_cache = {
-                k: v
-                for k, v in self.history_cache.items()
-                if not (isinstance(k, tuple) and k[0] == channel)
-            }
+            self._clear_history_cache(channel)
+
+    def _clear_history_cache(self, channel):
+        self.history_cache = {
+            k: v
+            for k, v in self.history_cache.items()
+            if not (isinstance(k, tuple) and k[0] == channel)
+        }
+
+    def _staged(self, session):
+        return session.info.setdefault(("scoreboard_staged", id(self)), {})
+
+    def _publish_staged(self, session):
+        staged = session.info.pop(("scoreboard_staged", id(self)), {})
+
+        with self.lock:
+            for channel, scores in staged.items():
+                self._clear_history_cache(channel)
+
+                if (scoreboard := self.scoreboard_cache.get(channel)) is not None:
+                    for user, score in scores.items():
+                        scoreboard.update(user, score)
+
+    def _discard_staged(self, session):
+        staged = session.info.pop(("scoreboard_staged", id(self)), {})
+
+        for channel in staged:
+            self.clear_cache(channel)
 
     def delete(self, iknowwhatimdoing=False):
         if not iknowwhatimdoing:
@@ -40,23 +121,137 @@ class ScorekeeperRepository:
             self.history_cache = {}
 
         self.session.execute(delete(ScoreboardHistoryModel))
+        self.session.execute(delete(ScoreboardRollupModel))
         self.session.execute(delete(ScoreboardModel))
 
         self.session.commit()
 
-    def record_history(self, channel, user, operation, commit=False):
+    def record_history(self, channel, user, operation, previous_score, current_score, commit=False):
+        timestamp = datetime.datetime.now(datetime.timezone.utc)
+
         self.session.add(
             ScoreboardHistoryModel(
                 workspace_id=self.workspace_id,
                 channel_id=channel,
                 user_id=user,
+                timestamp=timestamp,
                 operation=operation,
+                previous_score=previous_score,
+                current_score=current_score,
             )
         )
 
+        self.record_rollup(channel, user, operation, timestamp)
+
         if commit:
             self.session.commit()
 
+    def record_rollup(self, channel, user, operation, timestamp):
+        """
+        Adds a score change to its daily, weekly and monthly buckets
+
+        Where the dialect supports it this is a single upsert, so concurrent changes
+        (or the first change of a period) can't lose an update or clash on insert
+        """
+        delta = ROLLUP_DELTAS.get(operation)
+
+        if delta is None:
+            return
+
+        rows = [
+            {
+                "workspace_id": self.workspace_id,
+                "channel_id": channel,
+                "period": time_unit.value,
+                "period_start": TimeRange.get_period_start(timestamp, time_unit),
+                "user_id": user,
+                "score": delta,
+            }
+            for time_unit in ROLLUP_TIME_UNITS
+        ]
+
+        dialect = self.session.get_bind().dialect.name
+
+        if dialect == "postgresql":
+            stmt = postgresql.insert(ScoreboardRollupModel)
+        elif dialect == "sqlite":
+            stmt = sqlite.insert(ScoreboardRollupModel)
+        else:
+            self._add_to_rollups(rows)
+            return
+
+        stmt = stmt.values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[column.name for column in ScoreboardRollupModel.__table__.primary_key],
+            set_={"score": ScoreboardRollupModel.score + stmt.excluded.score},
+        )
+
+        self.session.execute(stmt)
+
+    def _add_to_rollups(self, rows):
+        for row in rows:
+            key = tuple(row[column.name] for column in ScoreboardRollupModel.__table__.primary_key)
+
+            if (rollup := self.session.get(ScoreboardRollupModel, key)) is None:
+                self.session.add(ScoreboardRollupModel(**row))
+            else:
+                rollup.score += row["score"]
+
+    def rebuild_rollups(self, batch_size=1000):
+        """
+        Recalculates the rollup table for this workspace from the full history
+        """
+        totals = defaultdict(int)
+
+        stmt = (
+            select(
+                ScoreboardHistoryModel.channel_id,
+                ScoreboardHistoryModel.user_id,
+                ScoreboardHistoryModel.timestamp,
+                ScoreboardHistoryModel.operation,
+            )
+            .where(
+                ScoreboardHistoryModel.workspace_id == self.workspace_id,
+            )
+            .execution_options(yield_per=batch_size)
+        )
+
+        for row in self.session.execute(stmt):
+            delta = ROLLUP_DELTAS.get(row.operation)
+
+            if delta is None:
+                continue
+
+            for time_unit in ROLLUP_TIME_UNITS:
+                period_start = TimeRange.get_period_start(row.timestamp, time_unit)
+                totals[(row.channel_id, time_unit.value, period_start, row.user_id)] += delta
+
+        self.session.execute(
+            delete(ScoreboardRollupModel).where(
+                ScoreboardRollupModel.workspace_id == self.workspace_id,
+            )
+        )
+
+        if totals:
+            self.session.execute(
+                insert(ScoreboardRollupModel),
+                [
+                    {
+                        "workspace_id": self.workspace_id,
+                        "channel_id": channel,
+                        "period": period,
+                        "period_start": period_start,
+                        "user_id": user,
+                        "score": score,
+                    }
+                    for (channel, period, period_start, user), score in totals.items()
+                ],
+            )
+
+        self.session.commit()
+
+        return len(totals)
+
     def get_user(self, channel, user):
         # We don't cache user objects directly here (get_scoreboard caches them in a list)
         # But for correctness if we ever do, or if an object is already in session:
@@ -87,11 +282,11 @@ class ScorekeeperRepository:
 
         self.session.add(entry)
 
-        self.record_history(channel, user, f"++,{previous_score},{current_score}")
-
-        self.clear_cache(channel)
+        self.record_history(
+            channel, user, ScoreboardOperation.INCREMENT, previous_score, current_score
+        )
 
-        return self.position_on_scoreboard(channel, user)
+        return self._update_scoreboard(channel, user, current_score)
 
     def decrement_score(self, channel, user, score=1):
         entry = self.get_user(channel, user)
@@ -102,11 +297,11 @@ class ScorekeeperRepository:
 
         self.session.add(entry)
 
-        self.record_history(channel, user, f"--,{previous_score},{current_score}")
-
-        self.clear_cache(channel)
+        self.record_history(
+            channel, user, ScoreboardOperation.DECREMENT, previous_score, current_score
+        )
 
-        return self.position_on_scoreboard(channel, user)
+        return self._update_scoreboard(channel, user, current_score)
 
     def set_score(self, channel, user, score):
         entry = self.get_user(channel, user)
@@ -117,52 +312,146 @@ class ScorekeeperRepository:
 
         self.session.add(entry)
 
-        self.record_history(channel, user, f"set,{previous_score},{current_score}")
+        self.record_history(channel, user, ScoreboardOperation.SET, previous_score, current_score)
+
+        return self._update_scoreboard(channel, user, current_score)
 
-        self.clear_cache(channel)
+    def _update_scoreboard(self, channel, user, score):
+        if self.caching:
+            # Other threads keep seeing the committed scores until this transaction commits
+            self._staged(self.session).setdefault(channel, {})[user] = score
 
         return self.position_on_scoreboard(channel, user)
 
+    def load_scoreboard(self, channel):
+        with self.lock:
+            if (scoreboard := self.scoreboard_cache.get(channel)) is not None:
+                return scoreboard
+
+            stmt = select(
+                ScoreboardModel.user_id,
+                ScoreboardModel.score,
+            ).where(
+                ScoreboardModel.workspace_id == self.workspace_id,
+                ScoreboardModel.channel_id == channel,
+            )
+
+            scoreboard = ChannelScoreboard(self.session.execute(stmt).tuples())
+
+            # Read after this transaction's own (uncommitted) changes, so not shared
+            if self.caching and channel not in self._staged(self.session):
+                self.scoreboard_cache[channel] = scoreboard
+
+            return scoreboard
+
+    def session_scoreboard(self, channel):
+        """
+        The channel's scoreboard as this transaction sees it, its own changes included
+        """
+        scoreboard = self.load_scoreboard(channel)
+
+        if not self.caching or not (staged := self._staged(self.session).get(channel)):
+            return scoreboard
+
+        with self.lock:
+            view = ChannelScoreboard(scoreboard.scores.items())
+
+        for user, score in staged.items():
+            view.update(user, score)
+
+        return view
+
     def get_scoreboard(self, channel, limit=None):
         if limit is None:
             limit = self.SCOREBOARD_LIMIT
 
+        scoreboard = self.session_scoreboard(channel)
+
         with self.lock:
-            if scoreboard := self.scoreboard_cache.get(channel):
-                pass
-            else:
-                stmt = (
-                    select(ScoreboardModel)
-                    .where(
-                        ScoreboardModel.workspace_id == self.workspace_id,
-                        ScoreboardModel.channel_id == channel,
-                    )
-                    .order_by(
-                        desc(ScoreboardModel.score),
-                    )
-                )
+            return scoreboard.top(limit)
 
-                result = self.session.execute(stmt).fetchall()
-                scoreboard = [
-                    (pos, row[0].user_id, row[0].score) for pos, row in enumerate(result, start=1)
-                ]
+    def position_on_scoreboard(self, channel, user):
+        scoreboard = self.session_scoreboard(channel)
 
-                if self.caching:
-                    self.scoreboard_cache[channel] = scoreboard
+        with self.lock:
+            return scoreboard.position(user)
 
-        if limit:
-            return scoreboard[:limit]
+    def get_rollup(self, channel, time_unit, period_start):
+        stmt = (
+            select(
+                ScoreboardRollupModel.user_id,
+                ScoreboardRollupModel.score,
+            )
+            .where(
+                ScoreboardRollupModel.workspace_id == self.workspace_id,
+                ScoreboardRollupModel.channel_id == channel,
+                ScoreboardRollupModel.period == time_unit.value,
+                ScoreboardRollupModel.period_start == period_start,
+            )
+            .order_by(
+                desc(ScoreboardRollupModel.score),
+                asc(ScoreboardRollupModel.user_id),
+            )
+        )
 
-        return scoreboard
+        return [(row.user_id, row.score) for row in self.session.execute(stmt)]
+
+    def get_range(self, channel, start_date, end_date):
+        """
+        Scores between two dates (inclusive), summed from the rollups
+
+        Whole months inside the range come from the monthly rollups, and only the
+        partial months at either end are summed from the daily rollups
+        """
+        first_month = start_date.replace(day=1)
+
+        if first_month < start_date:
+            first_month = (first_month + datetime.timedelta(days=32)).replace(day=1)
+
+        after_last_month = end_date.replace(day=1)
+
+        if (end_date + datetime.timedelta(days=1)).day == 1:
+            after_last_month = end_date + datetime.timedelta(days=1)
+
+        period = ScoreboardRollupModel.period
+        period_start = ScoreboardRollupModel.period_start
+
+        if first_month < after_last_month:
+            buckets = or_(
+                and_(
+                    period == TimeUnit.MONTHLY.value,
+                    period_start >= first_month,
+                    period_start < after_last_month,
+                ),
+                and_(
+                    period == TimeUnit.DAILY.value,
+                    or_(
+                        and_(period_start >= start_date, period_start < first_month),
+                        and_(period_start >= after_last_month, period_start <= end_date),
+                    ),
+                ),
+            )
+        else:
+            buckets = and_(
+                period == TimeUnit.DAILY.value,
+                period_start >= start_date,
+                period_start <= end_date,
+            )
 
-    def position_on_scoreboard(self, channel, user):
-        scoreboard = self.get_scoreboard(channel, limit=0)
+        score = func.sum(ScoreboardRollupModel.score).label("score")
 
-        for pos, user_id, score in scoreboard:
-            if user_id == user:
-                return pos, score
+        stmt = (
+            select(ScoreboardRollupModel.user_id, score)
+            .where(
+                ScoreboardRollupModel.workspace_id == self.workspace_id,
+                ScoreboardRollupModel.channel_id == channel,
+                buckets,
+            )
+            .group_by(ScoreboardRollupModel.user_id)
+            .order_by(desc(score), asc(ScoreboardRollupModel.user_id))
+        )
 
-        return None, None
+        return [(row.user_id, row.score) for row in self.session.execute(stmt)]
 
     def get_history(self, channel, limit=None, user=None, order_by="desc"):
         if limit is None:
@@ -170,8 +459,11 @@ class ScorekeeperRepository:
 
         cache_key = (channel, user, limit, order_by)
 
+        # History written by this transaction isn't shared until it commits
+        uncommitted = self.caching and channel in self._staged(self.session)
+
         with self.lock:
-            if history := self.history_cache.get(cache_key):
+            if not uncommitted and (history := self.history_cache.get(cache_key)):
                 return history
 
             stmt = select(ScoreboardHistoryModel).where(
@@ -199,11 +491,13 @@ class ScorekeeperRepository:
                     "user_id": row[0].user_id,
                     "timestamp": row[0].timestamp,
                     "operation": row[0].operation,
+                    "previous_score": row[0].previous_score,
+                    "current_score": row[0].current_score,
                 }
                 for row in result
             ]
 
-            if self.caching:
+            if self.caching and not uncommitted:
                 self.history_cache[cache_key] = scorekeeper_history
 
             return scorekeeper_history
@@ -6,18 +6,34 @@ from emojirades.analytics.time_unit import TimeUnit
 
 
 class ScoreboardPrinter:
-    def __init__(self, data, slack, time_unit: TimeUnit, parsed_date: datetime.datetime):
+    def __init__(
+        self,
+        data,
+        slack,
+        time_unit: TimeUnit,
+        parsed_date: datetime.datetime,
+        date_range: tuple[datetime.date, datetime.date] | None = None,
+    ):
         self.scoreboard = data
         self.slack = slack
         self.time_unit = time_unit
         self.parsed_date = parsed_date
+        self.date_range = date_range
 
         self.logger = logging.getLogger("EmojiradesBot.printers.ScoreboardPrinter")
 
     def print_date_range(self):
         date_range = ""
 
-        if self.time_unit in [TimeUnit.WEEKLY, TimeUnit.MONTHLY]:
+        if self.date_range is not None:
+            start, end = (date.strftime("%Y-%m-%d") for date in self.date_range)
+            date_range = f"({start} - {end})"
+        elif self.time_unit in [
+            TimeUnit.WEEKLY,
+            TimeUnit.MONTHLY,
+            TimeUnit.QUARTERLY,
+            TimeUnit.YEARLY,
+        ]:
             start = TimeRange.get_start_date(self.parsed_date, self.time_unit).strftime("%Y-%m-%d")
             end = TimeRange.get_end_date(self.parsed_date, self.time_unit).strftime("%Y-%m-%d")
             date_range = f"({start} - {end})"
@@ -48,10 +64,12 @@ class ScoreboardPrinter:
 
         # Prepare and truncate names
         processed_scoreboard = []
+        names = self.slack.pretty_names(name_id for name_id, score in self.scoreboard if score > 0)
+
         for name_id, score in self.scoreboard:
             if score <= 0:
                 continue
-            name = self.slack.pretty_name(name_id)
+            name = names[name_id]
             if len(name) >= 20:
                 name = f"{name[:18]}.."
             processed_scoreboard.append((name, score))
@@ -1,6 +1,8 @@
 import logging
 
+from emojirades.analytics.time_range import TimeRange
 from emojirades.persistence import ScorekeeperRepository
+from emojirades.persistence.repositories.scorekeeper import ROLLUP_TIME_UNITS
 
 
 class Scorekeeper:
@@ -21,6 +23,16 @@ class Scorekeeper:
     def scoreboard(self, channel):
         return self.repository.get_scoreboard(channel)
 
+    def period_scoreboard(self, channel, of_date, time_unit):
+        if time_unit not in ROLLUP_TIME_UNITS:
+            return self.range_scoreboard(channel, *TimeRange.get_period_dates(of_date, time_unit))
+
+        period_start = TimeRange.get_period_start(of_date, time_unit)
+        return self.repository.get_rollup(channel, time_unit, period_start)
+
+    def range_scoreboard(self, channel, start_date, end_date):
+        return self.repository.get_range(channel, start_date, end_date)
+
     def user_score(self, channel, user):
         return self.repository.position_on_scoreboard(channel, user)
 
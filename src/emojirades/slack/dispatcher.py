@@ -0,0 +1,92 @@
+import logging
+import queue
+import threading
+import time
+import zlib
+
+from slack_sdk.errors import SlackApiError
+
+
+class SlackDispatcher:
+    """
+    Runs outbound Slack Web API work on a small pool of worker threads
+
+    Jobs are sharded onto a fixed worker by key (the originating channel), so
+    everything queued for a channel is sent in the order it was queued while
+    other channels carry on independently. With no workers, jobs run inline.
+    """
+
+    def __init__(self, workers=4, max_retries=3, name="SlackDispatcher"):
+        self.logger = logging.getLogger("EmojiradesBot.slack.SlackDispatcher")
+
+        self.max_retries = max_retries
+
+        self.queues = [queue.Queue() for _ in range(workers)]
+        self.threads = [
+            threading.Thread(target=self._run, args=(jobs,), name=f"{name}-{i}", daemon=True)
+            for i, jobs in enumerate(self.queues)
+        ]
+
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, key, job):
+        if not self.queues:
+            self._execute(job)
+            return
+
+        shard = zlib.crc32(str(key).encode("utf-8")) % len(self.queues)
+        self.queues[shard].put(job)
+
+    def call(self, func, *args, **kwargs):
+        """
+        Calls a Web API method, waiting out Slack's rate limiting when asked to
+        """
+        attempt = 0
+
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except SlackApiError as e:
+                if e.response.status_code != 429 or attempt >= self.max_retries:
+                    raise
+
+                attempt += 1
+                retry_after = int(e.response.headers.get("Retry-After", 1))
+
+                self.logger.warning(
+                    "Rate limited by Slack, retrying in %ss (attempt %s/%s)",
+                    retry_after,
+                    attempt,
+                    self.max_retries,
+                )
+                time.sleep(retry_after)
+
+    def join(self):
+        for jobs in self.queues:
+            jobs.join()
+
+    def stop(self):
+        for jobs in self.queues:
+            jobs.put(None)
+
+        for thread in self.threads:
+            thread.join()
+
+    def _execute(self, job):
+        try:
+            job()
+        except Exception:  # pylint: disable=broad-exception-caught
+            self.logger.exception("Dispatch job failed")
+
+    def _run(self, jobs):
+        while True:
+            job = jobs.get()
+
+            try:
+                if job is None:
+                    return
+
+                self._execute(job)
+            finally:
+                jobs.task_done()
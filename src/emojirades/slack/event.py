@@ -24,6 +24,9 @@ class Event:
         self.original_channel = data.get("channel")
         self.original_player_id = None  # Resolved on first access to player_id
 
+        # Instrumentation for this event, follows it across threads (None while disabled)
+        self.trace = None
+
     @property
     def player_id(self):
         if self.original_player_id:
@@ -70,7 +73,9 @@ class Event:
         original_user = self.player_id
 
         # Perform the channel override if it matches
-        channel_override_match = self.channel_override_regex.match(self.text)
+        channel_override_match = (
+            self.channel_override_regex.match(self.text) if self.has_channel_override else None
+        )
 
         if channel_override_match:
             new_channel = channel_override_match.groupdict()["channel_override"]
@@ -87,13 +92,27 @@ class Event:
 
         # Only check for user override if the user is an admin in the (potentially
         # overridden) channel
-        if self.is_game_channel and gamestate.is_admin(self.channel, original_user):
+        if (
+            self.has_user_override
+            and self.is_game_channel
+            and gamestate.is_admin(self.channel, original_user)
+        ):
             user_override_match = self.user_override_regex.match(self.text)
 
             if user_override_match:
                 self.player_id = user_override_match.groupdict()["user_override"]
                 self.text = self.text.replace(user_override_match.groupdict()["override_cmd"], "")
 
+    @property
+    def has_channel_override(self):
+        """Cheap check before running the (backtracking) channel override regex"""
+        return "channel=" in self.text
+
+    @property
+    def has_user_override(self):
+        """Cheap check before running the (backtracking) user override regex"""
+        return "player=" in self.text
+
     @property
     def is_game_channel(self):
         """Game channels are non-DM channels"""
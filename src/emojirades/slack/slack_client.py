@@ -1,15 +1,63 @@
+import collections
+import contextvars
 import logging
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import slack_sdk
 from expiringdict import ExpiringDict
 
 from emojirades.persistence import get_auth_repository
 
+# Shared by every workspace, bounds how many users.info calls are in flight at once
+_lookup_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="SlackUserLookup")
+
+
+class UserCache:
+    """
+    Least recently used cache of Slack users, each kept for at most max_age_seconds
+    """
+
+    def __init__(self, max_len, max_age_seconds):
+        self.max_len = max_len
+        self.max_age_seconds = max_age_seconds
+
+        self.users = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self.users)
+
+    def __setitem__(self, user_id, user):
+        self.users[user_id] = (user, time.monotonic())
+        self.users.move_to_end(user_id)
+
+        while len(self.users) > self.max_len:
+            self.users.popitem(last=False)
+
+    def get(self, user_id):
+        cached = self.users.get(user_id)
+
+        if cached is None:
+            return None
+
+        user, stored = cached
+
+        if time.monotonic() - stored > self.max_age_seconds:
+            del self.users[user_id]
+            return None
+
+        self.users.move_to_end(user_id)
+
+        return user
+
+    def full(self):
+        return len(self.users) >= self.max_len
+
 
 class SlackClient:
     # pylint: disable=too-many-instance-attributes
-    def __init__(self, auth_uri, extra_slack_kwargs=None):
+    def __init__(self, auth_uri, extra_slack_kwargs=None, user_cache_size=2000):
         self.logger = logging.getLogger("EmojiradesBot.slack.SlackClient")
 
         self.config = get_auth_repository(auth_uri).load()
@@ -28,9 +76,13 @@ class SlackClient:
         self.last_ts = float(0)
         self.cache_lock = threading.Lock()
 
-        self.user_info_cache = ExpiringDict(max_len=100, max_age_seconds=172800)  # 2 days
+        self.user_info_cache = UserCache(max_len=user_cache_size, max_age_seconds=172800)  # 2 days
         self.bot_user_info_cache = ExpiringDict(max_len=100, max_age_seconds=172800)  # 2 days
 
+        # DM channels don't change once opened, so they're kept until Slack says otherwise
+        self.im_cache = {}
+        self.im_repository = None
+
         response = self.rtm.web_client.auth_test()
 
         self.bot_id = response["user_id"]
@@ -50,12 +102,71 @@ class SlackClient:
             user = self.user_info_cache.get(user_id)
 
         if user is None:
-            user = self.rtm.web_client.users_info(user=user_id)["user"]
-            with self.cache_lock:
-                self.user_info_cache[user_id] = user
+            user = self.fetch_user_info(user_id)
 
         return user
 
+    def fetch_user_info(self, user_id):
+        user = self.rtm.web_client.users_info(user=user_id)["user"]
+
+        with self.cache_lock:
+            self.user_info_cache[user_id] = user
+
+        return user
+
+    def user_infos(self, user_ids):
+        """
+        Looks up several users at once, fetching cache misses concurrently
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+
+        with self.cache_lock:
+            users = {user_id: self.user_info_cache.get(user_id) for user_id in user_ids}
+
+        misses = [user_id for user_id, user in users.items() if user is None]
+
+        if len(misses) == 1:
+            users[misses[0]] = self.fetch_user_info(misses[0])
+        elif misses:
+            # Each lookup runs in a copy of this context so instrumentation still sees it
+            lookups = [
+                _lookup_pool.submit(contextvars.copy_context().run, self.fetch_user_info, user_id)
+                for user_id in misses
+            ]
+            users.update(zip(misses, (lookup.result() for lookup in lookups)))
+
+        return users
+
+    def update_user(self, user):
+        """
+        Replaces a cached user, such as from a 'user_change' or 'team_join' event
+        """
+        with self.cache_lock:
+            self.user_info_cache[user["id"]] = user
+
+    def warm_user_cache(self, page_size=200):
+        """
+        Fills the user cache from users.list, returns how many users were cached
+        """
+        cursor = None
+        cached = 0
+
+        while True:
+            response = self.rtm.web_client.users_list(limit=page_size, cursor=cursor)
+
+            with self.cache_lock:
+                for user in response["members"]:
+                    if self.user_info_cache.full():
+                        return cached
+
+                    self.user_info_cache[user["id"]] = user
+                    cached += 1
+
+            cursor = response.get("response_metadata", {}).get("next_cursor")
+
+            if not cursor:
+                return cached
+
     def bot_info(self, bot_id):
         with self.cache_lock:
             bot_user = self.bot_user_info_cache.get(bot_id)
@@ -81,15 +192,59 @@ class SlackClient:
             "real_name": user["real_name"],
         }
 
-    def pretty_name(self, user_id):
-        user = self.user_info(user_id)
+    @staticmethod
+    def _pretty_name(user):
         return user.get("real_name", user.get("name", "Unknown User"))
 
+    def pretty_name(self, user_id):
+        return self._pretty_name(self.user_info(user_id))
+
+    def pretty_names(self, user_ids):
+        """
+        Returns {user_id: pretty name} for every user, see user_infos
+        """
+        return {
+            user_id: self._pretty_name(user) for user_id, user in self.user_infos(user_ids).items()
+        }
+
+    def attach_im_repository(self, repository):
+        """
+        Persists DM channels through the repository, loading those already known
+        """
+        channels = repository.channels()
+
+        with self.cache_lock:
+            self.im_repository = repository
+            self.im_cache.update(channels)
+
+    def cached_im(self, user_id):
+        with self.cache_lock:
+            return self.im_cache.get(user_id)
+
+    def remember_im(self, user_id, channel_id):
+        with self.cache_lock:
+            known = self.im_cache.get(user_id) == channel_id
+            self.im_cache[user_id] = channel_id
+
+        if not known and self.im_repository is not None:
+            self.im_repository.set_channel(user_id, channel_id)
+
+    def forget_im(self, user_id):
+        with self.cache_lock:
+            self.im_cache.pop(user_id, None)
+
+        if self.im_repository is not None:
+            self.im_repository.delete_channel(user_id)
+
     def find_im(self, user_id):
+        if (channel_id := self.cached_im(user_id)) is not None:
+            return channel_id
+
         # Open or resume a direct message with the target user
         response = self.rtm.web_client.conversations_open(users=[user_id])
 
         if response["ok"]:
+            self.remember_im(user_id, response["channel"]["id"])
             return response["channel"]["id"]
 
         return None
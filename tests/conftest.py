@@ -47,6 +47,13 @@ class TestBot:
 
     def commit(self):
         self.gamestate.repository.session.commit()
+        self.clear_bot_caches()
+
+    def clear_bot_caches(self):
+        # The bot's repositories cache per channel, writes made here bypass them
+        workspace = self.bot.workspaces[self.config.team]
+        workspace["gamestate"].repository.clear_cache(self.config.channel)
+        workspace["scorekeeper"].repository.clear_cache(self.config.channel)
 
     def debug(self):
         print("-" * 20)
@@ -71,6 +78,7 @@ class TestBot:
         if delete:
             self.gamestate.repository.delete(iknowwhatimdoing=True)
             self.scorekeeper.repository.delete(iknowwhatimdoing=True)
+            self.clear_bot_caches()
 
         if state == "waiting":
             events = [self.events.new_game]
@@ -181,6 +189,7 @@ def bot(auth_uri, db_uri, test_data, mock_web_api_server):
             if runner and hasattr(runner, "event"):
                 runner.event.set()
 
+    bot.workspaces[config.team]["dispatcher"].stop()
     session.close()
 
 
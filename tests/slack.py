@@ -37,7 +37,11 @@ class MockHandler(SimpleHTTPRequestHandler):
 
     def _handle(self):
         print(self.path)
-        data = self.rfile.read(int(self.headers["Content-Length"])).decode("utf-8")
+        data = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8")
+
+        # The async client sends its arguments in the query string
+        self.path, _, query = self.path.partition("?")
+        data = data or query
 
         responses = {
             "rtm_start_success": {
@@ -120,6 +124,25 @@ class MockHandler(SimpleHTTPRequestHandler):
                     "real_name": self.test.config.player_4_name,
                 },
             },
+            "/users.list": {
+                "ok": True,
+                "members": [
+                    {
+                        "id": user_id,
+                        "team_id": self.test.config.team,
+                        "name": name,
+                        "real_name": name,
+                    }
+                    for user_id, name in (
+                        (self.test.config.bot_id, self.test.config.bot_name),
+                        (self.test.config.player_1, self.test.config.player_1_name),
+                        (self.test.config.player_2, self.test.config.player_2_name),
+                        (self.test.config.player_3, self.test.config.player_3_name),
+                        (self.test.config.player_4, self.test.config.player_4_name),
+                    )
+                ],
+                "response_metadata": {"next_cursor": ""},
+            },
             "/chat.postMessage": {
                 "ok": True,
             },
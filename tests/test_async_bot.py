@@ -0,0 +1,163 @@
+import asyncio
+import json
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from emojirades.async_bot import AsyncEmojiradesBot
+from emojirades.gamestate import Gamestate
+from emojirades.persistence import GamestateStep, get_session_factory
+
+
+class AsyncTestBot:
+    def __init__(self, bot, config, events, gamestate):
+        self.bot = bot
+        self.config = config
+        self.events = events
+        self.gamestate = gamestate
+
+        self.workspace = bot.workspaces[config.team]
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+        asyncio.run_coroutine_threadsafe(self._start_listener(), self.loop).result()
+
+        deadline = time.monotonic() + 2
+
+        while "websocket" not in self.workspace and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    async def _start_listener(self):
+        self.bot.start_listener(self.workspace)
+
+    def send(self, event):
+        done = threading.Event()
+        self.workspace["event_processed_hook"] = lambda e: done.set()
+
+        websocket = self.workspace["websocket"]
+        asyncio.run_coroutine_threadsafe(websocket.send_str(json.dumps(event)), self.loop).result()
+
+        done.wait(timeout=2)
+
+    def stop(self):
+        async def cancel():
+            for task in list(self.bot.tasks):
+                task.cancel()
+
+            await asyncio.gather(*self.bot.tasks, return_exceptions=True)
+
+        asyncio.run_coroutine_threadsafe(cancel(), self.loop).result(timeout=2)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=2)
+        self.bot.executor.shutdown()
+
+
+@pytest.fixture
+def async_bot(auth_uri, db_uri, test_data, mock_web_api_server):
+    config, events = test_data
+
+    bot = AsyncEmojiradesBot(max_workers=2, reconnect_backoff=1)
+    bot.configure_workspace(
+        db_uri,
+        auth_uri,
+        extra_slack_kwargs={
+            "base_url": "http://localhost:8888",
+            "auto_reconnect_enabled": False,
+            "trace_enabled": False,
+        },
+    )
+
+    test_bot = AsyncTestBot(
+        bot, config, events, Gamestate(get_session_factory(db_uri), config.team)
+    )
+    test_bot.start()
+
+    yield test_bot
+
+    test_bot.stop()
+
+
+class TestAsyncEmojiradesBot:
+    def test_new_game(self, slack_web_api, async_bot):
+        """Events read off the loop's websocket are processed and answered"""
+        async_bot.send(async_bot.events.new_game)
+
+        assert async_bot.gamestate.step(async_bot.config.channel) == GamestateStep.WAITING
+
+        # The DM to the new winner is sent to the channel opened for them
+        assert any(
+            channel == async_bot.config.player_1_channel for channel, _ in slack_web_api.responses
+        )
+
+    def test_responses_in_order(self, slack_web_api, async_bot):
+        """Responses for one channel are sent in the order the events arrived"""
+        async_bot.send(async_bot.events.new_game)
+        slack_web_api.responses.clear()
+
+        for _ in range(3):
+            async_bot.send(async_bot.events.plusplus)
+
+        expected = "Sorry, but we need to be guessing!"
+
+        assert [text.startswith(expected) for _, text in slack_web_api.responses] == [True] * 3
+
+    def test_apologises_on_error(self, slack_web_api, async_bot):
+        """A failing command is logged and apologised for, without sending its output"""
+        with patch(
+            "emojirades.async_bot.EmojiradesBot.process_event", side_effect=RuntimeError("boom")
+        ):
+            async_bot.send(async_bot.events.new_game)
+
+        assert slack_web_api.responses == [
+            (
+                async_bot.config.channel,
+                f"I'm sorry <@{async_bot.config.player_1}>, but I had a "
+                "problem processing that message :sob:",
+            )
+        ]
+
+
+class TestAsyncOnboarding:
+    @patch("boto3.client")
+    @patch("emojirades.async_bot.get_workspace_repository")
+    def test_poll_onboarding(self, mock_get_repo, mock_boto_client):
+        mock_sqs = MagicMock()
+        mock_boto_client.return_value = mock_sqs
+        mock_sqs.get_queue_url.return_value = {"QueueUrl": "https://sqs.fake/queue"}
+        mock_sqs.receive_message.return_value = {
+            "Messages": [
+                {
+                    "Body": '{"workspace_id": "WS123"}',
+                    "ReceiptHandle": "handle123",
+                }
+            ]
+        }
+
+        mock_repo = MagicMock()
+        mock_get_repo.return_value = mock_repo
+        mock_repo.workspace.return_value = {"workspace_id": "WS123", "db_uri": "sqlite://"}
+
+        bot = AsyncEmojiradesBot(max_workers=1)
+        bot.onboarding_queue = "onboarding-queue"
+        bot.configure_workspace = MagicMock()
+        bot.configure_workspace.return_value.workspace_id = "WS123"
+        bot.workspaces["WS123"] = {"slack": bot.configure_workspace.return_value}
+        bot.start_listener = MagicMock()
+
+        asyncio.run(bot.poll_onboarding("s3://fake-workspaces", oneshot=True, wait_time_seconds=15))
+
+        mock_sqs.receive_message.assert_called_once_with(
+            QueueUrl="https://sqs.fake/queue",
+            WaitTimeSeconds=15,
+        )
+        bot.configure_workspace.assert_called_once_with(db_uri="sqlite://")
+        bot.start_listener.assert_called_once_with(bot.workspaces["WS123"])
+        mock_sqs.delete_message.assert_called_once_with(
+            QueueUrl="https://sqs.fake/queue",
+            ReceiptHandle="handle123",
+        )
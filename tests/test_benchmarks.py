@@ -0,0 +1,43 @@
+from benchmarks.harness import Benchmark
+from benchmarks.scenarios import Workload, guess_storm
+
+
+class TestBenchmarkHarness:
+    def test_guess_storm(self, slack_web_api, bot):
+        """A small storm runs through the real bot and is measured"""
+        workload = Workload(
+            bot.config.team,
+            bot.config.channel,
+            bot.config.bot_id,
+            bot.db_uri,
+            players=20,
+            events=60,
+        )
+        events = guess_storm(workload)
+
+        benchmark = Benchmark(bot.bot, bot.config.team, bot.db_uri)
+
+        try:
+            result = benchmark.run("guess_storm", events)
+        finally:
+            benchmark.close()
+
+        assert result.events == len(events)
+        assert result.timeouts == 0
+        assert result.queries_per_event > 0
+        assert result.slack_calls_per_event > 0
+        assert result.p50_ms <= result.p99_ms
+
+        # Rounds were won, so the storm really went through the game
+        assert bot.scorekeeper.scoreboard(bot.config.channel)
+
+    def test_close_restores_api_call(self, slack_web_api, bot):
+        """Closing puts back whatever api_call was before, e.g. the instrumentation wrapper"""
+        web_client = bot.bot.workspaces[bot.config.team]["slack"].rtm.web_client
+        web_client.api_call = wrapped = web_client.api_call
+
+        benchmark = Benchmark(bot.bot, bot.config.team, bot.db_uri)
+        assert web_client.api_call is not wrapped
+
+        benchmark.close()
+        assert web_client.api_call is wrapped
@@ -1,5 +1,7 @@
+import datetime
 import re
 
+from emojirades.analytics.time_range import TimeRange
 from emojirades.persistence import GamestateStep
 
 
@@ -320,3 +322,62 @@ class TestBotCommands:
             bot.config.channel,
             f"Status: Waiting for <@{bot.config.player_2}> to post an emoji to kick off the round!",
         ) in slack_web_api.responses
+
+    def test_history(self, slack_web_api, bot):
+        bot.reset_and_transition_to("guessed")
+        bot.send(
+            {
+                **bot.events.base,
+                "user": bot.config.player_1,
+                "text": f"<@{bot.config.bot_id}> history",
+            }
+        )
+
+        channel, history = slack_web_api.responses[-1]
+
+        assert channel == bot.config.channel
+        assert re.search(
+            rf"\d+ seconds? ago\s*: {bot.config.player_3_name}\s*:\s+\+\+\s+0 =>\s+1", history
+        )
+
+    def test_scoreboard_date_ranges(self, slack_web_api, bot, monkeypatch):
+        monkeypatch.delenv("EMOJIRADE_MOCK_DATE", raising=False)
+
+        bot.reset_and_transition_to("guessed")
+
+        today = datetime.datetime.now(tz=TimeRange.TZ).date()
+        week_ago = today - datetime.timedelta(days=6)
+
+        for text, start_date in [
+            ("scoreboard last 7d", week_ago),
+            (f"scoreboard {week_ago:%Y%m%d}..{today:%Y%m%d}", week_ago),
+            ("leaderboard last 1w", week_ago),
+        ]:
+            slack_web_api.responses.clear()
+            bot.send(
+                {
+                    **bot.events.base,
+                    "user": bot.config.player_1,
+                    "text": f"<@{bot.config.bot_id}> {text}",
+                }
+            )
+
+            channel, scoreboard = slack_web_api.responses[-1]
+
+            assert channel == bot.config.channel
+            assert f":: Custom leaderboard ({start_date} - {today}) ::" in scoreboard
+            assert re.search(rf"1\. {bot.config.player_3_name}\s+\[ 1 point\s+\]", scoreboard)
+
+        bot.send(
+            {
+                **bot.events.base,
+                "user": bot.config.player_1,
+                "text": f"<@{bot.config.bot_id}> scoreboard {today:%Y%m%d}..{week_ago:%Y%m%d}",
+            }
+        )
+
+        assert slack_web_api.responses[-1] == (
+            bot.config.channel,
+            f"Sorry <@{bot.config.player_1}>, I can't show that range: "
+            "The start of the range needs to be before the end",
+        )
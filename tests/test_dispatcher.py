@@ -0,0 +1,64 @@
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+from slack_sdk.errors import SlackApiError
+
+from emojirades.slack.dispatcher import SlackDispatcher
+
+
+def rate_limited(retry_after="0"):
+    response = MagicMock()
+    response.status_code = 429
+    response.headers = {"Retry-After": retry_after}
+    return SlackApiError("ratelimited", response)
+
+
+class TestSlackDispatcher:
+    def test_inline_without_workers(self):
+        dispatcher = SlackDispatcher(workers=0)
+        calls = []
+
+        dispatcher.submit("C00000001", lambda: calls.append(threading.current_thread()))
+
+        assert calls == [threading.current_thread()]
+
+    def test_per_key_ordering(self):
+        dispatcher = SlackDispatcher(workers=4)
+        sent = {"C00000001": [], "C00000002": []}
+
+        for i in range(50):
+            for channel, messages in sent.items():
+                dispatcher.submit(channel, lambda m=messages, i=i: m.append(i))
+
+        dispatcher.join()
+        dispatcher.stop()
+
+        assert sent["C00000001"] == list(range(50))
+        assert sent["C00000002"] == list(range(50))
+
+    def test_failed_job_does_not_stop_worker(self):
+        dispatcher = SlackDispatcher(workers=1)
+        calls = []
+
+        dispatcher.submit("C00000001", lambda: 1 / 0)
+        dispatcher.submit("C00000001", lambda: calls.append(True))
+
+        dispatcher.join()
+        dispatcher.stop()
+
+        assert calls == [True]
+
+    def test_call_retries_when_rate_limited(self):
+        dispatcher = SlackDispatcher(workers=0, max_retries=2)
+        func = MagicMock(side_effect=[rate_limited(), rate_limited(), {"ok": True}])
+
+        assert dispatcher.call(func, channel="C00000001") == {"ok": True}
+        assert func.call_count == 3
+
+    def test_call_gives_up_after_max_retries(self):
+        dispatcher = SlackDispatcher(workers=0, max_retries=1)
+        func = MagicMock(side_effect=[rate_limited(), rate_limited()])
+
+        with pytest.raises(SlackApiError):
+            dispatcher.call(func, channel="C00000001")
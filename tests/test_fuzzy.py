@@ -0,0 +1,42 @@
+import pytest
+
+from emojirades.fuzzy import FuzzyIndex, within_one_edit
+from emojirades.helpers import EmojiradeMatcher
+
+
+class TestFuzzy:
+    @pytest.mark.parametrize(
+        "a, b, expected",
+        [
+            ("frontier", "frontier", True),
+            ("frontier", "fronteir", True),  # Transposition
+            ("frontier", "frontir", True),  # Deletion
+            ("frontier", "frontierr", True),  # Insertion
+            ("frontier", "frontiar", True),  # Substitution
+            ("frontier", "fronter", True),
+            ("frontier", "frnoteir", False),
+            ("frontier", "front", False),
+            ("xab", "abx", False),
+        ],
+    )
+    def test_within_one_edit(self, a, b, expected):
+        assert within_one_edit(a, b) is expected
+        assert within_one_edit(b, a) is expected
+
+    def test_index(self):
+        index = FuzzyIndex(["space the final frontier", "star trek"])
+
+        assert index.match("space the final frontier")
+        assert index.match("is it spcae the fnial fronteir")
+        assert index.match("startrek or star trkk")
+        assert not index.match("space final frontier")
+        assert not index.match("space teh final frontier")  # Short words are exact
+        assert not index.match("star")
+
+    def test_matcher(self):
+        exact = EmojiradeMatcher(["star trek"])
+        fuzzy = EmojiradeMatcher(["star trek"], fuzzy=True)
+
+        assert exact.match("star trek") and fuzzy.match("star trek")
+        assert not exact.match("star trke")
+        assert fuzzy.match("star trke")
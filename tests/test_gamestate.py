@@ -1,4 +1,17 @@
 import os
+import threading
+
+from sqlalchemy import event, func, select
+
+from emojirades.bot import EmojiradesBot
+from emojirades.persistence import (
+    GamestateHistoryModel,
+    GamestateStep,
+    get_engine,
+    transaction,
+)
+from emojirades.persistence.repositories.gamestate import GamestateSnapshot
+from emojirades.slack.event import Event
 
 
 class TestGamestate:
@@ -10,3 +23,223 @@ class TestGamestate:
         bot.bot.populate_db(bot.db_uri, "gamestate", data_filename)
 
         assert len(bot.gamestate.get_channels()) == 1
+
+    def test_snapshot_written_through(self, slack_web_api, bot):
+        bot.reset_and_transition_to("guessing")
+
+        repository = bot.bot.workspaces[bot.config.team]["gamestate"].repository
+        snapshot = repository.gamestate_cache[bot.config.channel]
+
+        assert isinstance(snapshot, GamestateSnapshot)
+        assert snapshot.step == GamestateStep.GUESSING
+        assert snapshot.previous_winner == bot.config.player_1
+        assert snapshot.current_winner == bot.config.player_2
+
+    def test_snapshot_evicted_on_rollback(self, slack_web_api, bot):
+        bot.reset_and_transition_to("waiting")
+
+        workspace = bot.bot.workspaces[bot.config.team]
+        repository = workspace["gamestate"].repository
+
+        try:
+            with transaction(workspace["session_factory"]):
+                repository.set_xyz(bot.config.channel, bot.config.player_1, "step", None)
+
+                # Visible to this transaction, but not shared before it commits
+                assert repository.get_xyz(bot.config.channel, "step") is None
+                assert repository.gamestate_cache[bot.config.channel].step == GamestateStep.WAITING
+                assert repository.cached_snapshot(bot.config.channel).step == GamestateStep.WAITING
+
+                raise RuntimeError("abort")
+        except RuntimeError:
+            pass
+
+        assert bot.config.channel not in repository.gamestate_cache
+        assert repository.get_xyz(bot.config.channel, "step") == GamestateStep.WAITING
+
+    def test_read_snapshot_never_replaces_a_newer_write(self, slack_web_api, bot):
+        bot.reset_and_transition_to("waiting")
+
+        workspace = bot.bot.workspaces[bot.config.team]
+        repository = workspace["gamestate"].repository
+        channel = bot.config.channel
+
+        def write(step):
+            # The repository's scoped session is per thread, so this is another transaction
+            def run():
+                with transaction(workspace["session_factory"]):
+                    repository.set_xyz(channel, bot.config.player_1, "step", step)
+
+            thread = threading.Thread(target=run)
+            thread.start()
+            thread.join()
+
+        # A reads (and caches) the old step, B writes and commits before A commits
+        repository.clear_cache(channel)
+
+        with transaction(workspace["session_factory"]):
+            assert repository.get_xyz(channel, "step") == GamestateStep.WAITING
+            write(GamestateStep.PROVIDED)
+
+        assert repository.cached_snapshot(channel).step == GamestateStep.PROVIDED
+
+        # B commits while A is between reading the database and caching what it read
+        repository.clear_cache(channel)
+        get_gamestate = repository.get_gamestate
+
+        def interleaved(channel):
+            # B's own read goes straight through
+            repository.get_gamestate = get_gamestate
+
+            gamestate = get_gamestate(channel)
+            write(GamestateStep.GUESSING)
+
+            # Even once B's snapshot is evicted again, A's older read isn't cached
+            repository.clear_cache(channel)
+
+            return gamestate
+
+        repository.get_gamestate = interleaved
+
+        try:
+            with transaction(workspace["session_factory"]):
+                assert repository.get_xyz(channel, "step") == GamestateStep.PROVIDED
+        finally:
+            del repository.get_gamestate
+
+        assert repository.cached_snapshot(channel) is None
+        assert repository.get_xyz(channel, "step") == GamestateStep.GUESSING
+
+    def test_ignorable_events(self, slack_web_api, bot):
+        workspace = bot.bot.workspaces[bot.config.team]
+
+        def ignorable(user, text, channel=None):
+            data = {**bot.events.base, "user": user, "text": text}
+
+            if channel is not None:
+                data["channel"] = channel
+
+            return EmojiradesBot.ignorable(Event(data, bot.slack), workspace)
+
+        bot.reset_and_transition_to("waiting")
+
+        assert ignorable(bot.config.player_3, "just chatting")
+        assert ignorable(bot.config.player_3, "just chatting", channel=bot.config.player_3_channel)
+        assert not ignorable(bot.config.player_3, f"<@{bot.config.bot_id}> scoreboard")
+        assert not ignorable(bot.config.player_3, f"<@{bot.config.player_2}>++")
+        assert not ignorable(bot.config.player_1, "emojirade foo", channel=bot.config.bot_channel)
+        assert not ignorable(bot.config.player_3, f"hi player=<@{bot.config.player_1}>")
+
+        bot.reset_and_transition_to("provided", delete=False)
+
+        assert ignorable(bot.config.player_3, ":waddle:")
+        assert not ignorable(bot.config.player_2, ":waddle:")
+
+        bot.reset_and_transition_to("guessing", delete=False)
+
+        assert ignorable(bot.config.player_1, "testing")
+        assert ignorable(bot.config.player_2, "testing")
+        assert not ignorable(bot.config.player_3, "testing")
+
+        # Without a cached gamestate the event has to go to the database
+        bot.clear_bot_caches()
+        assert not ignorable(bot.config.player_1, "testing")
+
+    def test_matcher_compiled_with_emojirade(self, slack_web_api, bot):
+        bot.reset_and_transition_to("guessing")
+
+        gamestate = bot.bot.workspaces[bot.config.team]["gamestate"]
+        emojirade, matcher = gamestate.matchers[bot.config.channel]
+
+        assert emojirade == f'["{bot.config.emojirade}"]'
+        assert gamestate.get_matcher(bot.config.channel) is matcher
+
+        # A stored emojirade the matcher wasn't compiled from gets a fresh one
+        gamestate.matchers[bot.config.channel] = ('["other"]', matcher)
+        assert gamestate.get_matcher(bot.config.channel).emojirades == (bot.config.emojirade,)
+
+        bot.send(bot.events.correct_guess)
+        assert bot.config.channel not in gamestate.matchers
+
+    def test_fuzzy_guess(self, slack_web_api, bot):
+        gamestate = bot.bot.workspaces[bot.config.team]["gamestate"]
+        gamestate.fuzzy = True
+
+        bot.reset_and_transition_to("guessing")
+
+        bot.send({**bot.events.correct_guess, "text": "tseting"})
+        assert bot.step == GamestateStep.WAITING
+        assert bot.get_xyz("current_winner") == bot.config.player_3
+
+    def test_history_written_in_one_insert(self, slack_web_api, bot):
+        bot.reset_and_transition_to("guessing")
+
+        repository = bot.bot.workspaces[bot.config.team]["gamestate"].repository
+        count = select(func.count()).select_from(GamestateHistoryModel)
+        rows = repository.session.execute(count).scalar()
+        repository.session.commit()
+
+        inserts = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith("INSERT INTO gamestate_history"):
+                inserts.append(statement)
+
+        engine = get_engine(bot.db_uri)
+        event.listen(engine, "before_cursor_execute", record)
+
+        try:
+            bot.send(bot.events.correct_guess)
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+        assert bot.step == GamestateStep.WAITING
+        assert len(inserts) == 1
+
+        assert repository.session.execute(count).scalar() == rows + 5
+        assert [operation for _, _, operation in repository.get_history(bot.config.channel)] == [
+            "set,raw_emojirade,None",
+            "set,emojirade,None",
+            "set,step,GamestateStep.WAITING",
+            f"set,current_winner,{bot.config.player_3}",
+            f"set,previous_winner,{bot.config.player_2}",
+        ]
+
+    def test_history_discarded_on_rollback(self, slack_web_api, bot):
+        bot.reset_and_transition_to("waiting")
+
+        workspace = bot.bot.workspaces[bot.config.team]
+        repository = workspace["gamestate"].repository
+        count = select(func.count()).select_from(GamestateHistoryModel)
+        rows = repository.session.execute(count).scalar()
+        repository.session.commit()
+
+        try:
+            with transaction(workspace["session_factory"]):
+                repository.set_xyz(bot.config.channel, bot.config.player_1, "step", None)
+                raise RuntimeError("abort")
+        except RuntimeError:
+            pass
+
+        assert repository.session.execute(count).scalar() == rows
+
+    def test_first_guess_not_written_per_guess(self, slack_web_api, bot):
+        bot.reset_and_transition_to("guessing")
+
+        gamestate = bot.bot.workspaces[bot.config.team]["gamestate"]
+        history = gamestate.repository.get_history(bot.config.channel)
+
+        bot.send(bot.events.incorrect_guess)
+
+        assert gamestate.is_first_guess(bot.config.channel) is False
+        assert gamestate.repository.get_xyz(bot.config.channel, "first_guess") is True
+        assert gamestate.repository.get_history(bot.config.channel) == history
+
+        # The win carries the flag with it
+        bot.send(bot.events.correct_guess)
+
+        assert bot.step == GamestateStep.WAITING
+        assert gamestate.repository.get_xyz(bot.config.channel, "first_guess") is False
+        assert gamestate.repository.get_history(bot.config.channel)[0][2] == (
+            "set,first_guess,False"
+        )
@@ -0,0 +1,141 @@
+import csv
+import datetime
+import io
+import json
+
+import pytest
+from sqlalchemy import select
+
+from emojirades.analytics.time_unit import TimeUnit
+from emojirades.persistence import (
+    ScoreboardHistoryModel,
+    ScoreboardOperation,
+    ScorekeeperRepository,
+    get_session_factory,
+    populate,
+)
+from emojirades.persistence.importer import iter_json_array
+
+from .file_fixture import FileFixture
+
+
+@pytest.fixture
+def history():
+    with FileFixture("history.json").open() as ff:
+        return [
+            {"workspace_id": "T00000001", "channel_id": "C00000001", **i} for i in json.load(ff)
+        ]
+
+
+def imported_history(db_uri):
+    session = get_session_factory(db_uri)()
+
+    stmt = select(
+        ScoreboardHistoryModel.user_id,
+        ScoreboardHistoryModel.timestamp,
+        ScoreboardHistoryModel.operation,
+        ScoreboardHistoryModel.previous_score,
+        ScoreboardHistoryModel.current_score,
+    ).order_by(ScoreboardHistoryModel.event_id)
+
+    return session.execute(stmt).all()
+
+
+class TestImporter:
+    @pytest.mark.parametrize("chunk_size", [1, 7, 1 << 16])
+    def test_json_array_streamed(self, chunk_size):
+        data = [{"id": 1, "text": 'a "quoted", [bracketed] value'}, 12345, [3, {}], "]"]
+
+        items = iter_json_array(io.StringIO(json.dumps(data, indent=2)), chunk_size=chunk_size)
+
+        assert list(items) == data
+
+    def test_json_array_truncated(self):
+        with pytest.raises(json.JSONDecodeError):
+            list(iter_json_array(io.StringIO('[{"id": 1}, {"id": '), chunk_size=4))
+
+    def test_formats_match(self, tmp_path, db_uri, history):
+        """JSON, NDJSON and CSV dumps of the same history import identically"""
+        json_file = tmp_path / "history.json"
+        json_file.write_text(json.dumps(history), encoding="utf-8")
+
+        ndjson_file = tmp_path / "history.ndjson"
+        ndjson_file.write_text("\n".join(json.dumps(row) for row in history), encoding="utf-8")
+
+        csv_file = tmp_path / "history.csv"
+
+        with open(csv_file, "wt", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(history[0]))
+            writer.writeheader()
+            writer.writerows(history)
+
+        imported = []
+
+        for data_file in (json_file, ndjson_file, csv_file):
+            progress = populate(db_uri, "scoreboard_history", str(data_file), batch_size=64)
+            assert progress.rows == len(history)
+
+            imported.append(imported_history(db_uri)[-len(history) :])
+
+        assert imported[0] == imported[1] == imported[2]
+        assert imported[0][0].operation == ScoreboardOperation.INCREMENT
+        assert imported[0][0].timestamp.isoformat() == "2020-04-15T09:00:00+00:00"
+
+    def test_defaults_applied(self, tmp_path, db_uri):
+        """Rows leaving out defaulted columns are filled in before the batch insert"""
+        data_file = tmp_path / "history.json"
+        data_file.write_text(
+            json.dumps(
+                [
+                    {"user_id": "U1", "operation": "++,0,1"},
+                    {
+                        "user_id": "U2",
+                        "operation": "SET",
+                        "previous_score": 1,
+                        "current_score": 5,
+                        "timestamp": "2020-01-01 00:00:00",
+                    },
+                ]
+            ),
+            encoding="utf-8",
+        )
+
+        assert populate(db_uri, "scoreboard_history", str(data_file)).rows == 2
+
+        first, second = imported_history(db_uri)
+
+        assert first.timestamp is not None
+        assert second.operation == ScoreboardOperation.SET
+
+    def test_rollups_rebuilt(self, tmp_path, db_uri):
+        """Loading history brings the periodic scoreboards up to date with it"""
+        data_file = tmp_path / "history.json"
+        data_file.write_text(
+            json.dumps(
+                [
+                    {
+                        "workspace_id": "T00000001",
+                        "channel_id": "C00000001",
+                        "user_id": user_id,
+                        "operation": operation,
+                        "timestamp": "2020-06-16 02:00:00",
+                    }
+                    for user_id, operation in [
+                        ("U1", "++,0,1"),
+                        ("U1", "++,1,2"),
+                        ("U2", "++,0,1"),
+                        ("U2", "set,1,5"),
+                    ]
+                ]
+            ),
+            encoding="utf-8",
+        )
+
+        populate(db_uri, "scoreboard_history", str(data_file))
+
+        repository = ScorekeeperRepository(get_session_factory(db_uri), "T00000001")
+
+        assert repository.get_rollup("C00000001", TimeUnit.MONTHLY, datetime.date(2020, 6, 1)) == [
+            ("U1", 2),
+            ("U2", 1),
+        ]
@@ -0,0 +1,74 @@
+import logging
+import urllib.request
+
+import pytest
+
+from emojirades.instrumentation import instrumentation
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def instrumented():
+    logger = logging.getLogger("Emojirades.Instrumentation")
+    handler = RecordingHandler()
+    logger.addHandler(handler)
+
+    instrumentation.reset()
+    instrumentation.enable()
+
+    yield handler.records
+
+    instrumentation.disable()
+    instrumentation.reset()
+    logger.removeHandler(handler)
+
+
+class TestInstrumentation:
+    def test_event_fields(self, slack_web_api, bot, instrumented):
+        """Each handled event is logged with its stage timings and counters"""
+        bot.send(bot.events.new_game)
+
+        record = instrumented[-1]
+
+        assert record.workspace_id == bot.config.team
+        assert record.channel == bot.config.channel
+        assert record.event_ms > 0
+        assert record.db_queries > 0
+        assert record.slack_calls > 0
+
+        for stage in ("valid", "resolve_overrides", "match", "execute", "commit", "send"):
+            assert getattr(record, f"span_{stage}_ms") >= 0
+
+    def test_disabled(self, slack_web_api, bot):
+        """Nothing is traced unless switched on"""
+        bot.send(bot.events.new_game)
+
+        assert instrumentation.events == 0
+        assert "emojirades_event_seconds_count 0" in instrumentation.prometheus()
+
+    def test_prometheus_endpoint(self, slack_web_api, bot, instrumented):
+        bot.send(bot.events.new_game)
+        bot.send(bot.events.help)
+
+        server = instrumentation.serve(0, host="localhost")
+
+        try:
+            url = f"http://localhost:{server.server_address[1]}/metrics"
+
+            with urllib.request.urlopen(url) as response:
+                metrics = response.read().decode("utf-8")
+        finally:
+            server.shutdown()
+
+        assert "emojirades_event_seconds_count 2" in metrics
+        assert 'emojirades_event_seconds_bucket{le="+Inf"} 2' in metrics
+        assert 'emojirades_stage_seconds_count{stage="match"} 2' in metrics
+        assert 'emojirades_slack_calls_total{method="chat.postMessage"}' in metrics
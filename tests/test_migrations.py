@@ -0,0 +1,80 @@
+import datetime
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import text
+
+from emojirades.analytics.time_unit import TimeUnit
+from emojirades.persistence import ScorekeeperRepository, get_engine, get_session_factory, migrate
+from emojirades.persistence.orm import discover_migration_dir, discover_migration_ini
+
+# The last revision before the scoreboard rollup table existed
+BEFORE_ROLLUP = "1fe85f36a1a5"
+
+
+def upgrade_to(db_uri, revision):
+    alembic_cfg = Config(discover_migration_ini())
+    alembic_cfg.set_main_option("script_location", discover_migration_dir())
+    alembic_cfg.set_main_option("sqlalchemy.url", db_uri)
+    command.upgrade(alembic_cfg, revision)
+
+
+class TestMigrations:
+    def test_rollups_backfilled_from_existing_history(self, tmp_path):
+        db_uri = f"sqlite:///{tmp_path / 'legacy.db'}"
+        upgrade_to(db_uri, BEFORE_ROLLUP)
+
+        # 2026-10-14 is a Wednesday, the 16th a Friday (both in Melbourne)
+        history = [
+            ("U00000001", datetime.datetime(2026, 10, 14, 1), "++,0,1"),
+            ("U00000001", datetime.datetime(2026, 10, 16, 1), "++,1,2"),
+            ("U00000002", datetime.datetime(2026, 10, 16, 2), "++,0,1"),
+            ("U00000002", datetime.datetime(2026, 10, 16, 3), "--,1,0"),
+            ("U00000002", datetime.datetime(2026, 10, 16, 4), "set,0,10"),
+        ]
+
+        with get_engine(db_uri).begin() as connection:
+            connection.execute(
+                text(
+                    "INSERT INTO scoreboard_history "
+                    "(workspace_id, channel_id, user_id, timestamp, operation) "
+                    "VALUES ('T00000001', 'C00000001', :user_id, :timestamp, :operation)"
+                ),
+                [
+                    {"user_id": user_id, "timestamp": timestamp, "operation": operation}
+                    for user_id, timestamp, operation in history
+                ],
+            )
+
+        migrate(db_uri)
+
+        session_factory = get_session_factory(db_uri)
+        repository = ScorekeeperRepository(session_factory, "T00000001")
+
+        try:
+            assert repository.get_rollup(
+                "C00000001", TimeUnit.WEEKLY, datetime.date(2026, 10, 12)
+            ) == [
+                ("U00000001", 2),
+                ("U00000002", 0),
+            ]
+            assert repository.get_rollup(
+                "C00000001", TimeUnit.MONTHLY, datetime.date(2026, 10, 1)
+            ) == [
+                ("U00000001", 2),
+                ("U00000002", 0),
+            ]
+            assert repository.get_rollup(
+                "C00000001", TimeUnit.DAILY, datetime.date(2026, 10, 16)
+            ) == [
+                ("U00000001", 1),
+                ("U00000002", 0),
+            ]
+            assert repository.get_range(
+                "C00000001", datetime.date(2026, 10, 15), datetime.date(2026, 10, 18)
+            ) == [
+                ("U00000001", 1),
+                ("U00000002", 0),
+            ]
+        finally:
+            session_factory.remove()
@@ -0,0 +1,107 @@
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import func, select
+
+from emojirades.persistence import (
+    GamestateModel,
+    ScoreboardHistoryModel,
+    get_session_factory,
+    migrate_database,
+    migrator,
+    populate,
+)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+@pytest.fixture
+def source_uri(db_uri):
+    populate(db_uri, "gamestate", os.path.join(FIXTURES, "gamestate.json"))
+    populate(db_uri, "scoreboard_history", os.path.join(FIXTURES, "scoreboard_history.json"))
+
+    return db_uri
+
+
+def history(db_uri):
+    session = get_session_factory(db_uri)()
+
+    stmt = select(
+        ScoreboardHistoryModel.event_id,
+        ScoreboardHistoryModel.user_id,
+        ScoreboardHistoryModel.operation,
+        ScoreboardHistoryModel.current_score,
+    ).order_by(ScoreboardHistoryModel.event_id)
+
+    return session.execute(stmt).all()
+
+
+class TestMigrateDatabase:
+    def test_copies_all_tables(self, tmp_path, source_uri):
+        target_uri = f"sqlite:///{tmp_path / 'target.db'}"
+
+        copied = migrate_database(source_uri, target_uri, batch_size=2)
+
+        assert copied["gamestate"] == 1
+        assert copied["scoreboard_history"] == 3
+        assert history(target_uri) == history(source_uri)
+
+        session = get_session_factory(target_uri)()
+        assert session.execute(select(func.count()).select_from(GamestateModel)).scalar() == 1
+
+    def test_resumes_from_checkpoint(self, tmp_path, source_uri):
+        target_uri = f"sqlite:///{tmp_path / 'target.db'}"
+        checkpoint_file = tmp_path / "checkpoint.json"
+
+        upsert = migrator.upsert
+        calls = []
+
+        def interrupted(connection, table, rows):
+            if table.name == "scoreboard_history" and calls:
+                raise KeyboardInterrupt
+
+            if table.name == "scoreboard_history":
+                calls.append(rows)
+
+            upsert(connection, table, rows)
+
+        with patch.object(migrator, "upsert", side_effect=interrupted):
+            with pytest.raises(KeyboardInterrupt):
+                migrate_database(
+                    source_uri, target_uri, batch_size=2, checkpoint_file=str(checkpoint_file)
+                )
+
+        with open(checkpoint_file, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+
+        assert checkpoint["source_uri"] == source_uri
+        assert checkpoint["target_uri"] == target_uri
+        assert checkpoint["tables"]["gamestate"]["done"]
+        assert checkpoint["tables"]["scoreboard_history"] == {
+            "rows": 2,
+            "last_key": [2],
+            "done": False,
+        }
+
+        copied = migrate_database(
+            source_uri, target_uri, batch_size=2, checkpoint_file=str(checkpoint_file)
+        )
+
+        # Finished tables are skipped, the rest carry on after their last copied row
+        assert "gamestate" not in copied
+        assert copied["scoreboard_history"] == 1
+        assert history(target_uri) == history(source_uri)
+
+    def test_refuses_checkpoint_for_other_databases(self, tmp_path, source_uri):
+        checkpoint_file = str(tmp_path / "checkpoint.json")
+
+        migrate_database(
+            source_uri, f"sqlite:///{tmp_path / 'first.db'}", checkpoint_file=checkpoint_file
+        )
+
+        with pytest.raises(RuntimeError, match="Checkpoint"):
+            migrate_database(
+                source_uri, f"sqlite:///{tmp_path / 'second.db'}", checkpoint_file=checkpoint_file
+            )
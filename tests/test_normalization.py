@@ -0,0 +1,33 @@
+from benchmarks.normalization import SAMPLES, legacy_sanitize_text, run
+from emojirades.normalization import sanitize_text
+
+
+class TestNormalization:
+    def test_matches_legacy(self):
+        """The fast path and the unidecode path agree with the original implementation"""
+        texts = [
+            *SAMPLES.values(),
+            "",
+            "   ",
+            "ÆON Flux — Ça Va?",
+            "tab\tnew\nline\r\x0bvert\x0cfeed",
+            "MiXeD cAsE!!! with... punctuation;",
+            "emoji 🚀 rocket",
+        ]
+
+        for text in texts:
+            assert sanitize_text(text) == legacy_sanitize_text(text), text
+
+    def test_memoized(self):
+        sanitize_text.cache_clear()
+
+        sanitize_text("is it this?")
+        sanitize_text("is it this?")
+
+        assert sanitize_text.cache_info().hits == 1
+
+    def test_micro_benchmark(self):
+        results = run(number=10)
+
+        assert {result["implementation"] for result in results} == {"legacy", "uncached", "cached"}
+        assert len(results) == len(SAMPLES) * 3
@@ -0,0 +1,49 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.pool import SingletonThreadPool
+
+from emojirades.persistence import configure_engines, get_engine, pool_stats
+from emojirades.persistence.orm import TimedQueuePool, _pool_options
+
+
+@pytest.fixture
+def pool_options():
+    original = dict(_pool_options)
+    yield
+    _pool_options.update(original)
+
+
+class TestConnectionPool:
+    def test_pool_options_applied(self, tmp_path, pool_options):
+        configure_engines(pool_size=2, max_overflow=1, pool_pre_ping=True)
+
+        engine = get_engine(f"sqlite:///{tmp_path / 'pool.db'}")
+
+        assert isinstance(engine.pool, TimedQueuePool)
+        assert engine.pool.size() == 2
+        assert engine.pool._max_overflow == 1
+        assert engine.pool._pre_ping
+
+    def test_in_memory_sqlite_not_sized(self):
+        assert isinstance(get_engine("sqlite://").pool, SingletonThreadPool)
+
+    def test_unknown_option(self):
+        with pytest.raises(ValueError):
+            configure_engines(pool_sise=2)
+
+    def test_pool_stats(self, tmp_path):
+        db_uri = f"sqlite:///{tmp_path / 'stats.db'}"
+        engine = get_engine(db_uri)
+
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+
+            stats = pool_stats()[db_uri]
+            assert stats["checked_out"] == 1
+
+        stats = pool_stats()[db_uri]
+
+        assert stats["checked_out"] == 0
+        assert stats["checkouts"] == 1
+        assert stats["timeouts"] == 0
+        assert stats["wait_max"] >= 0
@@ -0,0 +1,114 @@
+import os
+
+import pytest
+from sqlalchemy import event
+
+from emojirades.persistence import (
+    GamestateRepository,
+    ScorekeeperRepository,
+    get_engine,
+    get_session_factory,
+    migrate,
+)
+
+# The PostgreSQL plans are only checked when a scratch database is given
+POSTGRES_URI = os.environ.get("TEST_POSTGRES_URI")
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def plan_db_uri(request, db_uri):
+    if request.param == "sqlite":
+        return db_uri
+
+    if POSTGRES_URI is None:
+        pytest.skip("TEST_POSTGRES_URI isn't set")
+
+    migrate(POSTGRES_URI)
+
+    return POSTGRES_URI
+
+
+def captured_selects(db_uri, func):
+    """
+    Runs func, returning every SELECT it sent to the database with its parameters
+    """
+    engine = get_engine(db_uri)
+    selects = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            selects.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+
+    try:
+        func()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    return selects
+
+
+def query_plan(db_uri, statement, parameters):
+    """
+    Returns the steps of a statement's query plan as text
+    """
+    engine = get_engine(db_uri)
+
+    with engine.connect() as connection:
+        if engine.dialect.name == "sqlite":
+            plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+
+            return [row[-1] for row in plan]
+
+        # Otherwise the planner prefers a sequential scan of a near empty table
+        connection.exec_driver_sql("SET enable_seqscan = off")
+        plan = connection.exec_driver_sql(f"EXPLAIN {statement}", parameters)
+
+        return [row[0] for row in plan]
+
+
+def full_scans(plan):
+    """
+    Steps reading a whole table or index, SQLite's SCAN and PostgreSQL's Seq Scan
+    """
+    return [step for step in plan if step.startswith("SCAN ") or "Seq Scan" in step]
+
+
+class TestQueryPlans:
+    @pytest.mark.parametrize(
+        "lookup, index",
+        [
+            (
+                lambda gamestate, scorekeeper: gamestate.get_pending_channel("U00000001"),
+                "idx_gamestate_pending",
+            ),
+            (
+                lambda gamestate, scorekeeper: scorekeeper.get_history("C00000001"),
+                "idx_scoreboard_history_channel",
+            ),
+            (
+                lambda gamestate, scorekeeper: scorekeeper.get_history(
+                    "C00000001", user="U00000001"
+                ),
+                "idx_scoreboard_history_user",
+            ),
+        ],
+        ids=["pending_channel", "channel_history", "user_history"],
+    )
+    def test_lookups_use_an_index(self, plan_db_uri, lookup, index):
+        session_factory = get_session_factory(plan_db_uri)
+        gamestate = GamestateRepository(session_factory, "T00000001")
+        scorekeeper = ScorekeeperRepository(session_factory, "T00000001")
+
+        try:
+            selects = captured_selects(plan_db_uri, lambda: lookup(gamestate, scorekeeper))
+        finally:
+            session_factory.remove()
+
+        assert len(selects) == 1
+
+        plan = query_plan(plan_db_uri, *selects[0])
+
+        assert full_scans(plan) == []
+        assert any(index in step for step in plan), plan
@@ -61,3 +61,60 @@ class TestCommandRegistry:
         assert DummyCustomCommand in BaseCommand.registered_commands
         assert len(BaseCommand.registered_commands) == initial_count + 1
         assert "DummyCustomCommand" in CommandRegistry.command_names()
+
+
+class TestCommandMatcher:
+    bot_id = "U00000000"
+
+    texts = [
+        "<@U00000000> help",
+        "<@U00000000> new game <@U00000001> <@U00000002>",
+        "<@U00000001>++",
+        "<@U00000001> --",
+        "<@U00000001> set 42",
+        "<@U00000000> history <@U00000001> 20",
+        "<@U00000000> history 5",
+        "<@U00000000> leaderboards",
+        "<@U00000000> scoreboard monthly 20200620",
+        "<@U00000000> scoreboard all time",
+        "<@U00000000> game status",
+        "<@U00000000> promote <@U00000003>",
+        "emojirade point break | break point",
+        "Emojirades point break",
+        "just chatting about emojirade",
+        "<@U00000002> nice one",
+        "",
+    ]
+
+    def test_matches_same_command_as_patterns(self):
+        commands = CommandRegistry.command_patterns().values()
+        matcher = CommandRegistry.matcher(self.bot_id, commands)
+
+        for text in self.texts:
+            expected = next((c for c in commands if c.match(text, me=self.bot_id)), None)
+            matched = matcher.match(text)
+
+            assert (matched[0] if matched else None) == expected, text
+
+    def test_groups_use_original_names(self):
+        matcher = CommandRegistry.matcher(self.bot_id)
+
+        command, groups = matcher.match("<@U00000000> history <@U00000001> 20")
+        assert command == HistoryCommand
+        assert groups == {"target_user": "U00000001", "limit": "20"}
+
+        command, groups = matcher.match("<@U00000000> scoreboards")
+        assert command == ScoreboardCommand
+        assert groups == {"all_boards": "s"}
+
+    def test_prefixes(self):
+        matcher = CommandRegistry.matcher(
+            self.bot_id, [SetEmojiradeCommand, CorrectGuessCommand, HelpCommand]
+        )
+
+        assert matcher.prefixes == ("<@", "<@U00000000> help", "Emojirade", "emojirade")
+        assert matcher.match("hello <@U00000001>++") is None
+
+    def test_matcher_cached_per_bot_id(self):
+        assert CommandRegistry.matcher(self.bot_id) is CommandRegistry.matcher(self.bot_id)
+        assert CommandRegistry.matcher(self.bot_id) is not CommandRegistry.matcher("U00000009")
@@ -1,4 +1,22 @@
+import datetime
+import json
 import os
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import event
+
+from emojirades.analytics.time_range import TimeRange
+from emojirades.analytics.time_unit import TimeUnit
+from emojirades.persistence import (
+    ScoreboardHistoryModel,
+    ScoreboardOperation,
+    get_engine,
+    transaction,
+)
+from emojirades.persistence.models import ROLLUP_DELTAS
+from emojirades.persistence.repositories.scorekeeper import ChannelScoreboard
+
+from .file_fixture import FileFixture
 
 
 class TestScorekeeper:
@@ -30,3 +48,220 @@ class TestScorekeeper:
 
         # Verify cache_key is removed
         assert cache_key not in bot.scorekeeper.repository.history_cache
+
+    def test_materialized_scoreboard_updates_in_place(self, slack_web_api, bot):
+        data_filename = os.path.join(os.path.dirname(__file__), "fixtures", "scoreboard.json")
+        bot.bot.populate_db(bot.db_uri, "scoreboard", data_filename)
+
+        repository = bot.bot.workspaces[bot.config.team]["scorekeeper"].repository
+        channel = bot.config.channel
+
+        assert repository.position_on_scoreboard(channel, bot.config.player_2) == (2, 1)
+        scoreboard = repository.scoreboard_cache[channel]
+
+        assert repository.increment_score(channel, bot.config.player_2, score=2) == (1, 3)
+        assert repository.scoreboard_cache[channel] is scoreboard
+        assert repository.get_scoreboard(channel) == [
+            (1, bot.config.player_2, 3),
+            (2, bot.config.player_1, 2),
+        ]
+
+        # Nothing outside the transaction sees the change before it commits
+        assert scoreboard.position(bot.config.player_2) == (2, 1)
+
+        repository.session.commit()
+
+        assert repository.scoreboard_cache[channel] is scoreboard
+        assert scoreboard.position(bot.config.player_2) == (1, 3)
+
+        # The materialized view agrees with the database
+        assert bot.scorekeeper.scoreboard(channel) == repository.get_scoreboard(channel)
+
+    def test_scoreboard_changes_discarded_on_rollback(self, slack_web_api, bot):
+        data_filename = os.path.join(os.path.dirname(__file__), "fixtures", "scoreboard.json")
+        bot.bot.populate_db(bot.db_uri, "scoreboard", data_filename)
+
+        workspace = bot.bot.workspaces[bot.config.team]
+        repository = workspace["scorekeeper"].repository
+        channel = bot.config.channel
+
+        assert repository.position_on_scoreboard(channel, bot.config.player_2) == (2, 1)
+
+        try:
+            with transaction(workspace["session_factory"]):
+                repository.increment_score(channel, bot.config.player_2, score=2)
+                raise RuntimeError("abort")
+        except RuntimeError:
+            pass
+
+        assert channel not in repository.scoreboard_cache
+        assert repository.position_on_scoreboard(channel, bot.config.player_2) == (2, 1)
+
+    def test_rollup_recorded_with_history(self, slack_web_api, bot):
+        bot.reset_and_transition_to("guessed")
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+
+        for time_unit in (TimeUnit.WEEKLY, TimeUnit.MONTHLY):
+            assert bot.scorekeeper.period_scoreboard(bot.config.channel, now, time_unit) == [
+                (bot.config.player_3, 1)
+            ]
+
+    def test_rollup_written_in_one_upsert(self, slack_web_api, bot):
+        workspace = bot.bot.workspaces[bot.config.team]
+        repository = workspace["scorekeeper"].repository
+        channel = bot.config.channel
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if "scoreboard_rollup" in statement:
+                statements.append(statement)
+
+        engine = get_engine(bot.db_uri)
+        event.listen(engine, "before_cursor_execute", capture)
+
+        try:
+            with transaction(workspace["session_factory"]):
+                for _ in range(2):
+                    repository.increment_score(channel, bot.config.player_1)
+        finally:
+            event.remove(engine, "before_cursor_execute", capture)
+
+        # No reads, just one upsert per change covering the daily, weekly and monthly buckets
+        assert len(statements) == 2
+        assert all(statement.lstrip().upper().startswith("INSERT") for statement in statements)
+
+        today = TimeRange.get_period_start(datetime.datetime.now(TimeRange.TZ), TimeUnit.DAILY)
+
+        assert repository.get_rollup(channel, TimeUnit.DAILY, today) == [(bot.config.player_1, 2)]
+
+    @staticmethod
+    def load_history(bot):
+        """Loads the history fixture straight into the database, returning its events"""
+        mel_tz = ZoneInfo("Australia/Melbourne")
+
+        with FileFixture("history.json").open() as ff:
+            history = json.load(ff)
+
+        session = bot.scorekeeper.repository.session
+        events = []
+
+        for item in history:
+            operation, previous_score, current_score = ScoreboardOperation.from_legacy(
+                item["operation"]
+            )
+            timestamp = datetime.datetime.strptime(item["timestamp"], "%Y-%m-%d %H:%M:%S")
+
+            events.append(
+                {
+                    "user_id": item["user_id"],
+                    "timestamp": timestamp.replace(tzinfo=mel_tz),
+                    "operation": operation,
+                }
+            )
+            session.add(
+                ScoreboardHistoryModel(
+                    workspace_id=bot.config.team,
+                    channel_id=bot.config.channel,
+                    previous_score=previous_score,
+                    current_score=current_score,
+                    **events[-1],
+                )
+            )
+
+        session.commit()
+
+        assert list(bot.bot.rollup_db(bot.db_uri)) == [bot.config.team]
+
+        return events
+
+    def test_rebuild_rollups_from_history(self, slack_web_api, bot):
+        mel_tz = ZoneInfo("Australia/Melbourne")
+
+        self.load_history(bot)
+
+        current_date = datetime.datetime(2020, 6, 20, tzinfo=mel_tz)
+
+        assert bot.scorekeeper.period_scoreboard(
+            bot.config.channel, current_date, TimeUnit.WEEKLY
+        ) == [
+            ("U985L6R1M", 15),
+            ("U0VCW825A", 13),
+            ("U5HKU1Q0W", 12),
+            ("U0ZC11HC7", 9),
+        ]
+        assert bot.scorekeeper.period_scoreboard(
+            bot.config.channel, current_date, TimeUnit.MONTHLY
+        ) == [
+            ("U0VCW825A", 44),
+            ("U5HKU1Q0W", 43),
+            ("U985L6R1M", 42),
+            ("U0ZC11HC7", 33),
+        ]
+
+    def test_range_scoreboard(self, slack_web_api, bot):
+        """Ranges summed from daily and monthly rollups match a scan of the history"""
+        events = self.load_history(bot)
+        channel = bot.config.channel
+
+        def scan(start_date, end_date):
+            start = datetime.datetime.combine(start_date, datetime.time(), tzinfo=TimeRange.TZ)
+            end = datetime.datetime.combine(end_date, datetime.time.max, tzinfo=TimeRange.TZ)
+
+            scores = {}
+
+            for item in events:
+                if start <= item["timestamp"] <= end and item["operation"] in ROLLUP_DELTAS:
+                    user_id = item["user_id"]
+                    scores[user_id] = scores.get(user_id, 0) + ROLLUP_DELTAS[item["operation"]]
+
+            return sorted(scores.items())
+
+        for start_date, end_date in [
+            (datetime.date(2020, 6, 15), datetime.date(2020, 6, 21)),
+            (datetime.date(2020, 5, 1), datetime.date(2020, 6, 30)),
+            (datetime.date(2020, 5, 17), datetime.date(2020, 6, 3)),
+            (datetime.date(2019, 12, 30), datetime.date(2020, 7, 2)),
+        ]:
+            scoreboard = bot.scorekeeper.range_scoreboard(channel, start_date, end_date)
+
+            assert scoreboard
+            assert sorted(scoreboard) == scan(start_date, end_date)
+            assert [score for _, score in scoreboard] == sorted(
+                (score for _, score in scoreboard), reverse=True
+            )
+
+        current_date = datetime.datetime(2020, 6, 20, tzinfo=TimeRange.TZ)
+
+        assert bot.scorekeeper.period_scoreboard(
+            channel, current_date, TimeUnit.MONTHLY
+        ) == bot.scorekeeper.range_scoreboard(
+            channel, datetime.date(2020, 6, 1), datetime.date(2020, 6, 30)
+        )
+
+        for time_unit in (TimeUnit.QUARTERLY, TimeUnit.YEARLY):
+            start_date, end_date = TimeRange.get_period_dates(current_date, time_unit)
+
+            assert sorted(
+                bot.scorekeeper.period_scoreboard(channel, current_date, time_unit)
+            ) == scan(start_date, end_date)
+
+
+class TestChannelScoreboard:
+    def test_ranking(self):
+        scoreboard = ChannelScoreboard([("U1", 5), ("U2", 7), ("U3", 5)])
+
+        assert scoreboard.top() == [(1, "U2", 7), (2, "U1", 5), (3, "U3", 5)]
+        assert scoreboard.top(1) == [(1, "U2", 7)]
+        assert scoreboard.position("U3") == (3, 5)
+        assert scoreboard.position("U4") == (None, None)
+
+    def test_update(self):
+        scoreboard = ChannelScoreboard([("U1", 5), ("U2", 7)])
+
+        scoreboard.update("U1", 8)
+        scoreboard.update("U3", 1)
+
+        assert scoreboard.top() == [(1, "U1", 8), (2, "U2", 7), (3, "U3", 1)]
+        assert scoreboard.position("U1") == (1, 8)
+        assert len(scoreboard) == 3
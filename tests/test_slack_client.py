@@ -0,0 +1,141 @@
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+from slack_sdk.errors import SlackApiError
+from slack_sdk.web import SlackResponse
+
+from emojirades.bot import EmojiradesBot
+from emojirades.persistence import DirectMessageRepository, get_session_factory
+from emojirades.slack.slack_client import UserCache
+
+
+def channel_not_found():
+    response = SlackResponse(
+        client=None,
+        http_verb="POST",
+        api_url="http://localhost:8888/chat.postMessage",
+        req_args={},
+        data={"ok": False, "error": "channel_not_found"},
+        headers={},
+        status_code=200,
+    )
+
+    return SlackApiError("channel_not_found", response)
+
+
+class TestDirectMessageCache:
+    def test_find_im_cached(self, slack_web_api, bot):
+        """Only the first DM to a user opens the conversation"""
+        web_client = bot.slack.rtm.web_client
+
+        with patch.object(
+            web_client, "conversations_open", wraps=web_client.conversations_open
+        ) as conversations_open:
+            assert bot.slack.find_im(bot.config.player_1) == bot.config.player_1_channel
+            assert bot.slack.find_im(bot.config.player_1) == bot.config.player_1_channel
+
+        assert conversations_open.call_count == 1
+
+    def test_find_im_persisted(self, slack_web_api, bot):
+        """DM channels are loaded back from the database"""
+        bot.slack.find_im(bot.config.player_2)
+
+        repository = DirectMessageRepository(get_session_factory(bot.db_uri), bot.config.team)
+        assert repository.channels() == {bot.config.player_2: bot.config.player_2_channel}
+
+        bot.slack.im_cache.clear()
+        bot.slack.attach_im_repository(repository)
+
+        assert bot.slack.cached_im(bot.config.player_2) == bot.config.player_2_channel
+
+    def test_stale_im_reopened(self, slack_web_api, bot):
+        """A DM channel Slack no longer knows about is forgotten and opened again"""
+        bot.slack.remember_im(bot.config.player_3, "D99999999")
+
+        workspace = bot.bot.workspaces[bot.config.team]
+        client = MagicMock()
+        client.web_client.chat_postMessage.side_effect = [channel_not_found(), {"ok": True}]
+
+        EmojiradesBot.send_response(client, workspace, MagicMock(), bot.config.player_3, "hello")
+
+        assert client.web_client.chat_postMessage.call_args_list[-1].kwargs == {
+            "channel": bot.config.player_3_channel,
+            "text": "hello",
+        }
+        assert bot.slack.cached_im(bot.config.player_3) == bot.config.player_3_channel
+
+
+class TestUserCache:
+    def test_least_recently_used_evicted(self):
+        cache = UserCache(max_len=2, max_age_seconds=60)
+        cache["U1"] = {"id": "U1"}
+        cache["U2"] = {"id": "U2"}
+
+        # Reading U1 makes U2 the least recently used
+        assert cache.get("U1") == {"id": "U1"}
+        cache["U3"] = {"id": "U3"}
+
+        assert cache.get("U2") is None
+        assert cache.get("U1") == {"id": "U1"}
+        assert len(cache) == 2
+
+    def test_expired(self):
+        cache = UserCache(max_len=2, max_age_seconds=-1)
+        cache["U1"] = {"id": "U1"}
+
+        assert cache.get("U1") is None
+        assert len(cache) == 0
+
+    def test_warmed_from_users_list(self, slack_web_api, bot):
+        """Users from users.list are served without calling users.info"""
+        with patch.object(bot.slack.rtm.web_client, "users_info") as users_info:
+            assert bot.slack.pretty_name(bot.config.player_4) == bot.config.player_4_name
+
+        users_info.assert_not_called()
+
+    def test_user_change_event(self, slack_web_api, bot):
+        """A user_change event replaces the cached user"""
+        bot.slack.rtm.send(
+            {
+                "type": "user_change",
+                "user": {
+                    "id": bot.config.player_1,
+                    "name": "player1",
+                    "real_name": "Renamed Player",
+                },
+            }
+        )
+
+        deadline = time.monotonic() + 1
+
+        while bot.slack.pretty_name(bot.config.player_1) != "Renamed Player":
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+
+    def test_pretty_names_batch(self, slack_web_api, bot):
+        """Hits come from the cache, misses are fetched concurrently"""
+        web_client = bot.slack.rtm.web_client
+        users_info = web_client.users_info
+        misses = [bot.config.player_2, bot.config.player_3, bot.config.player_4]
+
+        for user_id in misses:
+            bot.slack.user_info_cache.users.pop(user_id)
+
+        # Every miss has to be in flight at the same time to get past the barrier
+        barrier = threading.Barrier(len(misses), timeout=2)
+
+        def concurrent_users_info(**kwargs):
+            barrier.wait()
+            return users_info(**kwargs)
+
+        with patch.object(web_client, "users_info", side_effect=concurrent_users_info) as mock:
+            names = bot.slack.pretty_names([bot.config.player_1, *misses, bot.config.player_1])
+
+        assert mock.call_count == len(misses)
+        assert names == {
+            bot.config.player_1: bot.config.player_1_name,
+            bot.config.player_2: bot.config.player_2_name,
+            bot.config.player_3: bot.config.player_3_name,
+            bot.config.player_4: bot.config.player_4_name,
+        }
@@ -25,3 +25,21 @@ class TestTimeRange(TestCase):
         end_date = TimeRange.get_end_date(datetime.datetime(2020, 9, 16), TimeUnit.MONTHLY)
 
         assert end_date == datetime.datetime(2020, 9, 30, 23, 59, 59)
+
+    def test_get_start_date_of_quarter(self):
+        start_date = TimeRange.get_start_date(datetime.datetime(2020, 9, 16), TimeUnit.QUARTERLY)
+
+        assert start_date == datetime.datetime(2020, 7, 1, 0, 0, 0)
+
+    def test_get_end_date_of_quarter(self):
+        end_date = TimeRange.get_end_date(datetime.datetime(2020, 11, 16), TimeUnit.QUARTERLY)
+
+        assert end_date == datetime.datetime(2020, 12, 31, 23, 59, 59)
+
+    def test_get_period_of_year(self):
+        start_date, end_date = TimeRange.get_period_dates(
+            datetime.datetime(2020, 9, 16, tzinfo=TimeRange.TZ), TimeUnit.YEARLY
+        )
+
+        assert start_date == datetime.date(2020, 1, 1)
+        assert end_date == datetime.date(2020, 12, 31)
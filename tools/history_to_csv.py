@@ -12,11 +12,20 @@ with open(history_filename) as history_file:
     history = json.load(history_file)
 
 with open("history.csv", "w") as csv_file:
-    fieldnames = history[0].keys()
+    fieldnames = ["user_id", "timestamp", "operation", "previous_score", "current_score"]
 
     writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
     writer.writeheader()
 
     for event in history:
-        event["timestamp"] = datetime.fromtimestamp(event["timestamp"], tz=tz)
-        writer.writerow(event)
+        operation, previous_score, current_score = event["operation"].split(",")
+
+        writer.writerow(
+            {
+                "user_id": event["user_id"],
+                "timestamp": datetime.fromtimestamp(event["timestamp"], tz=tz),
+                "operation": operation,
+                "previous_score": int(previous_score),
+                "current_score": int(current_score),
+            }
+        )